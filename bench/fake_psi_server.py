@@ -0,0 +1,140 @@
+"""
+Fake `runPagespeed` server lokal untuk benchmark (tanpa kuota / jaringan).
+
+    python bench/fake_psi_server.py --port 8787 --latency-ms 200 --payload-kb 1500 --rate-429 0.05
+    PSI_ENDPOINT=http://127.0.0.1:8787/pagespeedonline/v5/runPagespeed python psi_csv_dashboard.py ...
+
+Payload: file recorded PSI response (--payload) atau payload sintetis berbentuk
+Lighthouse (kategori, audit lab, screenshot base64, i18n, loadingExperience)
+dengan ukuran kira-kira --payload-kb.
+"""
+from __future__ import annotations
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+LAB_AUDITS = {
+    "largest-contentful-paint": 2500.0, "first-contentful-paint": 1200.0, "total-blocking-time": 150.0,
+    "cumulative-layout-shift": 0.05, "speed-index": 3100.0, "interactive": 4200.0,
+    "server-response-time": 320.0, "total-byte-weight": 1_850_000.0,
+}
+
+OPPORTUNITY_IDS = ("render-blocking-resources", "unused-javascript", "unused-css-rules",
+                   "modern-image-formats", "uses-long-cache-ttl")
+
+
+def synthetic_payload(size_kb: int = 1500, seed: int = 1) -> dict:
+    rnd = random.Random(seed)
+    audits = {}
+    for aid, v in LAB_AUDITS.items():
+        audits[aid] = {"id": aid, "score": round(rnd.random(), 2), "numericValue": v * (0.8 + rnd.random() * 0.4),
+                       "numericUnit": "millisecond", "details": {"type": "debugdata", "items": [{"x": rnd.random()}]}}
+    for i in range(120):  # audit opportunity (beberapa dengan id asli Lighthouse) + audit lain
+        aid = OPPORTUNITY_IDS[i] if i < len(OPPORTUNITY_IDS) else f"audit-{i}"
+        audits[aid] = {
+            "id": aid, "score": 1, "title": f"Audit {i}",
+            "details": {"type": "opportunity", "overallSavingsMs": rnd.randint(0, 900),
+                        "items": [{"url": f"https://cdn.example.com/asset-{j}.js", "wastedMs": rnd.randint(0, 500),
+                                   "wastedBytes": rnd.randint(0, 90000)} for j in range(5)]},
+        }
+    payload = {
+        "kind": "pagespeedonline#result",
+        "loadingExperience": {
+            "metrics": {"LARGEST_CONTENTFUL_PAINT_MS": {"percentile": 2300, "category": "FAST"},
+                        "CUMULATIVE_LAYOUT_SHIFT_SCORE": {"percentile": 4, "category": "FAST"},
+                        "INTERACTION_TO_NEXT_PAINT": {"percentile": 180, "category": "FAST"}},
+            "overall_category": "FAST",
+        },
+        "lighthouseResult": {
+            "fetchTime": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),  # retention archive LHR
+            "categories": {c: {"id": c, "score": round(0.5 + rnd.random() / 2, 2)}
+                           for c in ("performance", "accessibility", "best-practices", "seo")},
+            "audits": audits,
+            "timing": {"total": 12345.6},
+            "i18n": {"rendererFormattedStrings": {f"s{i}": "lorem ipsum " * 4 for i in range(300)}},
+        },
+    }
+    filler = max(0, size_kb * 1024 - len(json.dumps(payload)))
+    payload["lighthouseResult"]["audits"]["final-screenshot"] = {
+        "id": "final-screenshot", "details": {"type": "screenshot", "data": "data:image/jpeg;base64," + "A" * filler}}
+    return payload
+
+
+class FakePSIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    body: bytes = b"{}"
+    latency_ms = 0.0
+    jitter_ms = 0.0
+    rate_429 = 0.0
+    rate_5xx = 0.0
+    retry_after = 1
+    stats = {"requests": 0, "429": 0, "5xx": 0}
+    lock = threading.Lock()
+
+    def _plain(self, code: int, headers: dict | None = None):
+        self.send_response(code)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        with self.lock:
+            self.stats["requests"] += 1
+        delay = max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000.0
+        time.sleep(delay)
+        roll = random.random()
+        if roll < self.rate_429:
+            with self.lock:
+                self.stats["429"] += 1
+            return self._plain(429, {"Retry-After": str(self.retry_after)})
+        if roll < self.rate_429 + self.rate_5xx:
+            with self.lock:
+                self.stats["5xx"] += 1
+            return self._plain(503)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_server(port: int = 8787, payload: str | None = None, payload_kb: int = 1500, latency_ms: float = 200,
+                jitter_ms: float = 50, rate_429: float = 0.0, rate_5xx: float = 0.0, retry_after: int = 1):
+    body = Path(payload).read_bytes() if payload else json.dumps(synthetic_payload(payload_kb)).encode("utf-8")
+    handler = type("Handler", (FakePSIHandler,), {
+        "body": body, "latency_ms": latency_ms, "jitter_ms": jitter_ms, "rate_429": rate_429,
+        "rate_5xx": rate_5xx, "retry_after": retry_after, "stats": {"requests": 0, "429": 0, "5xx": 0},
+    })
+    return ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fake PSI runPagespeed server")
+    ap.add_argument("--port", type=int, default=8787)
+    ap.add_argument("--payload", default=None, help="File JSON response PSI hasil rekaman")
+    ap.add_argument("--payload-kb", type=int, default=1500, help="Ukuran payload sintetis (KB)")
+    ap.add_argument("--latency-ms", type=float, default=200)
+    ap.add_argument("--jitter-ms", type=float, default=50)
+    ap.add_argument("--rate-429", type=float, default=0.0, help="Probabilitas response 429")
+    ap.add_argument("--rate-5xx", type=float, default=0.0, help="Probabilitas response 503")
+    ap.add_argument("--retry-after", type=int, default=1, help="Nilai header Retry-After untuk 429 (detik)")
+    args = ap.parse_args()
+    srv = make_server(args.port, args.payload, args.payload_kb, args.latency_ms, args.jitter_ms,
+                      args.rate_429, args.rate_5xx, args.retry_after)
+    print(f"Fake PSI listening on http://127.0.0.1:{args.port}/pagespeedonline/v5/runPagespeed", flush=True)
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
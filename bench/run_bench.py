@@ -0,0 +1,289 @@
+"""
+Benchmark offline untuk collector, history writer dan renderer.
+
+    python bench/run_bench.py                       # default: 100/1k/10k URL, history 30/365/1095 hari
+    python bench/run_bench.py --sizes 100 --history-days 30 --out bench_output.json
+
+Setiap case jalan di proses terpisah (peak RSS per case), di direktori
+sementara. Collector memanggil fake PSI server lokal (bench/fake_psi_server.py)
+lewat PSI_ENDPOINT. Laporan: throughput, latency p50/p95, peak RSS.
+
+History diukur dua kali: `cold` = run pertama tanpa manifest / arsip bulanan
+(export penuh, mis. runner baru tanpa cache) dan warm = run berikutnya (incremental).
+
+Regression gate: `--baseline` (hasil `--out` sebelumnya) -> exit 1 kalau p50/p95
+atau peak RSS suatu case naik lebih dari `--max-regress`, atau ada case yang error.
+
+    python bench/run_bench.py --out bench_baseline.json
+    python bench/run_bench.py --baseline bench_baseline.json --max-regress 0.25
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+GATE_METRICS = {"p50_ms": 5.0, "p95_ms": 5.0, "peak_rss_mb": 5.0}  # metric -> slack absolut (noise kecil)
+
+
+def _pct(values, q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(round(q * (len(s) - 1))))]
+
+
+def _peak_rss_mb() -> float:
+    try:  # Linux: VmHWM bisa di-reset (_reset_peak_rss), ru_maxrss tidak
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # Linux: KB
+
+
+def _reset_peak_rss():
+    """Peak RSS mulai dari sini (data seed tidak ikut dihitung); best effort, hanya Linux."""
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+    except OSError:
+        pass
+
+
+def _fake_row(url: str, strategy: str, rnd: random.Random) -> dict:
+    return {"url": url, "strategy": strategy, "performance": rnd.randint(30, 99),
+            "accessibility": rnd.randint(70, 100), "best_practices": rnd.randint(70, 100),
+            "seo": rnd.randint(80, 100), "lcp_ms": rnd.randint(1200, 6000), "tbt_ms": rnd.randint(0, 900),
+            "cls": round(rnd.random() / 4, 3)}
+
+
+def _urls(n: int):
+    return [(f"https://bench.local/page/{i // 2}", "mobile" if i % 2 == 0 else "desktop") for i in range(n)]
+
+
+# ---------------- cases (jalan di child process) ----------------
+def case_collect(size: int, concurrency: int, **_):
+    import psi_csv_dashboard as d
+
+    with open("urls.csv", "w", encoding="utf-8") as f:
+        f.write("url,strategy\n" + "".join(f"{u},{s}\n" for u, s in _urls(size)))
+
+    latencies = []
+    lock = threading.Lock()
+    run_psi = d.run_psi
+
+    def timed(*a, **kw):
+        t0 = time.perf_counter()
+        try:
+            return run_psi(*a, **kw)
+        finally:
+            with lock:
+                latencies.append((time.perf_counter() - t0) * 1000)
+
+    d.run_psi = timed
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = d.collect_psi_results("urls.csv", sleep_sec=0, concurrency=concurrency, journal_path="journal.jsonl")
+    elapsed = time.perf_counter() - t0
+    return {"ops": size, "seconds": elapsed, "throughput": size / elapsed,
+            "p50_ms": _pct(latencies, 0.5), "p95_ms": _pct(latencies, 0.95),
+            "errors": sum(1 for r in rows if r.get("error"))}
+
+
+def _reset_exports():
+    """Kembali ke kondisi runner baru: tanpa manifest, shard seri dan arsip bulanan."""
+    import shutil
+    import utils_history
+
+    utils_history.MANIFEST_FILE.unlink(missing_ok=True)
+    shutil.rmtree(utils_history.SERIES_DIR, ignore_errors=True)
+    for p in utils_history.HISTORY_DIR.glob("????-??.json"):
+        p.unlink()
+
+
+def case_history(days: int, urls: int, iterations: int, cold: bool = False, **_):
+    import utils_history
+    from history_rollup import TieredHistory
+
+    rnd = random.Random(1)
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    items = _urls(urls)
+    tiers = TieredHistory(utils_history.HISTORY_DIR / "store")
+    by_month: dict[str, list] = {}
+    for d in range(days, 0, -1):
+        ts = (now - timedelta(days=d)).isoformat().replace("+00:00", "Z")
+        for u, s in items:
+            row = _fake_row(u, s, rnd)
+            row["run_at_utc"] = ts
+            by_month.setdefault(ts[:7], []).append(row)
+    for month, rows in by_month.items():
+        tiers.raw.import_month(month, rows)
+    n_rows = sum(len(v) for v in by_month.values())
+    t0 = time.perf_counter()
+    tiers.update(now - timedelta(days=1))  # rollup awal (di luar pengukuran per run)
+    seed_s = time.perf_counter() - t0
+    if not cold:  # warm: export pertama (manifest + arsip bulanan) di luar pengukuran
+        with contextlib.redirect_stdout(io.StringIO()):
+            utils_history.append_history_with_rotation([_fake_row(u, s, rnd) for u, s in items], tiers=tiers)
+    del by_month
+    _reset_peak_rss()
+
+    times = []
+    for _ in range(iterations):
+        results = [_fake_row(u, s, rnd) for u, s in items]
+        if cold:
+            _reset_exports()
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            utils_history.append_history_with_rotation(results, tiers=tiers)
+        times.append((time.perf_counter() - t0) * 1000)
+    return {"ops": iterations, "seconds": sum(times) / 1000, "throughput": iterations / (sum(times) / 1000),
+            "p50_ms": _pct(times, 0.5), "p95_ms": _pct(times, 0.95), "seed_rollup_s": round(seed_s, 2),
+            "history_rows": n_rows}
+
+
+def case_render(size: int, iterations: int, **_):
+    import psi_csv_dashboard as d
+
+    rnd = random.Random(1)
+    rows = [_fake_row(u, s, rnd) for u, s in _urls(size)]
+    times = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            d.render_dashboard(rows, "dashboard/index.html")
+        times.append((time.perf_counter() - t0) * 1000)
+    return {"ops": iterations, "seconds": sum(times) / 1000, "throughput": iterations / (sum(times) / 1000),
+            "p50_ms": _pct(times, 0.5), "p95_ms": _pct(times, 0.95),
+            "html_kb": round(Path("dashboard/index.html").stat().st_size / 1024, 1)}
+
+
+CASES = {"collect": case_collect, "history": case_history, "render": case_render}
+
+
+def _child(spec: dict):
+    with tempfile.TemporaryDirectory(prefix="psi-bench-") as tmp:
+        os.chdir(tmp)
+        res = CASES[spec["case"]](**spec)
+    res["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+    print(json.dumps(res))
+
+
+# ---------------- parent ----------------
+def _run_case(spec: dict, env: dict) -> dict:
+    p = subprocess.run([sys.executable, __file__, "--child", json.dumps(spec)], capture_output=True, text=True, env=env)
+    if p.returncode != 0:
+        return {"error": (p.stderr or "").strip().splitlines()[-1:] or ["failed"]}
+    return json.loads(p.stdout.strip().splitlines()[-1])
+
+
+def check_regressions(results: list[dict], baseline: list[dict], max_regress: float) -> list[str]:
+    """Bandingkan hasil dengan baseline per (case, label); return daftar pelanggaran."""
+    base = {(b.get("case"), b.get("label")): b for b in baseline}
+    problems = []
+    for r in results:
+        name = f"{r['case']} {r['label']}"
+        if "error" in r:
+            problems.append(f"{name}: error {r['error']}")
+            continue
+        b = base.get((r["case"], r["label"]))
+        if not b or "error" in b:
+            continue
+        for m, slack in GATE_METRICS.items():
+            if m in r and m in b and r[m] > b[m] * (1 + max_regress) + slack:
+                problems.append(f"{name}: {m} {r[m]:.1f} > baseline {b[m]:.1f} (+{max_regress:.0%})")
+    return problems
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline benchmark PageSpeed monitor")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    ap.add_argument("--sizes", default="100,1000,10000", help="Jumlah URL untuk collect/render")
+    ap.add_argument("--history-days", default="30,365,1095", help="Ukuran history (hari) untuk history append")
+    ap.add_argument("--history-urls", type=int, default=136, help="Jumlah seri url x strategy di history")
+    ap.add_argument("--iterations", type=int, default=5)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--cases", default="collect,history,render")
+    ap.add_argument("--port", type=int, default=8787)
+    ap.add_argument("--latency-ms", type=float, default=50)
+    ap.add_argument("--payload-kb", type=int, default=1500)
+    ap.add_argument("--rate-429", type=float, default=0.0)
+    ap.add_argument("--rate-5xx", type=float, default=0.0)
+    ap.add_argument("--retry-after", type=int, default=1)
+    ap.add_argument("--out", default=None, help="Simpan hasil sebagai JSON")
+    ap.add_argument("--baseline", default=None, help="Hasil --out sebelumnya; exit 1 kalau ada regresi")
+    ap.add_argument("--max-regress", type=float, default=0.25,
+                    help="Kenaikan relatif p50/p95/RSS yang masih diterima vs baseline (0.25 = 25%%)")
+    args = ap.parse_args()
+
+    if args.child:
+        return _child(json.loads(args.child))
+
+    cases = args.cases.split(",")
+    sizes = [int(x) for x in args.sizes.split(",") if x]
+    days = [int(x) for x in args.history_days.split(",") if x]
+    env = dict(os.environ, PSI_ENDPOINT=f"http://127.0.0.1:{args.port}/pagespeedonline/v5/runPagespeed",
+               PSI_API_KEY="", PYTHONPATH=str(ROOT))
+
+    server = None
+    if "collect" in cases:
+        server = subprocess.Popen(
+            [sys.executable, str(Path(__file__).with_name("fake_psi_server.py")), "--port", str(args.port),
+             "--latency-ms", str(args.latency_ms), "--payload-kb", str(args.payload_kb),
+             "--rate-429", str(args.rate_429), "--rate-5xx", str(args.rate_5xx), "--retry-after", str(args.retry_after)],
+            stdout=subprocess.PIPE, text=True)
+        server.stdout.readline()  # tunggu listening
+
+    specs = []
+    for c in cases:
+        if c == "history":
+            specs += [{"case": c, "days": d, "urls": args.history_urls, "iterations": args.iterations,
+                       "cold": cold, "label": f"{d}d" + ("-cold" if cold else "")}
+                      for d in days for cold in (True, False)]
+        else:
+            specs += [{"case": c, "size": n, "concurrency": args.concurrency, "iterations": args.iterations,
+                       "label": str(n)} for n in sizes]
+
+    results = []
+    try:
+        print(f"{'case':<8} {'size':>10} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'RSS MB':>8}  extra")
+        for spec in specs:
+            res = _run_case(spec, env)
+            results.append({**spec, **res})
+            if "error" in res:
+                print(f"{spec['case']:<8} {spec['label']:>10}  ERROR {res['error']}")
+                continue
+            extra = {k: v for k, v in res.items()
+                     if k not in ("ops", "seconds", "throughput", "p50_ms", "p95_ms", "peak_rss_mb")}
+            print(f"{spec['case']:<8} {spec['label']:>10} {res['throughput']:>10.2f} {res['p50_ms']:>9.1f} "
+                  f"{res['p95_ms']:>9.1f} {res['peak_rss_mb']:>8.1f}  {extra}", flush=True)
+    finally:
+        if server:
+            server.terminate()
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        problems = check_regressions(results, baseline, args.max_regress)
+        for p in problems:
+            print("REGRESSION", p)
+        if problems:
+            raise SystemExit(1)
+        print(f"Regression gate OK vs {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
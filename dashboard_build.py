@@ -0,0 +1,210 @@
+from __future__ import annotations
+import hashlib
+import json
+import re
+import shutil
+import urllib.request
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from history_columnar import compressed_variants, write_variants
+from history_store import atomic_write_text
+
+CHART_JS_URL = "https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js"
+CHART_JS_RETRY_DAYS = 7               # download gagal: coba lagi setelah N hari (sementara pakai CDN)
+ASSET_DIR = "assets"                  # relatif terhadap folder dashboard
+IMMUTABLE_DIR = "history/immutable"   # shard history dengan nama content-hash
+BUILD_FILE = "build.json"             # di ASSET_DIR: daftar file hasil build (untuk prune)
+PRECOMPRESS_SUFFIXES = (".html", ".js", ".css", ".json")
+PRECOMPRESS_SKIP = {"run_metrics.json"}  # ditulis setelah build, tidak dibaca dashboard
+
+
+def hashed_name(stem: str, data: bytes, suffix: str) -> str:
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{suffix}"
+
+
+def minify_css(text: str) -> str:
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.S)
+    text = re.sub(r"\s+", " ", text)
+    return re.sub(r"\s*([{};,])\s*", r"\1", text).strip()
+
+
+def minify_js(text: str) -> str:
+    """
+    Minify konservatif: indentasi, baris kosong dan baris komentar `//` dibuang,
+    newline dipertahankan (ASI tetap sama). Aman untuk JS dashboard karena
+    tidak memakai template literal multi-baris.
+    """
+    lines = (ln.strip() for ln in text.splitlines())
+    return "\n".join(ln for ln in lines if ln and not ln.startswith("//"))
+
+
+def minify_html(text: str) -> str:
+    lines = (ln.strip() for ln in text.splitlines())
+    return "\n".join(ln for ln in lines if ln)
+
+
+def _write_asset(root: Path, stem: str, suffix: str, text: str, written: set) -> str:
+    data = text.encode("utf-8")
+    rel = f"{ASSET_DIR}/{hashed_name(stem, data, suffix)}"
+    path = root / rel
+    if not path.exists():  # content-addressed: file yang sudah ada pasti sama isinya
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    written.add(rel)
+    return rel
+
+
+def vendor_chart_js(root: Path, previous: dict, written: set, state: dict, download: bool = True) -> str | None:
+    """
+    Chart.js versi pin disimpan di assets/ (download sekali, reuse antar build); None kalau
+    belum ada. Download yang gagal dicatat di `state` (build.json) dan baru dicoba lagi
+    setelah CHART_JS_RETRY_DAYS; `download=False` tidak pernah memakai network.
+    """
+    rel = previous.get("chart_js")
+    if previous.get("chart_js_url") == CHART_JS_URL and rel and (root / rel).exists():
+        written.add(rel)
+        return rel
+    failed = previous.get("chart_js_failed") or {}
+    if failed.get("url") == CHART_JS_URL:
+        try:
+            age = datetime.now(timezone.utc) - datetime.fromisoformat(failed["at"].replace("Z", "+00:00"))
+        except (KeyError, ValueError):
+            age = None
+        if age is not None and age < timedelta(days=CHART_JS_RETRY_DAYS):
+            state["chart_js_failed"] = failed
+            return None
+    if not download:
+        return None
+    try:
+        with urllib.request.urlopen(CHART_JS_URL, timeout=20) as resp:
+            data = resp.read()
+    except OSError as e:
+        print(f"Build: Chart.js tidak bisa di-vendor, tetap pakai CDN (dicoba lagi {CHART_JS_RETRY_DAYS} hari lagi):", e)
+        now = datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+        state["chart_js_failed"] = {"url": CHART_JS_URL, "at": now}
+        return None
+    rel = f"{ASSET_DIR}/{hashed_name('chart', data, '.js')}"
+    (root / rel).parent.mkdir(parents=True, exist_ok=True)
+    (root / rel).write_bytes(data)
+    written.add(rel)
+    return rel
+
+
+def immutable_shards(root: Path, written: set, head_month: str | None = None) -> int:
+    """
+    Shard bulan yang sudah selesai (< head_month, default bulan UTC sekarang)
+    disalin ke history/immutable/<bulan>-<nama>.<hash>.col.json (+ varian .gz/.br)
+    dan path-nya dicatat sebagai elemen ke-5 entry bulan: loader meng-cache-nya
+    permanen. Shard bulan berjalan (head) tetap di history/series/ dan diambil
+    `no-store`. Entry yang sudah punya path immutable tidak dibaca ulang; bulan
+    yang di-export ulang (retention/rollup) kehilangan path itu dan dapat hash baru.
+    """
+    manifest_path = root / "history" / "manifest.json"
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return 0
+    head_month = head_month or datetime.now(timezone.utc).strftime("%Y-%m")
+    n = 0
+    for e in manifest.get("series", []):
+        for month, v in e.get("months", {}).items():
+            if month >= head_month:  # head: selalu dari history/series/
+                e["months"][month] = v[:4]
+                continue
+            rel = v[4] if len(v) > 4 else None
+            if not rel or not (root / rel).exists():
+                src = v[0]
+                try:
+                    data = (root / src).read_bytes()
+                except OSError:
+                    continue
+                stem = f"{month}-{Path(src).name[:-len('.col.json')]}"
+                rel = f"{IMMUTABLE_DIR}/{hashed_name(stem, data, '.col.json')}"
+                (root / rel).parent.mkdir(parents=True, exist_ok=True)
+                for ext in ("", *(f".{c}" for c in compressed_variants())):
+                    if (root / f"{src}{ext}").exists():
+                        shutil.copyfile(root / f"{src}{ext}", root / f"{rel}{ext}")
+                e["months"][month] = [*v[:4], rel]
+            written.update({rel, *(f"{rel}.{c}" for c in compressed_variants())})
+            n += 1
+    atomic_write_text(manifest_path, json.dumps(manifest, ensure_ascii=False, separators=(",", ":")) + "\n")
+    return n
+
+
+def precompress(root: Path, paths) -> int:
+    """Tulis varian .gz/.br untuk file teks di root dashboard, assets/ dan history/ (tanpa store/)."""
+    n = 0
+    for p in paths:
+        if p.suffix in PRECOMPRESS_SUFFIXES and p.name not in PRECOMPRESS_SKIP and p.is_file():
+            write_variants(p, p.read_bytes())
+            n += 1
+    return n
+
+
+def prune(root: Path, keep: set, previous: dict):
+    """Hapus file hasil build lama; file build sebelumnya tetap disimpan (HTML lama yang masih ter-cache)."""
+    keep = keep | set(previous.get("files", []))
+    for d in (ASSET_DIR, IMMUTABLE_DIR):
+        if not (root / d).is_dir():
+            continue
+        for p in (root / d).iterdir():
+            rel = re.sub(r"\.(gz|br)$", "", p.relative_to(root).as_posix())
+            if p.name != BUILD_FILE and rel not in keep:
+                p.unlink()
+
+
+def build_dashboard(html_path: Path, download: bool = True) -> dict:
+    """
+    Post-process hasil render_dashboard di folder dashboard:
+      - <style>, script utama dan trend engine -> assets/app.<hash>.css / .js dan
+        assets/engine.<hash>.js (minified), Chart.js di-vendor ke assets/chart.<hash>.js
+        (fallback CDN; `download=False`: hanya file yang sudah di-vendor, tanpa network)
+      - HTML di-minify, shard bulan yang sudah selesai diberi nama immutable (content-hash)
+      - varian .gz/.br untuk HTML, assets dan JSON
+    Return ringkasan jumlah file.
+    """
+    html_path = Path(html_path)
+    root = html_path.parent
+    build_file = root / ASSET_DIR / BUILD_FILE
+    try:
+        previous = json.loads(build_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        previous = {}
+    written: set = set()
+    html = html_path.read_text(encoding="utf-8")
+
+    m = re.search(r"<style>(.*?)</style>", html, re.S)
+    if m:
+        rel = _write_asset(root, "app", ".css", minify_css(m.group(1)), written)
+        html = html[:m.start()] + f"<link rel='stylesheet' href='{rel}'>" + html[m.end():]
+    # script utama = <script> tanpa atribut (data JSON / engine punya id + type)
+    m = re.search(r"<script>(.*?)</script>", html, re.S)
+    if m:
+        rel = _write_asset(root, "app", ".js", minify_js(m.group(1)), written)
+        html = html[:m.start()] + f"<script src='{rel}'></script>" + html[m.end():]
+    # trend engine (Worker / fallback main thread) ikut di-cache sebagai asset hashed
+    m = re.search(r"<script id='trendEngine' type='text/plain'>(.*?)</script>", html, re.S)
+    if m:
+        rel = _write_asset(root, "engine", ".js", minify_js(m.group(1)), written)
+        html = html[:m.start()] + f"<script id='trendEngine' type='text/plain' data-src='{rel}'></script>" + html[m.end():]
+    state: dict = {}
+    chart = vendor_chart_js(root, previous, written, state, download=download)
+    if chart:
+        html = html.replace(f"<script src='{CHART_JS_URL}'></script>", f"<script src='{chart}'></script>")
+    # HTML yang sudah pernah di-build: asset yang direferensikan tetap disimpan
+    written.update(re.findall(rf"(?:href|src)='({ASSET_DIR}/[^']+)'", html))
+
+    atomic_write_text(html_path, minify_html(html))
+    shards = immutable_shards(root, written)
+    files = [html_path, *root.glob("*.json"), *(root / p for p in written if not p.startswith(IMMUTABLE_DIR)),
+             *(root / "history").glob("*.json")]
+    compressed = precompress(root, files)
+    prune(root, written, previous)
+    build_file.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write_text(build_file, json.dumps({"chart_js_url": CHART_JS_URL, "chart_js": chart, **state,
+                                              "files": sorted(written)}, indent=2) + "\n")
+    summary = {"assets": sum(1 for p in written if p.startswith(ASSET_DIR)), "immutable_shards": shards,
+               "precompressed": compressed}
+    print(f"Build: {summary['assets']} assets, {shards} shard immutable, {compressed} file precompressed -> {root}")
+    return summary
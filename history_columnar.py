@@ -0,0 +1,109 @@
+from __future__ import annotations
+import gzip
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+from history_rollup import ROLLUP_METRICS
+from history_store import atomic_write_text
+
+try:  # optional: varian .br untuk server yang menyajikan file precompressed
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+FORMAT = "col1"
+TIERS = ("raw", "day", "week")
+# metric pecahan disimpan sebagai integer x skala (CLS -> x1000)
+SCALE = {m: 1000 for m in ROLLUP_METRICS if m.endswith("cls")}
+
+
+def _epoch(ts: str) -> int | None:
+    try:
+        return int(datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp())
+    except (AttributeError, ValueError):
+        return None
+
+
+def _iso(sec: int) -> str:
+    return datetime.fromtimestamp(sec, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def encode_columns(rows, metrics=ROLLUP_METRICS) -> dict:
+    """
+    Rows history -> format kolom ringkas:
+      urls / strategies   dictionary; `u` / `s` index per row
+      t0 + dt             epoch detik, delta terhadap row sebelumnya (rows diurut waktu)
+      r                   index tier (raw / day / week)
+      cols[metric]        integer (x SCALE), null = kosong; metric yang kosong semua tidak ditulis
+    Row error dan row tanpa timestamp dilewati.
+    """
+    keyed = []
+    for r in rows:
+        t = _epoch(r.get("run_at_utc"))
+        if t is not None and not r.get("error"):
+            keyed.append((t, r))
+    keyed.sort(key=lambda x: x[0])
+
+    urls, strategies = {}, {}
+    u, s, dt, tier = [], [], [], []
+    prev = keyed[0][0] if keyed else 0
+    for t, r in keyed:
+        u.append(urls.setdefault(r.get("url") or "", len(urls)))
+        s.append(strategies.setdefault(r.get("strategy") or "", len(strategies)))
+        dt.append(t - prev)
+        prev = t
+        tier.append(TIERS.index(r["rollup"]) if r.get("rollup") in TIERS else 0)
+
+    cols = {}
+    for m in metrics:
+        k = SCALE.get(m, 1)
+        data = []
+        for _, r in keyed:
+            v = r.get(m)
+            data.append(int(round(v * k)) if isinstance(v, (int, float)) and not isinstance(v, bool) else None)
+        if any(v is not None for v in data):
+            cols[m] = data
+
+    return {
+        "format": FORMAT, "n": len(keyed),
+        "urls": list(urls), "strategies": list(strategies), "tiers": list(TIERS),
+        "t0": keyed[0][0] if keyed else 0, "u": u, "s": s, "dt": dt, "r": tier,
+        "scale": {m: SCALE[m] for m in cols if m in SCALE}, "cols": cols,
+    }
+
+
+def decode_columns(doc: dict) -> list[dict]:
+    """Kebalikan encode_columns (untuk tool / pengecekan); nilai dikembalikan ke unit asli."""
+    rows, t = [], doc.get("t0", 0)
+    scale = doc.get("scale") or {}
+    for i in range(doc.get("n", 0)):
+        t += doc["dt"][i]
+        row = {"url": doc["urls"][doc["u"][i]], "strategy": doc["strategies"][doc["s"][i]], "run_at_utc": _iso(t)}
+        if doc["r"][i]:
+            row["rollup"] = doc["tiers"][doc["r"][i]]
+        for m, data in doc["cols"].items():
+            v = data[i]
+            if v is not None:
+                row[m] = v / scale[m] if m in scale else v
+        rows.append(row)
+    return rows
+
+
+def write_columns(path: Path, doc: dict, compress=("gz", "br")):
+    """Tulis doc (JSON compact) + varian .gz / .br (brotli jika terpasang)."""
+    text = json.dumps(doc, ensure_ascii=False, separators=(",", ":"))
+    atomic_write_text(path, text)
+    write_variants(path, text.encode("utf-8"), compress)
+
+
+def write_variants(path: Path, raw: bytes, compress=("gz", "br")):
+    """Varian precompressed `path`.gz / `path`.br (brotli hanya jika terpasang); gzip deterministik (mtime=0)."""
+    if "gz" in compress:
+        Path(f"{path}.gz").write_bytes(gzip.compress(raw, compresslevel=9, mtime=0))
+    if "br" in compress and brotli is not None:
+        Path(f"{path}.br").write_bytes(brotli.compress(raw, quality=11))
+
+
+def compressed_variants() -> list[str]:
+    return ["gz"] + (["br"] if brotli is not None else [])
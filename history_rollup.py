@@ -0,0 +1,202 @@
+from __future__ import annotations
+import json
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from statistics import median
+
+from history_store import HistoryStore, atomic_write_text, ts_str
+from utils_lhr import METRIC_FIELDS, SCORE_FIELDS
+
+ROLLUP_METRICS = SCORE_FIELDS + METRIC_FIELDS
+
+# Retention per tier (hari). Raw harus >= jangkauan history.json.
+RAW_RETENTION_DAYS = 35
+DAILY_RETENTION_DAYS = 365
+WEEKLY_RETENTION_DAYS = 365 * 3
+
+
+def _day(ts: str) -> str:
+    return (ts or "")[:10]
+
+
+def _week_start(day: str) -> str:
+    d = date.fromisoformat(day)
+    return (d - timedelta(days=d.weekday())).isoformat()
+
+
+def _prev_month(d: date) -> str:
+    """
+    Bulan sebelum `d`. Minggu terakhir bulan itu bisa menyeberang sampai hari
+    ke-6 bulan `d`, jadi view-nya (query_month) ikut berubah kalau hari itu berubah.
+    """
+    return (d.replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+
+
+def _covers(row: dict, day: str) -> tuple:
+    return row.get("url"), row.get("strategy"), day
+
+
+def _contrib(row: dict, metric: str):
+    """(median, min, max, n) kontribusi satu row (raw atau rollup) untuk satu metric."""
+    v = row.get(metric)
+    if not isinstance(v, (int, float)) or isinstance(v, bool):
+        return None
+    if row.get("rollup"):
+        return v, (row.get("min") or {}).get(metric, v), (row.get("max") or {}).get(metric, v), int(row.get("n") or 1)
+    return v, v, v, 1
+
+
+def rollup_rows(rows, bucket: str) -> list[dict]:
+    """
+    Agregasi rows per url x strategy x periode ("day" / "week") menjadi
+    min / median / max per metric. Row error dilewati. Input boleh raw row atau
+    rollup harian (untuk weekly: median dari median harian, min/max gabungan).
+    """
+    period_of = _day if bucket == "day" else (lambda ts: _week_start(_day(ts)))
+    groups: dict[tuple, dict] = {}
+    for r in rows:
+        if r.get("error"):
+            continue
+        ts = r.get("run_at_utc") or ""
+        if len(ts) < 10:
+            continue
+        key = (period_of(ts), r.get("url"), r.get("strategy"))
+        g = groups.setdefault(key, {"n": 0, "vals": {}})
+        g["n"] += int(r.get("n") or 1) if r.get("rollup") else 1
+        for m in ROLLUP_METRICS:
+            c = _contrib(r, m)
+            if c is not None:
+                g["vals"].setdefault(m, []).append(c)
+
+    out = []
+    for (period, url, strategy), g in sorted(groups.items()):
+        if not g["vals"]:
+            continue
+        row = {"url": url, "strategy": strategy, "run_at_utc": f"{period}T00:00:00Z",
+               "rollup": bucket, "period": period, "n": g["n"]}
+        mins, maxs = {}, {}
+        for m, cs in g["vals"].items():
+            row[m] = median(c[0] for c in cs)
+            mins[m] = min(c[1] for c in cs)
+            maxs[m] = max(c[2] for c in cs)
+        row["min"], row["max"] = mins, maxs
+        out.append(row)
+    return out
+
+
+class TieredHistory:
+    """
+    Tiga tier history dengan retention berbasis waktu:
+      raw   (root)               row asli, disimpan RAW_RETENTION_DAYS
+      day   (root/rollup/day)    min/median/max per hari, DAILY_RETENTION_DAYS
+      week  (root/rollup/week)   min/median/max per minggu (Senin), WEEKLY_RETENTION_DAYS
+
+    Rollup dihitung inkremental saat write: hanya hari / minggu yang baru
+    selesai sejak run terakhir (dicatat di rollup/state.json).
+    """
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self.raw = HistoryStore(self.root)
+        self.day = HistoryStore(self.root / "rollup" / "day")
+        self.week = HistoryStore(self.root / "rollup" / "week")
+        self.state_file = self.root / "rollup" / "state.json"
+
+    def _load_state(self) -> dict:
+        try:
+            st = json.loads(self.state_file.read_text(encoding="utf-8"))
+            return st if isinstance(st, dict) else {}
+        except Exception:
+            return {}
+
+    def months(self) -> list[str]:
+        return sorted(set(self.raw.months()) | set(self.day.months()) | set(self.week.months()))
+
+    def update(self, now: datetime | None = None) -> set[str]:
+        """Roll up hari/minggu yang sudah selesai lalu terapkan retention. Return bulan yang berubah."""
+        now = now or datetime.now(timezone.utc)
+        today = now.date().isoformat()
+        yesterday = (now.date() - timedelta(days=1)).isoformat()
+        state = self._load_state()
+        if state.get("day") == yesterday:
+            return set()  # hari ini sudah diproses
+
+        touched: set[str] = set()
+        last_day = state.get("day")
+        since = f"{(date.fromisoformat(last_day) + timedelta(days=1)).isoformat()}T00:00:00Z" if last_day else None
+        day_rows = rollup_rows(self.raw.query(since=since, until=f"{today}T00:00:00Z"), "day")
+        if day_rows:
+            self.day.append(day_rows)
+            touched.update(r["run_at_utc"][:7] for r in day_rows)
+            touched.update(_prev_month(date.fromisoformat(r["period"])) for r in day_rows if int(r["period"][8:]) <= 6)
+
+        this_monday = _week_start(today)
+        last_week = state.get("week")
+        wsince = f"{(date.fromisoformat(last_week) + timedelta(days=7)).isoformat()}T00:00:00Z" if last_week else None
+        week_rows = rollup_rows(self.day.query(since=wsince, until=f"{this_monday}T00:00:00Z"), "week")
+        if week_rows:
+            self.week.append(week_rows)
+            touched.update(r["run_at_utc"][:7] for r in week_rows)
+
+        current_month = today[:7]
+        for store in (self.day, self.week):
+            store.maybe_compact(current_month)
+        for store, days in ((self.raw, RAW_RETENTION_DAYS), (self.day, DAILY_RETENTION_DAYS),
+                            (self.week, WEEKLY_RETENTION_DAYS)):
+            cutoff = now - timedelta(days=days)
+            if store is self.day:
+                # rollup harian di-expire per minggu (Senin) penuh: minggu di batas retention
+                # tidak pernah tercakup sebagian, jadi row mingguan tidak menyembunyikan hari tanpa data
+                cutoff = (cutoff - timedelta(days=cutoff.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+            dropped = store.drop_before(cutoff)
+            touched.update(dropped)
+            if dropped and 1 < cutoff.day <= 7:
+                touched.add(_prev_month(cutoff.date()))  # hari awal bulan hilang: lihat _prev_month
+
+        state["day"] = yesterday
+        state["week"] = (date.fromisoformat(this_monday) - timedelta(days=7)).isoformat()
+        atomic_write_text(self.state_file, json.dumps(state) + "\n")
+        return touched
+
+    def query_month(self, month: str, **filters) -> list[dict]:
+        """
+        View satu bulan dengan resolusi terbaik yang masih tersedia: raw row,
+        lalu rollup harian untuk hari tanpa raw, lalu rollup mingguan untuk
+        minggu yang tidak tercakup sama sekali (7 hari penuh, juga hari yang
+        jatuh di bulan berikutnya). Coverage dihitung per url x strategy.
+        """
+        y, m = int(month[:4]), int(month[5:7])
+        since = f"{month}-01T00:00:00Z"
+        until = f"{y + m // 12:04d}-{m % 12 + 1:02d}-01T00:00:00Z"
+        rows = self.raw.query(since=since, until=until, **filters)
+        covered = {_covers(r, _day(r.get("run_at_utc"))) for r in rows}
+        days = [r for r in self.day.query(since=since, until=until, **filters) if _covers(r, r.get("period")) not in covered]
+        rows += days
+        covered |= {_covers(r, r.get("period")) for r in days}
+        weeks = self.week.query(since=since, until=until, **filters)
+        spill = max((date.fromisoformat(r["period"]) + timedelta(days=7) for r in weeks), default=None)
+        if spill is not None and spill.isoformat() > until[:10]:
+            # minggu terakhir menyeberang ke bulan berikutnya: hari di sana juga dihitung
+            nxt = {"since": until, "until": f"{spill.isoformat()}T00:00:00Z", **filters}
+            covered |= {_covers(r, _day(r.get("run_at_utc"))) for r in self.raw.query(**nxt)}
+            covered |= {_covers(r, r.get("period")) for r in self.day.query(**nxt)}
+        for r in weeks:
+            start = date.fromisoformat(r["period"])
+            if not any(_covers(r, (start + timedelta(days=i)).isoformat()) in covered for i in range(7)):
+                rows.append(r)
+        rows.sort(key=lambda r: r.get("run_at_utc") or "")
+        return rows
+
+    def query(self, since=None, until=None, **filters) -> list[dict]:
+        """Seperti query_month, untuk rentang [since, until) lintas bulan."""
+        lo, hi = ts_str(since), ts_str(until)
+        out = []
+        for month in self.months():
+            if (lo and month < lo[:7]) or (hi and month > hi[:7]):
+                continue
+            for r in self.query_month(month, **filters):
+                ts = r.get("run_at_utc") or ""
+                if (lo and ts < lo) or (hi and ts >= hi):
+                    continue
+                out.append(r)
+        return out
@@ -0,0 +1,209 @@
+from __future__ import annotations
+import json
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+STORE_DIR = Path("dashboard/history/store")
+COMPACT_SEGMENTS = 16  # compact bulan berjalan setelah N segment run
+
+
+def ts_str(v) -> str | None:
+    """datetime / string ISO -> 'YYYY-MM-DDTHH:MM:SSZ' (untuk perbandingan string)."""
+    if v is None:
+        return None
+    if isinstance(v, datetime):
+        return v.replace(microsecond=0).isoformat().replace("+00:00", "Z")
+    return str(v)
+
+
+def atomic_write_text(path: Path, text: str):
+    """Tulis file via tmp + os.replace supaya reader tidak pernah melihat file setengah jadi."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _read_jsonl(path: Path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(row, dict):
+                yield row
+
+
+class HistoryStore:
+    """
+    Append-only history store berbasis JSONL.
+
+    Layout di bawah `root`:
+      seg/YYYY-MM/<run_ts>-<id>.jsonl   satu segment per run (ditulis atomik)
+      YYYY-MM.jsonl                     segment bulanan hasil compaction
+
+    Append hanya menulis baris run itu sendiri. Segment kecil digabung ke file
+    bulanan saat jumlahnya >= COMPACT_SEGMENTS atau bulannya sudah lewat.
+    """
+
+    def __init__(self, root: str | Path = STORE_DIR):
+        self.root = Path(root)
+
+    # ---- layout ----
+    def _month_file(self, month: str) -> Path:
+        return self.root / f"{month}.jsonl"
+
+    def _seg_dir(self, month: str) -> Path:
+        return self.root / "seg" / month
+
+    def _segments(self, month: str) -> list[Path]:
+        d = self._seg_dir(month)
+        return sorted(d.glob("*.jsonl")) if d.exists() else []
+
+    def months(self) -> list[str]:
+        ms = set()
+        if self.root.exists():
+            ms.update(p.stem for p in self.root.glob("*.jsonl"))
+            seg = self.root / "seg"
+            if seg.exists():
+                ms.update(p.name for p in seg.iterdir() if p.is_dir() and any(p.glob("*.jsonl")))
+        return sorted(ms)
+
+    def is_empty(self) -> bool:
+        return not self.months()
+
+    # ---- write ----
+    def append(self, rows) -> list[Path]:
+        """Tulis rows sebagai segment baru per bulan. Return path segment yang dibuat."""
+        by_month: dict[str, list[dict]] = {}
+        for r in rows:
+            by_month.setdefault((r.get("run_at_utc") or "")[:7] or "unknown", []).append(r)
+        written = []
+        for month, mrows in by_month.items():
+            run_ts = (mrows[0].get("run_at_utc") or "").replace("-", "").replace(":", "")
+            path = self._seg_dir(month) / f"{run_ts}-{uuid.uuid4().hex[:6]}.jsonl"
+            atomic_write_text(path, "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in mrows))
+            written.append(path)
+        return written
+
+    def import_month(self, month: str, rows):
+        """Tulis langsung segment bulanan (dipakai untuk migrasi arsip JSON lama)."""
+        atomic_write_text(self._month_file(month), "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows))
+
+    def compact(self, month: str) -> int:
+        """Gabungkan segment run ke file bulanan (atomik, dedupe baris identik)."""
+        segs = self._segments(month)
+        if not segs:
+            return 0
+        seen = set()
+        lines = []
+        for p in [self._month_file(month)] + segs:
+            if not p.exists():
+                continue
+            for row in _read_jsonl(p):
+                line = json.dumps(row, ensure_ascii=False)
+                if line not in seen:
+                    seen.add(line)
+                    lines.append(line + "\n")
+        atomic_write_text(self._month_file(month), "".join(lines))
+        for p in segs:
+            p.unlink(missing_ok=True)
+        try:
+            self._seg_dir(month).rmdir()
+        except OSError:
+            pass
+        return len(segs)
+
+    def maybe_compact(self, current_month: str) -> list[str]:
+        """Compaction periodik: bulan lampau selalu, bulan berjalan tiap COMPACT_SEGMENTS run."""
+        done = []
+        for month in self.months():
+            n = len(self._segments(month))
+            if n and (month < current_month or n >= COMPACT_SEGMENTS):
+                self.compact(month)
+                done.append(month)
+        return done
+
+    def drop_before(self, ts) -> list[str]:
+        """Retention: hapus row dengan run_at_utc < ts. Return bulan yang berubah."""
+        cutoff = ts_str(ts)
+        touched = []
+        for month in self.months():
+            if month < cutoff[:7]:
+                self._month_file(month).unlink(missing_ok=True)
+                for p in self._segments(month):
+                    p.unlink(missing_ok=True)
+                touched.append(month)
+            elif month == cutoff[:7]:
+                rows = list(self.iter_month(month))
+                keep = [r for r in rows if (r.get("run_at_utc") or "") >= cutoff]
+                if len(keep) < len(rows):
+                    self.import_month(month, keep)
+                    for p in self._segments(month):
+                        p.unlink(missing_ok=True)
+                    touched.append(month)
+        return touched
+
+    # ---- read / query ----
+    def iter_month(self, month: str):
+        f = self._month_file(month)
+        if f.exists():
+            yield from _read_jsonl(f)
+        for p in self._segments(month):
+            yield from _read_jsonl(p)
+
+    def query(self, url: str | None = None, strategy: str | None = None, metrics=None,
+              since=None, until=None) -> list[dict]:
+        """
+        Rows berurutan waktu, difilter url / strategy / rentang run_at_utc
+        [since, until). Jika `metrics` diisi, row diproyeksikan ke
+        url, strategy, run_at_utc + metric tersebut.
+        """
+        lo, hi = ts_str(since), ts_str(until)
+        out = []
+        for month in self.months():
+            if lo and month < lo[:7]:
+                continue
+            if hi and month > hi[:7]:
+                continue
+            for r in self.iter_month(month):
+                ts = r.get("run_at_utc") or ""
+                if (lo and ts < lo) or (hi and ts >= hi):
+                    continue
+                if url is not None and r.get("url") != url:
+                    continue
+                if strategy is not None and r.get("strategy") != strategy:
+                    continue
+                if metrics:
+                    r = {"url": r.get("url"), "strategy": r.get("strategy"), "run_at_utc": ts,
+                         **{m: r.get(m) for m in metrics}}
+                out.append(r)
+        out.sort(key=lambda r: r.get("run_at_utc") or "")
+        return out
+
+    def series(self, url: str, strategy: str, metric: str, since=None, until=None) -> list[tuple[str, object]]:
+        """[(run_at_utc, value), ...] untuk satu url x strategy x metric."""
+        return [(r["run_at_utc"], r.get(metric))
+                for r in self.query(url=url, strategy=strategy, metrics=[metric], since=since, until=until)
+                if r.get(metric) is not None]
+
+    def tail(self, n: int) -> list[dict]:
+        """N row terakhir; hanya membaca bulan terbaru yang dibutuhkan."""
+        out: list[dict] = []
+        for month in reversed(self.months()):
+            rows = list(self.iter_month(month))
+            rows.sort(key=lambda r: r.get("run_at_utc") or "")
+            out = rows + out
+            if len(out) >= n:
+                break
+        return out[-n:] if n > 0 else []
@@ -0,0 +1,371 @@
+from __future__ import annotations
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from history_rollup import RAW_RETENTION_DAYS
+from history_store import atomic_write_text, ts_str
+from utils_history import HISTORY_DIR, normalize_url
+
+try:  # optional: tanpa ijson response di-parse penuh dengan json.load
+    import ijson
+except ImportError:  # pragma: no cover
+    ijson = None
+try:  # optional: tanpa zstandard blob dikompres gzip (tanpa dictionary)
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+ARCHIVE_DIR = HISTORY_DIR / "lhr"
+LHR_RETENTION_DAYS = RAW_RETENTION_DAYS  # report ikut umur history raw
+ZSTD_LEVEL = 12
+DICT_SIZE = 112 * 1024
+DICT_MIN_SAMPLES = 200      # blob minimal sebelum dictionary pertama di-train
+DICT_SAMPLES = 2000         # blob terbaru yang dipakai untuk training
+DICT_RETRAIN_DAYS = 30
+# bagian LHR yang disimpan sebagai blob terpisah (dedup antar run); tiap audit juga
+SPLIT_KEYS = ("fullPageScreenshot", "stackPacks", "entities")
+SPLIT_I18N_KEYS = ("rendererFormattedStrings", "icuMessagePaths")
+
+
+def canonical(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def _utc(ts) -> str:
+    """fetchTime Lighthouse ('...T18:30:21.123Z') -> format run_at_utc history ('...T18:30:21Z')."""
+    try:
+        return ts_str(datetime.fromisoformat(str(ts).replace("Z", "+00:00")).astimezone(timezone.utc))
+    except ValueError:
+        return ts_str(datetime.now(timezone.utc))
+
+
+def tee_chunks(chunks, sink):
+    """Teruskan chunk response sambil menulis salinannya ke `sink` (file temp untuk archive)."""
+    for chunk in chunks:
+        sink.write(chunk)
+        yield chunk
+
+
+class LHRArchive:
+    """
+    Archive Lighthouse result lengkap, content-addressed.
+
+    Layout di bawah `root`:
+      blobs/<ab>/<sha256>.zst|.gz     potongan JSON kanonik (dedup by hash)
+      dicts/<dict_id>.zdict           dictionary zstd (di-train dari blob lama)
+      index/YYYY-MM/<run>.jsonl       satu segment per run: url, strategy, fetch_time, root
+
+    Setiap LHR dipecah: i18n, screenshot penuh, stackPacks/entities dan setiap
+    audit jadi blob sendiri, diganti {"$blob": sha} di root. Bagian yang sama
+    antar run (string i18n, audit yang tidak berubah, screenshot yang sama)
+    hanya disimpan sekali.
+    """
+
+    def __init__(self, root: str | Path = ARCHIVE_DIR):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._run = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + f"-{os.getpid()}"
+        self._dict = self._current_dict() if zstandard is not None else None
+        self._dicts: dict[int, object] = {}
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.reports = 0
+        self._pending: dict[str, tuple] = {}  # sha root -> (fetch_time, raw_bytes), belum di-index
+
+    # ---- blobs ----
+    def _blob_path(self, sha: str) -> Path | None:
+        for ext in (".zst", ".gz"):
+            p = self.root / "blobs" / sha[:2] / f"{sha}{ext}"
+            if p.exists():
+                return p
+        return None
+
+    def _put_blob(self, obj) -> dict:
+        data = canonical(obj)
+        sha = hashlib.sha256(data).hexdigest()
+        if self._blob_path(sha) is None:
+            # tanpa lock: dua thread dengan blob sama menulis isi yang identik (os.replace atomik)
+            if zstandard is not None:
+                comp = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=self._dict)
+                payload, ext = comp.compress(data), ".zst"
+            else:
+                payload, ext = gzip.compress(data, compresslevel=9, mtime=0), ".gz"
+            p = self.root / "blobs" / sha[:2] / f"{sha}{ext}"
+            p.parent.mkdir(parents=True, exist_ok=True)
+            tmp = p.with_name(f"{p.name}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(payload)
+            os.replace(tmp, p)
+            with self._lock:
+                self.stored_bytes += len(payload)
+        return {"$blob": sha}
+
+    def _get_blob(self, sha: str):
+        p = self._blob_path(sha)
+        if p is None:
+            raise KeyError(f"blob {sha} tidak ada di archive")
+        data = p.read_bytes()
+        if p.suffix == ".gz":
+            return json.loads(gzip.decompress(data))
+        if zstandard is None:
+            raise RuntimeError("blob .zst butuh paket zstandard")
+        dict_id = zstandard.get_frame_parameters(data).dict_id
+        return json.loads(zstandard.ZstdDecompressor(dict_data=self._load_dict(dict_id)).decompress(data))
+
+    # ---- dictionary ----
+    def _dict_path(self, dict_id: int) -> Path:
+        return self.root / "dicts" / f"{dict_id}.zdict"
+
+    def _load_dict(self, dict_id: int):
+        if not dict_id:
+            return None
+        if dict_id not in self._dicts:
+            self._dicts[dict_id] = zstandard.ZstdCompressionDict(self._dict_path(dict_id).read_bytes())
+        return self._dicts[dict_id]
+
+    def _current_dict(self):
+        try:
+            meta = json.loads((self.root / "dicts" / "current.json").read_text(encoding="utf-8"))
+            return zstandard.ZstdCompressionDict(self._dict_path(meta["dict_id"]).read_bytes())
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def maybe_train_dict(self, now: datetime | None = None) -> bool:
+        """Train dictionary zstd dari blob terbaru kalau belum ada / sudah DICT_RETRAIN_DAYS hari."""
+        if zstandard is None:
+            return False
+        now = now or datetime.now(timezone.utc)
+        meta_path = self.root / "dicts" / "current.json"
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            trained = datetime.fromisoformat(meta["trained_at"].replace("Z", "+00:00"))
+            if trained > now - timedelta(days=DICT_RETRAIN_DAYS):
+                return False
+        except (OSError, ValueError, KeyError):
+            pass
+        blobs = sorted((self.root / "blobs").glob("*/*.*"), key=lambda p: p.stat().st_mtime, reverse=True)
+        if len(blobs) < DICT_MIN_SAMPLES:
+            return False
+        samples = [canonical(self._get_blob(p.name.split(".")[0])) for p in blobs[:DICT_SAMPLES]]
+        try:
+            d = zstandard.train_dictionary(DICT_SIZE, samples)
+        except zstandard.ZstdError as e:
+            print("LHR archive: training dictionary gagal:", e)
+            return False
+        self._dict_path(d.dict_id()).parent.mkdir(parents=True, exist_ok=True)
+        self._dict_path(d.dict_id()).write_bytes(d.as_bytes())
+        meta = {"dict_id": d.dict_id(), "trained_at": ts_str(now), "samples": len(samples)}
+        atomic_write_text(meta_path, json.dumps(meta, indent=2) + "\n")
+        self._dict = d
+        print(f"LHR archive: dictionary zstd baru ({len(samples)} sample, id {d.dict_id()})")
+        return True
+
+    # ---- reports ----
+    def _place(self, root: dict, key: str, value, audit: str | None = None):
+        """Satu bagian lighthouseResult -> root; bagian SPLIT_* / audit jadi blob."""
+        if audit is not None:
+            root.setdefault("audits", {})[audit] = self._put_blob(value)
+        elif key in SPLIT_KEYS:
+            root[key] = self._put_blob(value)
+        elif key == "i18n" and isinstance(value, dict):
+            root[key] = {k: self._put_blob(v) if k in SPLIT_I18N_KEYS else v for k, v in value.items()}
+        else:
+            root[key] = value
+
+    def _split_stream(self, f) -> dict | None:
+        """
+        Pecah lighthouseResult dari file response secara streaming (ijson): tiap
+        audit / bagian top-level di-build sendiri lalu langsung jadi blob, jadi
+        memori dibatasi satu bagian, bukan seluruh report.
+        """
+        root = None
+        builder = current = None
+        key = audit = None  # bagian yang sedang di-build (di-set saat builder dibuat)
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            if builder is not None:
+                builder.event(event, value)
+                if prefix == current and event in ("end_map", "end_array"):
+                    self._place(root, key, builder.value, audit)
+                    builder = None
+                continue
+            if prefix == "lighthouseResult":
+                if event == "start_map":
+                    root = {}
+                continue
+            if root is None or not prefix.startswith("lighthouseResult."):
+                continue
+            parts = prefix.split(".", 2)[1:]
+            if parts == ["audits"]:
+                if event == "start_map":
+                    root["audits"] = {}
+                continue
+            key, audit = (parts[0], None) if parts[0] != "audits" else ("audits", parts[1])
+            if event in ("start_map", "start_array"):
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+                current = prefix
+            elif event != "map_key":
+                self._place(root, key, value, audit)
+        return root
+
+    def put(self, url: str, strategy: str, src, index: bool = True) -> str | None:
+        """
+        Simpan response PSI (file biner hasil tee_chunks, atau bytes) -> sha root LHR;
+        None kalau tidak ada lighthouseResult. `index=False`: blob saja, entry index
+        baru ditulis lewat record() (multi-sample: hanya run median yang dipilih);
+        root yang tidak pernah di-record dibuang GC saat close().
+        """
+        f = io.BytesIO(src) if isinstance(src, (bytes, bytearray)) else src
+        size = f.seek(0, os.SEEK_END)
+        f.seek(0)
+        if ijson is not None:
+            root = self._split_stream(f) if size else None
+        else:
+            lhr = json.load(f).get("lighthouseResult") if size else None
+            root = {} if isinstance(lhr, dict) else None
+            for key, value in (lhr or {}).items():
+                if key == "audits" and isinstance(value, dict):
+                    for aid, a in value.items():
+                        self._place(root, key, a, aid)
+                else:
+                    self._place(root, key, value)
+        if root is None:
+            return None
+        sha = self._put_blob(root)["$blob"]
+        with self._lock:
+            self._pending[sha] = (_utc(root.get("fetchTime")), size)
+        if index:
+            self.record(url, strategy, sha)
+        return sha
+
+    def record(self, url: str, strategy: str, sha: str) -> bool:
+        """Tulis entry index untuk root `sha` hasil put() run ini; False kalau sha tidak dikenal."""
+        with self._lock:
+            if sha not in self._pending:
+                return False
+            fetch_time, size = self._pending.pop(sha)
+            entry = {"url": normalize_url(url), "strategy": strategy, "fetch_time": fetch_time,
+                     "root": sha, "raw_bytes": size}
+            seg = self.root / "index" / fetch_time[:7] / f"{self._run}.jsonl"
+            seg.parent.mkdir(parents=True, exist_ok=True)
+            with seg.open("a", encoding="utf-8") as fh:
+                fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.raw_bytes += size
+            self.reports += 1
+        return True
+
+    def entries(self, url: str | None = None, strategy: str | None = None) -> list[dict]:
+        """Entry index urut fetch_time, difilter url (dinormalisasi) / strategy."""
+        url = normalize_url(url) if url else None
+        out = []
+        for seg in (self.root / "index").glob("*/*.jsonl"):
+            for line in seg.read_text(encoding="utf-8").splitlines():
+                e = json.loads(line)
+                if (url is None or e["url"] == url) and (strategy is None or e["strategy"] == strategy):
+                    out.append(e)
+        out.sort(key=lambda e: e["fetch_time"])
+        return out
+
+    def load(self, sha: str) -> dict:
+        """Rakit ulang LHR lengkap dari blob root."""
+        def expand(v):
+            if isinstance(v, dict):
+                if set(v) == {"$blob"}:
+                    return expand(self._get_blob(v["$blob"]))
+                return {k: expand(x) for k, x in v.items()}
+            return v
+        return expand(self._get_blob(sha))
+
+    def get(self, url: str, strategy: str, at=None) -> dict | None:
+        """LHR terakhir untuk url x strategy dengan fetch_time <= `at` (ISO / datetime; default terbaru)."""
+        at = ts_str(at)
+        hits = [e for e in self.entries(url, strategy) if at is None or e["fetch_time"] <= at]
+        return self.load(hits[-1]["root"]) if hits else None
+
+    # ---- retention ----
+    def apply_retention(self, now: datetime | None = None, days: int = LHR_RETENTION_DAYS) -> int:
+        """Buang entry index lebih tua dari `days` hari lalu hapus blob yang tidak lagi direferensikan."""
+        cutoff = ts_str((now or datetime.now(timezone.utc)) - timedelta(days=days))
+        dropped = 0
+        for seg in (self.root / "index").glob("*/*.jsonl"):
+            lines = seg.read_text(encoding="utf-8").splitlines()
+            keep = [ln for ln in lines if json.loads(ln)["fetch_time"] >= cutoff]
+            if len(keep) == len(lines):
+                continue
+            dropped += len(lines) - len(keep)
+            if keep:
+                atomic_write_text(seg, "\n".join(keep) + "\n")
+            else:
+                seg.unlink()
+        if dropped:
+            self._gc()
+        return dropped
+
+    def _gc(self):
+        # referensi blob hanya ada di root: bagian SPLIT_KEYS, audits.* dan i18n.*
+        # -> cukup dekompres blob root, blob bagian tidak perlu dibuka
+        live = set()
+        for e in self.entries():
+            if e["root"] in live:
+                continue
+            live.add(e["root"])
+            for v in self._get_blob(e["root"]).values():
+                for x in (v.values() if isinstance(v, dict) and set(v) != {"$blob"} else (v,)):
+                    if isinstance(x, dict) and set(x) == {"$blob"}:
+                        live.add(x["$blob"])
+        removed = 0
+        for p in (self.root / "blobs").glob("*/*.*"):
+            if p.name.split(".")[0] not in live:
+                p.unlink()
+                removed += 1
+        print(f"LHR archive: {removed} blob tidak terpakai dihapus")
+
+    def close(self):
+        if self.reports:
+            print(f"LHR archive: {self.reports} report, {self.raw_bytes / 1e6:.1f} MB raw -> "
+                  f"{self.stored_bytes / 1e6:.2f} MB blob baru ({'zstd' if zstandard else 'gzip'}) -> {self.root}")
+        self.maybe_train_dict()
+        if not self.apply_retention() and self._pending:
+            self._gc()  # sample yang tidak dipilih (bukan run median)
+        self._pending.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ambil Lighthouse report lengkap dari archive")
+    parser.add_argument("url", nargs="?")
+    parser.add_argument("--strategy", default="mobile", choices=["mobile", "desktop"])
+    parser.add_argument("--at", default=None, help="Report terakhir sebelum waktu ini (ISO UTC); default terbaru")
+    parser.add_argument("--list", action="store_true", help="Tampilkan daftar run yang ada")
+    parser.add_argument("--root", default=None, help="Report persis untuk sha `lhr_root` di row hasil / history")
+    parser.add_argument("--out", default=None, help="Tulis JSON ke file (default stdout)")
+    parser.add_argument("--archive", default=str(ARCHIVE_DIR))
+    args = parser.parse_args()
+
+    if not args.url and not args.root:
+        parser.error("butuh url atau --root")
+    archive = LHRArchive(args.archive)
+    if args.list:
+        for e in archive.entries(args.url, args.strategy):
+            print(e["fetch_time"], e["root"][:12], f"{e['raw_bytes'] / 1e6:.2f} MB")
+        return
+    try:
+        lhr = archive.load(args.root) if args.root else archive.get(args.url, args.strategy, at=args.at)
+    except KeyError:
+        lhr = None
+    if lhr is None:
+        raise SystemExit("Report tidak ditemukan")
+    text = json.dumps(lhr, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
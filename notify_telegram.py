@@ -1,4 +1,9 @@
 import os
+import re
+import html
+import queue
+import random
+import threading
 import requests
 from datetime import datetime, timezone, timedelta
 import argparse
@@ -6,11 +11,15 @@ import time  # tambahan
 
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")  # single chat or channel id (@channelusername)
+# bisa diarahkan ke fake Bot API server lokal untuk testing
+API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org")
 
-def _post(text: str) -> bool:
-    if not BOT_TOKEN or not CHAT_ID:
-        return False
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
+MAX_MESSAGE_LEN = 4096
+MAX_ATTEMPTS = 5
+
+def _send_once(session, text: str) -> tuple[bool, float | None]:
+    """Satu sendMessage. Return (sukses, retry_after detik atau None jika tidak perlu retry)."""
+    url = f"{API_BASE}/bot{BOT_TOKEN}/sendMessage"
     payload = {
         "chat_id": CHAT_ID,
         "text": text,
@@ -18,11 +27,241 @@ def _post(text: str) -> bool:
         "disable_web_page_preview": True,
     }
     try:
-        r = requests.post(url, json=payload, timeout=20)
-        r.raise_for_status()
-        return True
-    except Exception:
+        r = session.post(url, json=payload, timeout=20)
+    except (requests.ConnectionError, requests.Timeout):
+        return False, 0.0
+    if r.ok:
+        return True, None
+    if r.status_code == 429 or r.status_code >= 500:
+        try:
+            retry_after = float(((r.json() or {}).get("parameters") or {}).get("retry_after") or 0)
+        except Exception:
+            retry_after = 0.0
+        return False, retry_after
+    return False, None  # 4xx lain (token / chat salah, HTML invalid): tidak di-retry
+
+def _send_with_retry(session, text: str) -> bool:
+    for attempt in range(MAX_ATTEMPTS):
+        ok, retry_after = _send_once(session, text)
+        if ok:
+            return True
+        if retry_after is None or attempt == MAX_ATTEMPTS - 1:
+            break
+        time.sleep(retry_after or min(30.0, 2 ** attempt) * (0.5 + random.random() / 2))
+    print("Telegram send failed after retries")
+    return False
+
+def _post(text: str) -> bool:
+    if not BOT_TOKEN or not CHAT_ID:
         return False
+    with requests.Session() as session:
+        return all(_send_with_retry(session, part) for part in split_message(text))
+
+# token HTML Telegram: tag, entity, teks biasa, atau '<' / '&' lepas
+_HTML_TOKEN = re.compile(r"<[^<>]*>|&#?\w+;|[^<&]+|[<&]")
+_TAG_NAME = re.compile(r"<\s*(/?)\s*([\w-]+)")
+
+def _hard_split(line: str, limit: int) -> list[str]:
+    """
+    Potong satu baris > limit tanpa memotong tag / entity HTML; tag yang masih
+    terbuka di titik potong ditutup lalu dibuka lagi di bagian berikutnya
+    (kalau tag pembuka terlalu panjang untuk diulang, markup-nya dibuang).
+    """
+    parts, cur, stack = [], "", []  # stack: [(nama tag, tag pembuka)]
+
+    def closing() -> str:
+        return "".join(f"</{name}>" for name, _ in reversed(stack))
+
+    def flush():
+        nonlocal cur
+        if cur != "".join(tag for _, tag in stack):  # bagian tanpa isi tidak dikirim
+            parts.append(cur + closing())
+        if sum(len(tag) + len(name) + 3 for name, tag in stack) > limit // 2:
+            stack.clear()
+        cur = "".join(tag for _, tag in stack)
+
+    for tok in _HTML_TOKEN.findall(line):
+        m = _TAG_NAME.match(tok) if tok.startswith("<") else None
+        if m and m.group(1):  # tag penutup
+            if not stack or stack[-1][0] != m.group(2):
+                continue  # pembukanya sudah dibuang / tidak cocok
+            stack.pop()
+            cur += tok
+            continue
+        if m or (tok.startswith("&") and len(tok) > 1):
+            extra = len(m.group(2)) + 3 if m else 0
+            if len(cur) + len(tok) + len(closing()) + extra > limit:
+                flush()
+            cur += tok
+            if m:
+                stack.append((m.group(2), tok))
+            continue
+        while tok:
+            room = limit - len(cur) - len(closing())
+            if room <= 0:
+                flush()
+                room = max(1, limit - len(cur) - len(closing()))
+            cur, tok = cur + tok[:room], tok[room:]
+            if tok:
+                flush()
+    flush()
+    return parts
+
+def split_message(text: str, limit: int = MAX_MESSAGE_LEN) -> list[str]:
+    """
+    Pecah teks per baris supaya tiap bagian <= limit. Baris tunggal yang terlalu
+    panjang dipotong di batas tag / entity (tag terbuka ditutup + dibuka lagi),
+    jadi tiap bagian tetap HTML valid untuk parse_mode=HTML.
+    """
+    parts, cur = [], ""
+    for line in text.split("\n"):
+        if len(line) > limit:  # baris tunggal terlalu panjang: potong paksa
+            if cur:
+                parts.append(cur)
+                cur = ""
+            *full, line = _hard_split(line, limit)
+            parts += full
+        cand = f"{cur}\n{line}" if cur else line
+        if len(cand) > limit:
+            parts.append(cur)
+            cur = line
+        else:
+            cur = cand
+    if cur:
+        parts.append(cur)
+    return parts
+
+class TelegramNotifier:
+    """
+    Pengirim pesan di background thread. send() hanya memasukkan pesan ke queue
+    sehingga pipeline utama (history, render) tetap jalan; pesan dikirim
+    berurutan dengan retry (429 retry_after / 5xx / network). close() menunggu
+    queue habis.
+    """
+
+    def __init__(self):
+        self._q: queue.Queue = queue.Queue()
+        self._session = requests.Session()
+        self.sent = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._worker, name="telegram-notifier", daemon=True)
+        self._thread.start()
+
+    def _worker(self):
+        while True:
+            text = self._q.get()
+            try:
+                if text is None:
+                    return
+                if _send_with_retry(self._session, text):
+                    self.sent += 1
+                else:
+                    self.failed += 1
+            finally:
+                self._q.task_done()
+
+    def send(self, text: str):
+        for part in split_message(text):
+            self._q.put(part)
+
+    def close(self, timeout: float = 60.0) -> bool:
+        """Tunggu semua pesan terkirim (maks `timeout` detik). Return True jika tidak ada yang gagal."""
+        self._q.put(None)
+        self._thread.join(timeout)
+        self._session.close()
+        if self._thread.is_alive():
+            print("Telegram notifier: timeout, sebagian pesan belum terkirim")
+        return self.failed == 0 and not self._thread.is_alive()
+
+def _error_code(err: str) -> str:
+    m = re.search(r"(\b\d{3}\b)", err or "")
+    return m.group(1) if m else "ERR"
+
+def _fmt_delta(d) -> str:
+    if d is None:
+        return ""
+    return f" ({'▲' if d > 0 else '▼'}{abs(d):g})" if d else " (=)"
+
+def build_run_summary(results, title: str = "PageSpeed Report", previous: dict | None = None,
+                      worst_n: int = 5, delta_n: int = 5) -> str:
+    """
+    Ringkasan satu run: jumlah ok/error, rata-rata performance per strategy
+    (delta vs run sebelumnya), halaman terburuk, error per kode, dan perubahan
+    skor performance terbesar dibanding run sebelumnya.
+    """
+    from utils_history import normalize_url
+
+    previous = previous or {}
+    wib = timezone(timedelta(hours=7))
+    ts = datetime.now(wib).strftime("%d/%m/%Y %H:%M:%S WIB")
+    ok = [r for r in results if not r.get("error")]
+    errs = [r for r in results if r.get("error")]
+
+    def prev_perf(r):
+        p = previous.get((normalize_url(r.get("url", "")), r.get("strategy")))
+        return p.get("performance") if p else None
+
+    lines = [f"<b>{html.escape(title)}</b>", f"Tanggal & Waktu: <b>{ts}</b>",
+             f"URL dicek: <b>{len(results)}</b> (ok {len(ok)}, error {len(errs)})"]
+
+    avgs = []
+    for strat in ("mobile", "desktop"):
+        cur = [r["performance"] for r in ok if r.get("strategy") == strat]
+        if not cur:
+            continue
+        prev = [p for p in (prev_perf(r) for r in ok if r.get("strategy") == strat) if p is not None]
+        avg = sum(cur) / len(cur)
+        d = round(avg - sum(prev) / len(prev), 1) if prev else None
+        avgs.append(f"{strat} <b>{avg:.0f}</b>{_fmt_delta(d)}")
+    if avgs:
+        lines.append("Rata-rata performance: " + " | ".join(avgs))
+
+    if ok:
+        lines += ["", "<b>Skor performance terendah</b>"]
+        for i, r in enumerate(sorted(ok, key=lambda r: r.get("performance") or 0)[:worst_n], start=1):
+            p = prev_perf(r)
+            d = r["performance"] - p if p is not None else None
+            lines.append(f"{i}. <b>{r['performance']}</b> [{r.get('strategy')}] {html.escape(r.get('url', ''))}{_fmt_delta(d)}")
+
+    if errs:
+        by_code: dict[str, int] = {}
+        for r in errs:
+            code = _error_code(r.get("error"))
+            by_code[code] = by_code.get(code, 0) + 1
+        lines += ["", "<b>Error per kode</b>"]
+        lines += [f"{code}: {n}" for code, n in sorted(by_code.items(), key=lambda kv: -kv[1])]
+
+    deltas = []
+    for r in ok:
+        p = prev_perf(r)
+        if p is not None and r["performance"] != p:
+            deltas.append((r["performance"] - p, r))
+    if deltas:
+        lines += ["", "<b>Perubahan terbesar vs run sebelumnya</b>"]
+        for d, r in sorted(deltas, key=lambda x: -abs(x[0]))[:delta_n]:
+            lines.append(f"{'▲' if d > 0 else '▼'} {d:+d} [{r.get('strategy')}] {html.escape(r.get('url', ''))}")
+    return "\n".join(lines)
+
+def notify_run(results, title: str = "PageSpeed Report", previous: dict | None = None):
+    """
+    Mulai pengiriman ringkasan run di background. `previous` = map
+    (url, strategy) -> row run sebelumnya; default diambil dari history store
+    (panggil sebelum history run ini ditulis). Return TelegramNotifier (panggil
+    close() di akhir pipeline) atau None jika Telegram tidak dikonfigurasi.
+    """
+    if not BOT_TOKEN or not CHAT_ID:
+        print("Telegram notify skipped: TELEGRAM_BOT_TOKEN / TELEGRAM_CHAT_ID kosong")
+        return None
+    if previous is None:
+        try:
+            from utils_history import latest_rows
+            previous = latest_rows()
+        except Exception as e:
+            print("Telegram notify: previous run unavailable:", e)
+            previous = {}
+    notifier = TelegramNotifier()
+    notifier.send(build_run_summary(results, title=title, previous=previous))
+    return notifier
 
 # === tambahan
 def format_duration(seconds: int) -> str:
@@ -54,6 +293,18 @@ def notify_simple_report(status: str = "SUCCESS") -> bool:
     ]
     return _post("\n".join(lines))
 
+def notify_regressions(report: dict, notifier: TelegramNotifier | None = None) -> bool:
+    """Kirim ringkasan seri yang terdeteksi regresi (jika ada); lewat notifier background bila diberikan."""
+    from regression import format_regression_report
+
+    text = format_regression_report(report)
+    if not text:
+        return False
+    if notifier is not None:
+        notifier.send(text)
+        return True
+    return _post(text)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--status", default="SUCCESS", help="Status laporan (SUCCESS/FAILED)")
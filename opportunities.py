@@ -0,0 +1,52 @@
+from __future__ import annotations
+import json
+from pathlib import Path
+
+from history_store import atomic_write_text
+from utils_history import normalize_url
+
+OPPORTUNITIES_FILE = Path("dashboard/opportunities.json")
+
+
+def build_index(rows) -> list[dict]:
+    """
+    Inverted index resource -> halaman (url x strategy) yang terdampak, dari
+    `row["opportunities"]` ([audit, resource, wasted_ms, wasted_bytes]).
+    Per resource: audit yang menyebutnya, jumlah halaman, total penghematan
+    ms / bytes lintas halaman. Urut total ms, lalu bytes (terbesar dulu).
+    """
+    index: dict[str, dict] = {}
+    seen = set()
+    for r in rows:
+        page = (normalize_url(r.get("url")), r.get("strategy"))
+        if r.get("error") or page in seen:  # baris duplikat di urls.csv dihitung sekali
+            continue
+        seen.add(page)
+        per_res: dict[str, list] = {}
+        for audit, res, ms, nbytes in r.get("opportunities") or ():
+            # satu resource bisa muncul di beberapa audit yang penghematannya
+            # overlap (mis. unused + unminified): per halaman ambil yang terbesar
+            agg = per_res.setdefault(res, [set(), 0, 0])
+            agg[0].add(audit)
+            agg[1] = max(agg[1], ms or 0)
+            agg[2] = max(agg[2], nbytes or 0)
+        for res, (audits, ms, nbytes) in per_res.items():
+            e = index.setdefault(res, {"resource": res, "audits": set(), "pages": [], "total_ms": 0, "total_bytes": 0})
+            e["audits"] |= audits
+            e["pages"].append([page[0], page[1], ms, nbytes])
+            e["total_ms"] += ms
+            e["total_bytes"] += nbytes
+
+    out = []
+    for e in index.values():
+        e["audits"] = sorted(e["audits"])
+        e["pages"].sort(key=lambda p: (-p[2], -p[3]))
+        e["page_count"] = len({p[0] for p in e["pages"]})
+        out.append(e)
+    out.sort(key=lambda e: (-e["total_ms"], -e["total_bytes"], e["resource"]))
+    return out
+
+
+def write_index(index, out_path: Path = OPPORTUNITIES_FILE):
+    atomic_write_text(out_path, json.dumps({"resources": index}, ensure_ascii=False, separators=(",", ":")) + "\n")
+    print(f"Opportunities: {len(index)} resources -> {out_path}")
@@ -0,0 +1,149 @@
+from __future__ import annotations
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+QUOTA_STATUS = {429}
+
+
+class CircuitOpenError(RuntimeError):
+    """Dilempar saat circuit breaker terbuka (kuota PSI habis untuk run ini)."""
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Header Retry-After: detik (int) atau HTTP-date. Return detik dari sekarang."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        dt = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return max(0.0, (dt - datetime.now(timezone.utc)).total_seconds())
+
+
+class PSIClient:
+    """
+    Client HTTP untuk PSI API: satu Session keep-alive (connection pool),
+    retry dengan exponential backoff + jitter, hormati Retry-After, dan circuit
+    breaker per run yang berhenti memanggil API setelah `breaker_threshold`
+    quota error (429) berturut-turut.
+
+    Dengan `keys` (psi_keys.KeyPool) setiap attempt memakai key dari pool;
+    429 dihitung per key dan breaker baru terbuka saat semua key habis.
+    """
+
+    def __init__(self, endpoint: str, timeout: float = 60, max_retries: int = 4,
+                 backoff_base: float = 2.0, backoff_max: float = 60.0,
+                 pool_size: int = 10, breaker_threshold: int = 5, limiter=None, keys=None):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = max(1, int(breaker_threshold))
+        self.limiter = limiter
+        self.keys = keys
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, int(pool_size)), max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self._quota_streak = 0
+        self._open = False
+
+    # ---- circuit breaker ----
+    @property
+    def breaker_open(self) -> bool:
+        return self._open
+
+    def _record_quota_error(self):
+        with self._lock:
+            self._quota_streak += 1
+            if self._quota_streak >= self.breaker_threshold:
+                self._open = True
+
+    def _record_success(self):
+        with self._lock:
+            self._quota_streak = 0
+
+    def _backoff(self, attempt: int) -> float:
+        cap = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return cap / 2 + random.uniform(0, cap / 2)
+
+    # ---- request ----
+    def get(self, params: dict, stream: bool = False) -> requests.Response:
+        """
+        GET ke endpoint PSI dengan retry. Response yang dikembalikan sudah lolos
+        raise_for_status(); jumlah retry disimpan di atribut `retries` (juga pada
+        exception yang dilempar).
+        """
+        last_exc: Exception | None = None
+        attempt = 0
+        try:
+            for attempt in range(self.max_retries + 1):
+                if self._open:
+                    raise CircuitOpenError("PSI quota circuit open; skipping remaining calls")
+                if self.limiter is not None:
+                    self.limiter.acquire()
+                key = None
+                if self.keys is not None:
+                    try:
+                        key = self.keys.acquire()
+                    except CircuitOpenError:
+                        self._open = True
+                        raise
+                    params = {**params, "key": key}
+
+                try:
+                    r = self.session.get(self.endpoint, params=params, timeout=self.timeout, stream=stream)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    if key is not None:
+                        self.keys.report(key, None)
+                    last_exc = e
+                    if attempt < self.max_retries:
+                        time.sleep(self._backoff(attempt))
+                    continue
+
+                if key is not None:
+                    # body 429 PSI: "Quota exceeded for quota metric 'Queries' and limit 'Queries per day' ..."
+                    daily = r.status_code in QUOTA_STATUS and "per day" in (r.text or "")
+                    self.keys.report(key, r.status_code, daily=daily)
+                if r.status_code in RETRY_STATUS:
+                    if r.status_code in QUOTA_STATUS and key is None:
+                        self._record_quota_error()
+                    if attempt >= self.max_retries or self._open:
+                        r.raise_for_status()
+                    delay = parse_retry_after(r.headers.get("Retry-After"))
+                    if delay is None:
+                        delay = self._backoff(attempt)
+                    r.close()
+                    time.sleep(min(delay, self.backoff_max))
+                    continue
+
+                r.raise_for_status()
+                self._record_success()
+                r.retries = attempt
+                return r
+
+            raise last_exc or RuntimeError("PSI request failed")
+        except Exception as e:
+            e.retries = attempt  # dicatat juga di row error
+            raise
+
+    def close(self):
+        self.session.close()
@@ -1,19 +1,71 @@
 # pagespeed-monitor-ci/psi_csv_dashboard.py
 
-import os, csv, json, argparse, time
+from __future__ import annotations
+
+import os, csv, json, argparse, atexit, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
-import requests
-from dotenv import load_dotenv
-from utils_history import append_history_with_rotation
+from typing import TYPE_CHECKING
+from dashboard_build import CHART_JS_URL, build_dashboard
+from opportunities import build_index, write_index
+from sampling import SPREAD_FIELDS
+from utils_history import HISTORY_DIR, append_history_with_rotation, latest_rows, normalize_url
+from utils_journal import JOURNAL_FILE, RunJournal
+from utils_lhr import (CATEGORY_FIELDS, METRIC_FIELDS, SCORE_FIELDS, extract_metrics, extract_opportunities,
+                       lab_paths, metric_labels, opportunity_paths, parse_psi_stream)
+from utils_metrics import URL_METRIC_FIELDS, RunMetrics
+from utils_ratelimit import TokenBucket, rate_from_args
+from utils_shard import PARTIAL_DIR, parse_shard, partial_path, read_partials, shard_items, write_partial
+
+if TYPE_CHECKING:
+    from lhr_archive import LHRArchive
+    from psi_client import PSIClient
+
+# requests / dotenv hanya di-import stage yang butuh network (collect, notify):
+# render dan history dari psi_results.json jalan tanpa keduanya
+COMMANDS = ("collect", "render", "history", "notify", "all")
+DEFAULT_PSI_ENDPOINT = "https://www.googleapis.com/pagespeedonline/v5/runPagespeed"
+RUN_TIMING_PATHS = ("lighthouseResult.timing.total", "lighthouseResult.fetchTime")
+DATA_MODE_THRESHOLD = 200  # render_mode="auto": di atas ini kartu di-render di browser
+OPP_EMBED_LIMIT = 200  # resource teratas di tab Opportunities (opportunities.json berisi semua)
+HISTORY_DEFER_DAYS = 35  # umur maksimal hasil lama yang masih ditampilkan untuk URL yang ditunda
+REGRESSION_REPORT = Path("dashboard/regressions.json")  # = regression.REPORT_FILE, dibaca tanpa import numpy
+
+
+def load_env():
+    from dotenv import load_dotenv
+    load_dotenv()
 
-load_dotenv()
 
-PSI_ENDPOINT = "https://www.googleapis.com/pagespeedonline/v5/runPagespeed"
+def psi_endpoint() -> str:
+    return os.getenv("PSI_ENDPOINT", DEFAULT_PSI_ENDPOINT)
 
 
 # ---------------- PSI Runner ----------------
-def run_psi(url: str, strategy: str = "mobile", api_key: str = "", locale: str = "en"):
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def default_client() -> PSIClient:
+    """
+    PSIClient bersama untuk run_psi tanpa `client` (satu Session, koneksi di-reuse
+    antar call); dibuat ulang kalau PSI_ENDPOINT berubah, ditutup saat exit.
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None or _default_client.endpoint != psi_endpoint():
+            from psi_client import PSIClient
+            if _default_client is None:
+                atexit.register(lambda: _default_client and _default_client.close())
+            else:
+                _default_client.close()
+            _default_client = PSIClient(psi_endpoint(), max_retries=0)
+        return _default_client
+
+
+def run_psi(url: str, strategy: str = "mobile", api_key: str = "", locale: str = "en",
+            client: PSIClient | None = None, archive: LHRArchive | None = None):
     params = {
         "url": url,
         "strategy": strategy,
@@ -23,11 +75,32 @@ def run_psi(url: str, strategy: str = "mobile", api_key: str = "", locale: str =
     if api_key:
         params["key"] = api_key
 
-    r = requests.get(PSI_ENDPOINT, params=params, timeout=60)
-    r.raise_for_status()
-    data = r.json()
+    client = client or default_client()
+    r = client.get(params, stream=True)
+    chunks = r.iter_content(chunk_size=64 * 1024)
+    spool = lhr_root = None
+    if archive is not None:
+        # salinan response di-spool ke file temp (bukan memori), di-split streaming oleh archive
+        from lhr_archive import tee_chunks
+        spool = tempfile.TemporaryFile()
+        chunks = tee_chunks(chunks, spool)
+    try:
+        try:
+            data, nbytes, parse_ms = parse_psi_stream(chunks, paths=lab_paths() + opportunity_paths() + RUN_TIMING_PATHS)
+        finally:
+            r.close()
+        if archive is not None:
+            try:
+                # entry index baru ditulis untuk row yang dipilih (run median), lihat _one
+                lhr_root = archive.put(url, strategy, spool, index=False)
+            except Exception as e:  # archive gagal tidak menggagalkan hasil PSI
+                print(f"LHR archive skipped for {url} [{strategy}]: {e}")
+    finally:
+        if spool is not None:
+            spool.close()
     lh = data.get("lighthouseResult", {}) or {}
     cats = (lh.get("categories") or {})
+    lh_total = (lh.get("timing") or {}).get("total")
 
     def get_score(cat):
         v = (cats.get(cat) or {}).get("score")
@@ -43,13 +116,31 @@ def run_psi(url: str, strategy: str = "mobile", api_key: str = "", locale: str =
         "accessibility": get_score("accessibility"),
         "best_practices": get_score("best-practices"),
         "seo": get_score("seo"),
+        **extract_metrics(data),
+        "response_bytes": nbytes,
+        "parse_ms": round(parse_ms, 1),
+        "retries": getattr(r, "retries", 0),
+        "lh_total_ms": round(lh_total, 1) if isinstance(lh_total, (int, float)) else None,
+        "fetch_time": lh.get("fetchTime"),
+        "opportunities": extract_opportunities(data),
+        **({"lhr_root": lhr_root} if lhr_root else {}),
     }
 
 
-def collect_psi_results(csv_path: str, sleep_sec: float = 2.0):
-    api_key = os.getenv("PSI_API_KEY", "")
-    locale = os.getenv("LOCALE", "en")
+def _error_row(url: str, strategy: str, err: Exception) -> dict:
+    return {
+        "url": url, "strategy": strategy,
+        "performance": 0,
+        "accessibility": 0,
+        "best_practices": 0,
+        "seo": 0,
+        "error": str(err),
+        "retries": getattr(err, "retries", 0),
+    }
+
 
+def read_url_items(csv_path: str) -> list[tuple[str, str]]:
+    """Baca urls.csv -> [(url, strategy), ...] sesuai urutan file."""
     items = []
     with open(csv_path, "r", encoding="utf-8") as f:
         rd = csv.DictReader(f)
@@ -61,40 +152,199 @@ def collect_psi_results(csv_path: str, sleep_sec: float = 2.0):
 
     if not items:
         raise SystemExit("urls.csv empty or invalid (expected headers: url,strategy).")
+    return items
+
+
+def collect_psi_results(csv_path: str, sleep_sec: float = 2.0, concurrency: int = 1,
+                        rps: float | None = None, rpm: float | None = None,
+                        max_retries: int = 4, breaker_threshold: int = 5,
+                        journal_path: str | None = None, resume: bool = False,
+                        resume_max_age_hours: float = 12.0, budget_calls: int | None = None,
+                        budget_minutes: float | None = None, schedule: bool = False,
+                        shard: tuple[int, int] | None = None, samples_max: int = 1,
+                        sample_threshold: float = 5.0, key_daily_quota: int | None = None,
+                        archive_lhr: bool = False, key_usage_delta: Path | None = None):
+    """
+    Jalankan PSI untuk semua baris urls.csv. Call dibagi ke `concurrency` worker
+    thread dan dibatasi token bucket bersama (rps/rpm; fallback 1/sleep_sec).
+    Semua worker memakai satu PSIClient (keep-alive pool, retry, circuit breaker).
+
+    Setiap hasil langsung ditulis ke journal (JSONL). Dengan `resume`, pasangan
+    url/strategy yang sudah sukses dalam `resume_max_age_hours` terakhir tidak
+    dipanggil ulang. Hasil akhir dibangun dari journal, urut sesuai input.
+
+    Dengan budget (`budget_calls` / `budget_minutes`) atau `schedule`, scheduler
+    memilih URL bernilai tertinggi (staleness, volatilitas, dekat batas skor)
+    dan menunda sisanya ke run berikutnya; budget menit juga jadi deadline.
 
-    results = []
-    for i, (u, st) in enumerate(items, start=1):
+    `shard` (i, N): hanya kerjakan partisi ke-i dari N (hash url/strategy).
+
+    `samples_max` > 1: sample tambahan hanya untuk URL yang skornya menyimpang
+    > `sample_threshold` poin dari baseline history (lihat sampling.measure).
+
+    API key dari psi_keys.load_api_keys(); dengan lebih dari satu key, rate
+    limit berlaku per key (throughput total = rate x jumlah key). Runner shard
+    menulis pemakaian key run ini ke `key_usage_delta` (digabung oleh --merge).
+
+    `archive_lhr`: simpan Lighthouse result lengkap ke lhr_archive (dedup +
+    kompresi); retention mengikuti history raw.
+    """
+    from psi_client import CircuitOpenError, PSIClient
+    from psi_keys import DAILY_QUOTA, KeyPool, load_api_keys
+
+    api_keys = load_api_keys()
+    locale = os.getenv("LOCALE", "en")
+
+    items = read_url_items(csv_path)
+    if shard:
+        items = shard_items(items, *shard)
+    journal = RunJournal(journal_path or JOURNAL_FILE)
+    if resume:
+        done = journal.fresh_successes(resume_max_age_hours)
+        todo = [it for it in items if it not in done]
+        print(f"Resume: {len(items) - len(todo)} hasil masih fresh di {journal.path}, {len(todo)} URL dijalankan ulang")
+    else:
+        journal.reset()
+        todo = list(items)
+
+    rate = rate_from_args(rps, rpm, sleep_sec)
+    # --breaker-threshold berlaku per key: key dikeluarkan setelah N x 429 berturut-turut
+    key_pool = KeyPool(api_keys, rate, daily_quota=key_daily_quota or DAILY_QUOTA,
+                       quota_errors=breaker_threshold, delta_path=key_usage_delta) if api_keys else None
+    deadline = None
+    if budget_calls or budget_minutes or schedule:
+        import scheduler
+        max_calls = scheduler.budget_calls(budget_calls, budget_minutes, concurrency, rate * len(api_keys or [""]))
+        if key_pool and max_calls:
+            max_calls = min(max_calls, max(1, key_pool.remaining()))
+        # budget dihitung dalam call: tiap URL bisa makan sampai samples_max call
+        max_urls = max(1, max_calls // max(1, samples_max)) if max_calls else None
+        todo, deferred = scheduler.plan_run(todo, csv_path, max_urls)
+        note = f"budget {max_calls} call" + (f", maks {samples_max} sample per URL" if samples_max > 1 else "")
+        print(f"Scheduler: {len(todo)} URL dites, {len(deferred)} ditunda ke run berikutnya"
+              + (f" ({note})" if max_calls else ""))
+        if budget_minutes:
+            deadline = time.monotonic() + budget_minutes * 60
+
+    workers = max(1, min(int(concurrency or 1), len(todo) or 1))
+    bucket = None if key_pool else TokenBucket(rate)
+    client = PSIClient(psi_endpoint(), max_retries=max_retries, breaker_threshold=breaker_threshold,
+                       pool_size=workers, limiter=bucket, keys=key_pool)
+
+    baselines = None
+    if samples_max > 1:
+        import sampling
+        baselines = sampling.baseline_scores()
+    archive = None
+    if archive_lhr:
+        from lhr_archive import LHRArchive
+        archive = LHRArchive()
+
+    def _sample(u, st):
         try:
-            res = run_psi(u, st, api_key, locale)
+            return run_psi(u, st, "", locale, client=client, archive=archive)  # key diisi oleh pool
+        except CircuitOpenError:
+            return None  # breaker terbuka: tidak diukur (bukan error), dashboard pakai row history terakhir
         except Exception as e:
-            res = {
-                "url": u, "strategy": st,
-                "performance": 0,
-                "accessibility": 0,
-                "best_practices": 0,
-                "seo": 0,
-                "error": str(e),
-            }
-        results.append(res)
-        time.sleep(sleep_sec)
+            return _error_row(u, st, e)
+
+    def _one(u, st):
+        if deadline is not None and time.monotonic() >= deadline:
+            return None  # budget waktu habis: ditunda ke run berikutnya
+        t0 = time.perf_counter()
+        if baselines is None:
+            res = _sample(u, st)
+        else:
+            res = sampling.measure(lambda: _sample(u, st), u, st, baselines,
+                                   max_samples=samples_max, threshold=sample_threshold)
+        if res is None:
+            return None  # tidak masuk journal / history; carried_rows mengisi dari history
+        res["request_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        if archive is not None and res.get("lhr_root"):
+            # hanya report run yang dipilih (median) yang masuk index archive
+            archive.record(res["url"], res["strategy"], res["lhr_root"])
+        journal.append(res)
+        return res
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for fut in as_completed([pool.submit(_one, u, st) for u, st in todo]):
+                fut.result()
+    finally:
+        client.close()
+        if key_pool:
+            key_pool.save()
+        if archive:
+            archive.close()
+    results = journal.rows_for(items)
+    if key_pool:
+        print(f"PSI keys: {key_pool.active}/{len(key_pool.keys)} aktif")
+        print("\n".join(key_pool.summary_lines()))
+    if client.breaker_open:
+        print("PSI circuit breaker open: quota errors berulang, sisa URL dilewati.")
+    ok = [r for r in results if not r.get("error")]
+    extra = sum(r.get("samples", 1) - 1 for r in ok)
+    if extra:
+        print(f"Multi-sample: {extra} sample tambahan untuk {sum(1 for r in ok if r.get('samples', 1) > 1)} URL")
+    if ok:
+        total_bytes = sum(r.get("response_bytes") or 0 for r in ok)
+        total_ms = sum(r.get("parse_ms") or 0 for r in ok)
+        print(f"PSI responses: {len(ok)} ok, {total_bytes / 1e6:.1f} MB read, {total_ms / 1000:.1f}s read+parse")
     return results
 
 
+def carried_rows(results, csv_path: str) -> list[dict]:
+    """Row history terakhir (ditandai `deferred`) untuk URL di csv yang tidak dites run ini."""
+    got = {(normalize_url(r.get("url")), r.get("strategy")) for r in results}
+    missing = [(normalize_url(u), s) for u, s in dict.fromkeys(read_url_items(csv_path))]
+    missing = [k for k in missing if k not in got]
+    if not missing:
+        return []
+    last = latest_rows(days=HISTORY_DEFER_DAYS)
+    return [{**last[k], "deferred": True} for k in missing if k in last]
+
+
 def write_csv_and_json(rows, out_csv, out_json):
-    fields = ["url", "strategy", "performance", "accessibility", "best_practices", "seo", "error"]
+    fields = ["url", "strategy", *SCORE_FIELDS, "error", *METRIC_FIELDS, *CATEGORY_FIELDS,
+              *SPREAD_FIELDS, *URL_METRIC_FIELDS, "lhr_root"]
     with open(out_csv, "w", newline="", encoding="utf-8") as f:
         w = csv.DictWriter(f, fieldnames=fields)
         w.writeheader()
         for r in rows:
             w.writerow({k: r.get(k) for k in fields})
 
-    # biarkan struktur JSON original agar kompatibel dengan history aggregator
+    # biarkan struktur JSON original agar kompatibel dengan history aggregator;
+    # generated_at = waktu run (UTC), dipakai stage history / notify yang jalan terpisah
+    generated_at = datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
     with open(out_json, "w", encoding="utf-8") as f:
-        json.dump({"generated_at": "UTC", "data": rows}, f, ensure_ascii=False, indent=2)
+        json.dump({"generated_at": generated_at, "data": rows}, f, ensure_ascii=False, indent=2)
+    return generated_at
+
+
+def read_results_json(path) -> tuple[list[dict], str | None]:
+    """psi_results.json -> (rows, generated_at). generated_at None untuk file lama ("UTC")."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            doc = json.load(f)
+    except FileNotFoundError:
+        raise SystemExit(f"{path} tidak ada: jalankan `collect` dulu")
+    ts = doc.get("generated_at")
+    return doc.get("data") or [], ts if isinstance(ts, str) and ts[:1].isdigit() else None
 
 
 # ---------------- HTML Renderer ----------------
-def render_dashboard(rows, out_html, maintainer_name="MaazWay", maintainer_link="https://github.com/maazway"):
+def render_dashboard(rows, out_html, maintainer_name="MaazWay", maintainer_link="https://github.com/maazway",
+                     render_mode: str = "auto", regressions=None, opportunities=None):
+    """
+    Tulis dashboard HTML statis. render_mode:
+      "html"  kartu di-render di server dan di-inline ke HTML
+      "data"  hasil di-embed sebagai payload JSON ringkas; kartu di-render di
+              browser per halaman (DOM tetap kecil untuk ribuan URL)
+      "auto"  "data" jika jumlah row > DATA_MODE_THRESHOLD, selain itu "html"
+    `regressions`: daftar flag dari regression.detect_regressions (badge di kartu).
+    Row dengan `deferred` (ditunda scheduler, data dari history) diberi tanggal tes terakhir.
+    `opportunities`: index dari opportunities.build_index (tab Opportunities).
+    """
     # helpers local (tidak mengubah fungsi lain)
     def _shorten_url(u: str, max_len: int = 50) -> str:
         try:
@@ -136,9 +386,24 @@ def render_dashboard(rows, out_html, maintainer_name="MaazWay", maintainer_link=
             + "</div></div>"
         )
 
-    # build cards
+    # (url, strategy) -> metric yang regresi
+    reg_map = {}
+    for f in regressions or []:
+        reg_map.setdefault((f.get("url"), f.get("strategy")), []).append(f.get("metric"))
+
+    def _reg_metrics(url, strat):
+        return reg_map.get((normalize_url(url), strat)) or []
+
+    def _tested_day(r) -> str:
+        return (r.get("run_at_wib") or r.get("run_at_utc") or "")[:10]
+
+    if render_mode == "auto":
+        render_mode = "data" if len(rows) > DATA_MODE_THRESHOLD else "html"
+
+    # build cards (mode html) / payload kolom (mode data)
     cards = []
-    for r in rows:
+    payload = []
+    for r in rows if render_mode == "html" else ():
         url = r.get("url", "")
         strat = r.get("strategy", "")
         perf = r.get("performance")
@@ -149,10 +414,15 @@ def render_dashboard(rows, out_html, maintainer_name="MaazWay", maintainer_link=
         disp_url = _shorten_url(url, 50)
         code = _extract_error_code(err) if err else ""
         err_html = f"<div class='err-chip'>Error: {code}</div>" if code else ""
+        reg = _reg_metrics(url, strat)
+        if reg:
+            err_html += "<div class='reg-chip'>▼ Regresi: " + ", ".join(reg) + "</div>"
+        if r.get("deferred"):
+            err_html += "<div class='old-chip'>Terakhir dites: " + _tested_day(r) + "</div>"
 
         chips = badge(perf, "Performance") + badge(acc, "Accessibility") + badge(bp, "Best Practices") + badge(seo, "SEO")
         cards.append(
-        "<div class='card' data-url='" + url + "' data-strategy='" + strat + "'>"
+        "<div class='card' data-url='" + url + "' data-strategy='" + strat + "' data-perf='" + str(perf or 0) + "'>"
         + "<div class='row'><div class='left'>"
         + "<a class='url urlText' href='" + url + "' target='_blank' rel='noopener'>" + disp_url + "</a>"
         + "<div class='strategy'>[" + strat + "]</div>"
@@ -160,6 +430,27 @@ def render_dashboard(rows, out_html, maintainer_name="MaazWay", maintainer_link=
         + "</div><div class='right'>" + chips + "</div></div></div>"
         )
     cards_html = "\n".join(cards)
+    if render_mode == "data":
+        for r in rows:
+            err = r.get("error")
+            payload.append([
+                r.get("url", ""), r.get("strategy", ""),
+                r.get("performance"), r.get("accessibility"), r.get("best_practices"), r.get("seo"),
+                _extract_error_code(err) if err else "",
+                ", ".join(_reg_metrics(r.get("url", ""), r.get("strategy", ""))),
+                _tested_day(r) if r.get("deferred") else "",
+            ])
+        data_json = json.dumps({"rows": payload}, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+        data_script = "<script id='dashData' type='application/json'>" + data_json + "</script>"
+    else:
+        data_script = ""
+
+    opp = (opportunities or [])[:OPP_EMBED_LIMIT]
+    opp_json = json.dumps({"resources": opp, "total": len(opportunities or [])}, ensure_ascii=False,
+                          separators=(",", ":")).replace("</", "<\\/")
+    data_script += "<script id='oppData' type='application/json'>" + opp_json + "</script>"
+
+    metric_options = "".join(f"<option value='{k}'>{label}</option>" for k, label in metric_labels())
 
     # WIB time
     wib = timezone(timedelta(hours=7))
@@ -200,11 +491,22 @@ def render_dashboard(rows, out_html, maintainer_name="MaazWay", maintainer_link=
   .url{font-weight:700}
   .strategy{display:block;margin-top:4px;color:#64748b;font-size:13px;}
   .urlText{white-space:nowrap;overflow:hidden;text-overflow:ellipsis;display:inline-block;max-width:100%}
+  .pager{display:flex;gap:12px;justify-content:center;align-items:center;margin:16px 0;color:#64748b;font-size:13px}
+  .pager button:disabled{opacity:.4;cursor:default}
+  .reg-chip{margin-top:8px;margin-left:6px;display:inline-block;background:#fef3c7;color:#92400e;border:1px solid #fde68a;padding:6px 10px;border-radius:10px;font-size:12px}
+  .old-chip{margin-top:8px;margin-left:6px;display:inline-block;background:#f1f5f9;color:#475569;border:1px solid var(--bd);padding:6px 10px;border-radius:10px;font-size:12px}
   .err-chip{margin-top:8px;display:inline-block;background:#fee2e2;color:#991b1b;border:1px solid #fecaca;padding:6px 10px;border-radius:10px;font-size:12px;font-family:ui-monospace, SFMono-Regular, Menlo, monospace}
   @media (max-width:640px){.row{flex-direction:column;align-items:flex-start}.right{flex-wrap:wrap}}
 
   #secTrends .chartWrap{overflow-x:auto;border:1px solid var(--bd);background:#fff;border-radius:16px;padding:14px;box-shadow:var(--shadow)}
   #secTrends .chartInner{min-width:900px}
+  .tableWrap{overflow-x:auto;border:1px solid var(--bd);background:#fff;border-radius:16px;box-shadow:var(--shadow)}
+  table.opp{width:100%;border-collapse:collapse;font-size:13px}
+  table.opp th,table.opp td{padding:8px 12px;border-bottom:1px solid var(--bd);text-align:left;vertical-align:top}
+  table.opp th.num,table.opp td.num{text-align:right;white-space:nowrap}
+  table.opp tr.res{cursor:pointer} table.opp tr.res:hover{background:#f8fafc}
+  table.opp td.rurl{word-break:break-all;max-width:460px} table.opp .aud{color:var(--muted);font-size:12px}
+  table.opp tr.pages td{background:#f8fafc;color:#334155;font-size:12px}
   footer{margin:22px 0 8px;text-align:center;color:#64748b;font-size:12px}
   footer a{color:#2563eb;text-decoration:none} footer a:hover{text-decoration:underline}
 </style>
@@ -220,28 +522,42 @@ def render_dashboard(rows, out_html, maintainer_name="MaazWay", maintainer_link=
   <div class='tabs'>
     <button id='btnDash' class='tabBtn'>Dashboard</button>
     <button id='btnTrends' class='tabBtn'>Trends</button>
+    <button id='btnOpp' class='tabBtn'>Opportunities</button>
   </div>
 
   <!-- Dashboard -->
   <section id='secDash'>
     <div class='toolbar'>
       <div class='grow'><input id='search' class='input' placeholder='Cari URL atau strategy (mobile/desktop)...'></div>
+      <div class='selectWrap'><select id='sortBy' class='select'><option value=''>Urutan input</option><option value='perf-asc'>Performance terendah</option><option value='perf-desc'>Performance tertinggi</option><option value='url'>URL A–Z</option></select></div>
       <div class='count' style='color:#64748b;font-size:13px'><span id='count'>__COUNT__</span> hasil</div>
     </div>
     <div id='list' class='list'>__CARDS_HTML__</div>
+    <div id='pager' class='pager' style='display:none'><button id='pgPrev' class='tabBtn'>‹ Prev</button><span id='pgInfo'></span><button id='pgNext' class='tabBtn'>Next ›</button></div>
   </section>
 
   <!-- Trends -->
   <section id='secTrends' style='display:none'>
     <div class='toolbar'>
       <div class='selectWrap'><select id='trendUrl' class='select'></select></div>
-      <div class='selectWrap'><select id='trendMetric' class='select'><option value='performance'>Performance</option><option value='accessibility'>Accessibility</option><option value='best_practices'>Best Practices</option><option value='seo'>SEO</option></select></div>
+      <div class='selectWrap'><select id='trendMetric' class='select'>__METRIC_OPTIONS__</select></div>
       <div class='selectWrap'><select id='trendStrategy' class='select'><option value='all'>All strategies</option><option value='mobile'>mobile</option><option value='desktop'>desktop</option></select></div>
       <div class='selectWrap'><select id='trendDate' class='select'></select></div>
       <div class='selectWrap'><select id='trendMonth' class='select'></select></div>
     </div>
     <div class='chartWrap'><div class='chartInner' id='trendChartInner'><canvas id='trendChart' height='260'></canvas></div></div>
-    <div class='muted' style='color:#64748b;margin-top:8px'>Sumber: <code>history.json</code> (+ bulanan di <code>history/</code>). Waktu WIB.</div>
+    <div class='muted' style='color:#64748b;margin-top:8px'>Sumber: <code>history/manifest.json</code> + shard per bulan x URL di <code>history/series/</code>. Waktu WIB.</div>
+  </section>
+
+  <!-- Opportunities -->
+  <section id='secOpp' style='display:none'>
+    <div class='toolbar'>
+      <div class='grow'><input id='oppSearch' class='input' placeholder='Cari resource atau audit...'></div>
+      <div class='selectWrap'><select id='oppSort' class='select'><option value='ms'>Total penghematan (ms)</option><option value='bytes'>Total penghematan (bytes)</option><option value='pages'>Jumlah halaman</option></select></div>
+      <div class='count' style='color:#64748b;font-size:13px'><span id='oppCount'>0</span> resource</div>
+    </div>
+    <div class='tableWrap'><table class='opp'><thead><tr><th>Resource</th><th>Audit</th><th class='num'>Halaman</th><th class='num'>Est. ms</th><th class='num'>Est. KB</th></tr></thead><tbody id='oppBody'></tbody></table></div>
+    <div class='muted' style='color:#64748b;margin-top:8px'>Gabungan audit opportunity Lighthouse run ini per resource (klik baris untuk daftar halaman). Data lengkap: <code>opportunities.json</code>.</div>
   </section>
 
   <footer>
@@ -250,22 +566,281 @@ def render_dashboard(rows, out_html, maintainer_name="MaazWay", maintainer_link=
   </footer>
 </div>
 
-<script src='https://cdn.jsdelivr.net/npm/chart.js'></script>
+<script src='__CHART_JS_URL__'></script>
+<script id='trendEngine' type='text/plain'>
+// Series engine Trends: fetch + decode shard, index per url x strategy, query + downsample.
+// Dijalankan di Web Worker (blob URL); fallback di main thread kalau Worker tidak tersedia.
+function createTrendEngine(base, metrics){
+  const SCORE_METRICS = new Set(['performance','accessibility','best_practices','seo']);
+  const DAY = 86400000;
+  const EMPTY_FRAME = {n:0, urls:[], strategies:[], u:new Uint32Array(0), s:new Uint8Array(0), t:new Float64Array(0), cols:{}};
+  let manifest=null, legacyFrame=null, current=null;
+  const shardCache=new Map();
+
+  // cache: 'no-store' untuk file live (manifest, history.json); shard immutable (nama content-hash) 'force-cache'
+  async function fetchJson(path, cache='no-store'){try{const res=await fetch(new URL(path, base).href,{cache}); if(!res.ok) return []; return await res.json();}catch(e){return [];}}
+  // shard kolom: ambil varian .gz lalu dekompres (DecompressionStream), fallback ke JSON biasa
+  async function fetchColumns(path, cache){
+    if (manifest && (manifest.compressed||[]).includes('gz') && typeof DecompressionStream==='function'){
+      try{
+        const res=await fetch(new URL(path+'.gz', base).href,{cache});
+        if (res.ok) return await new Response(res.body.pipeThrough(new DecompressionStream('gzip'))).json();
+      }catch(e){}
+    }
+    return fetchJson(path, cache);
+  }
+  function parseRunAt(s){ // 'YYYY-MM-DDTHH:MM:SSZ' or 'dd/mm/yyyy HH:MM:SS WIB'
+    if(!s) return null;
+    if(s.includes('WIB')){
+      const [dmy, hms] = s.replace(' WIB','').split(' ');
+      const [dd,mm,yyyy] = dmy.split('/').map(Number);
+      const [HH,MM,SS] = hms.split(':').map(Number);
+      return new Date(Date.UTC(yyyy, mm-1, dd, HH-7, MM, SS)); // WIB -> UTC
+    }
+    const d = new Date(s);
+    if(String(d)==='Invalid Date') return null;
+    return d;
+  }
+
+  // frame kolom: {n, urls, strategies, u, s, t (epoch ms), cols: {metric: typed array}}
+  // skor 0-100 (0 = error / kosong) -> Uint8Array; metric lain dalam unit asli -> Float64Array (NaN = kosong)
+  function column(m, n, get){
+    const col = SCORE_METRICS.has(m) ? new Uint8Array(n) : new Float64Array(n).fill(NaN);
+    for (let i=0;i<n;i++){ const v=get(i); if (v!==null && v!==undefined && v!=='' && !isNaN(Number(v))) col[i]=Number(v); }
+    return col;
+  }
+  function decodeColumns(doc){ // format col1 (history_columnar.encode_columns)
+    const n=doc.n||0, t=new Float64Array(n), cols={};
+    let acc=doc.t0||0;
+    for (let i=0;i<n;i++){ acc+=doc.dt[i]; t[i]=acc*1000; }
+    for (const m in doc.cols){ const k=(doc.scale||{})[m]||1, d=doc.cols[m]; cols[m]=column(m, n, i=> d[i]===null ? null : d[i]/k); }
+    return {n, urls:doc.urls, strategies:doc.strategies, u:Uint32Array.from(doc.u), s:Uint8Array.from(doc.s), t, cols};
+  }
+  function rowsToFrame(rows){ // history.json / shard format lama (array of objects)
+    const urls=new Map(), strats=new Map(), keep=[], times=[];
+    rows.forEach(r=>{ const d=parseRunAt(r.run_at_wib||r.run_at_utc); if (d){ keep.push(r); times.push(d.getTime()); } });
+    const n=keep.length, u=new Uint32Array(n), s=new Uint8Array(n), cols={};
+    keep.forEach((r,i)=>{
+      if (!urls.has(r.url)) urls.set(r.url, urls.size); u[i]=urls.get(r.url);
+      if (!strats.has(r.strategy)) strats.set(r.strategy, strats.size); s[i]=strats.get(r.strategy);
+    });
+    metrics.forEach(m=>{ cols[m]=column(m, n, i=> keep[i][m]); });
+    return {n, urls:Array.from(urls.keys()), strategies:Array.from(strats.keys()), u, s, t:Float64Array.from(times), cols};
+  }
+
+  // manifest: shard per bulan x url x strategy, [path, n, first, last, path immutable hasil build?]
+  // (entry lama: satu `shard` per seri)
+  function seriesShards(e){
+    return e.months ? Object.values(e.months).map(v => ({url:e.url, strategy:e.strategy, shard:v[4]||v[0], immutable:!!v[4]})) : [e];
+  }
+  // fetch paralel, cache per sesi
+  function loadShard(s){
+    if (!shardCache.has(s.shard)){
+      const cache = s.immutable ? 'force-cache' : 'no-store';
+      const load = s.shard.endsWith('.col.json')
+        ? fetchColumns(s.shard, cache).then(doc => doc && doc.format==='col1' ? decodeColumns(doc) : EMPTY_FRAME)
+        : fetchJson(s.shard, cache).then(rows => rowsToFrame((Array.isArray(rows) ? rows : []).map(r => Object.assign({url:s.url, strategy:s.strategy}, r))));
+      shardCache.set(s.shard, load);
+    }
+    return shardCache.get(s.shard);
+  }
+  async function loadLegacyHistory(){
+    let head = await fetchJson('history.json');
+    let rows = Array.isArray(head) ? head : [];
+    const now = new Date();
+    for (let i=1;i<=6;i++){
+      const d = new Date(Date.UTC(now.getUTCFullYear(), now.getUTCMonth()-i, 1));
+      const more = await fetchJson('history/'+d.toISOString().slice(0,7)+'.json');
+      if (Array.isArray(more) && more.length) rows = rows.concat(more);
+    }
+    // history.json (raw N hari terakhir) bisa overlap dengan arsip bulan lalu
+    const seen = new Set();
+    return rows.filter(r => { const k = r.url+'|'+r.strategy+'|'+(r.run_at_utc||r.run_at_wib); if (seen.has(k)) return false; seen.add(k); return true; });
+  }
+
+  // index satu url: per strategy row urut waktu (t), offset bucket per hari (UTC),
+  // nilai metric di-materialize sekali per metric (lazy)
+  function buildIndex(frames, url){
+    const by=new Map();
+    frames.forEach(f=>{
+      const uIdx=f.urls.indexOf(url); if (uIdx<0) return;
+      for (let i=0;i<f.n;i++){
+        if (f.u[i]!==uIdx) continue;
+        const st=f.strategies[f.s[i]];
+        if (!by.has(st)) by.set(st, []);
+        by.get(st).push([f.t[i], f, i]);
+      }
+    });
+    const series=new Map();
+    by.forEach((refs, st)=>{
+      refs.sort((a,b)=>a[0]-b[0]);
+      const n=refs.length, t=new Float64Array(n), days=[], dayStart=[];
+      let last=NaN;
+      for (let k=0;k<n;k++){
+        t[k]=refs[k][0];
+        const d=Math.floor(t[k]/DAY);
+        if (d!==last){ days.push(new Date(d*DAY).toISOString().slice(0,10)); dayStart.push(k); last=d; }
+      }
+      series.set(st, {n, t, refs, days, dayStart:Uint32Array.from(dayStart), vals:new Map()});
+    });
+    return series;
+  }
+  function values(ser, m){
+    if (!ser.vals.has(m)){
+      const v=new Float64Array(ser.n).fill(NaN), score=SCORE_METRICS.has(m);
+      ser.refs.forEach((r,k)=>{ const c=r[1].cols[m]; if (!c) return; const x=c[r[2]]; v[k] = score ? (x>0 ? x : NaN) : x; });
+      ser.vals.set(m, v);
+    }
+    return ser.vals.get(m);
+  }
+  function lowerBound(arr, x){ let lo=0, hi=arr.length; while(lo<hi){ const mid=(lo+hi)>>1; if (arr[mid]<x) lo=mid+1; else hi=mid; } return lo; }
+  // prefix 'YYYY-MM-DD' / 'YYYY-MM' -> [lo, hi) row lewat offset bucket hari
+  function bucketRange(ser, prefix){
+    const a=lowerBound(ser.days, prefix), b=lowerBound(ser.days, prefix+'~');
+    return [a<ser.days.length ? ser.dayStart[a] : ser.n, b<ser.days.length ? ser.dayStart[b] : ser.n];
+  }
+  // Largest-Triangle-Three-Buckets: pertahankan bentuk kurva dengan `threshold` titik
+  function lttb(t, v, threshold){
+    const n=t.length;
+    if (threshold>=n || threshold<3) return {t, v};
+    const ot=new Float64Array(threshold), ov=new Float64Array(threshold), every=(n-2)/(threshold-2);
+    let a=0; ot[0]=t[0]; ov[0]=v[0];
+    for (let i=0;i<threshold-2;i++){
+      const s0=Math.floor((i+1)*every)+1, s1=Math.min(Math.floor((i+2)*every)+1, n);
+      let ax=0, ay=0;
+      for (let j=s0;j<s1;j++){ ax+=t[j]; ay+=v[j]; }
+      ax/=(s1-s0)||1; ay/=(s1-s0)||1;
+      const r0=Math.floor(i*every)+1, r1=Math.floor((i+1)*every)+1;
+      let best=-1, pick=r0;
+      for (let j=r0;j<r1;j++){
+        const area=Math.abs((t[a]-ax)*(v[j]-v[a])-(t[a]-t[j])*(ay-v[a]));
+        if (area>best){ best=area; pick=j; }
+      }
+      ot[i+1]=t[pick]; ov[i+1]=v[pick]; a=pick;
+    }
+    ot[threshold-1]=t[n-1]; ov[threshold-1]=v[n-1];
+    return {t:ot, v:ov};
+  }
+
+  return {
+    async init(){
+      const m = await fetchJson('history/manifest.json');
+      if (m && Array.isArray(m.series)){
+        manifest = m;
+        return {urls: Array.from(new Set(m.series.map(s=>s.url))).sort()};
+      }
+      // fallback sebelum manifest pertama ter-deploy
+      legacyFrame = rowsToFrame(await loadLegacyHistory());
+      return {urls: legacyFrame.urls.slice().sort()};
+    },
+    async select({url}){
+      const frames = !url ? [] : (manifest ? await Promise.all(manifest.series.filter(s=>s.url===url).flatMap(seriesShards).map(loadShard)) : [legacyFrame || EMPTY_FRAME]);
+      current = buildIndex(frames, url);
+      const days=new Set();
+      current.forEach(ser=>ser.days.forEach(d=>days.add(d)));
+      const dates=Array.from(days).sort();
+      return {dates, months:Array.from(new Set(dates.map(d=>d.slice(0,7))))};
+    },
+    // -> {series:[{strategy, t: Float64Array, v: Float64Array}]}, range tanggal/bulan + LTTB
+    query({metric, strategies, date, month, maxPoints}){
+      const out=[];
+      strategies.forEach(st=>{
+        const ser = current && current.get(st); if (!ser) return;
+        let lo=0, hi=ser.n;
+        [date, month].forEach(p=>{ if (p){ const r=bucketRange(ser, p); lo=Math.max(lo, r[0]); hi=Math.min(hi, r[1]); } });
+        const all=values(ser, metric), t=[], v=[];
+        for (let k=lo;k<hi;k++) if (!isNaN(all[k])){ t.push(ser.t[k]); v.push(all[k]); }
+        if (!t.length) return;
+        const ds=lttb(Float64Array.from(t), Float64Array.from(v), maxPoints);
+        out.push({strategy:st, t:ds.t, v:ds.v});
+      });
+      return {series: out};
+    },
+  };
+}
+if (typeof WorkerGlobalScope!=='undefined' && self instanceof WorkerGlobalScope){
+  let engine=null;
+  self.onmessage = async (e)=>{
+    const {id, type, payload} = e.data;
+    try{
+      if (type==='init') engine = createTrendEngine(payload.base, payload.metrics);
+      const res = await engine[type](payload);
+      const transfer = res && res.series ? [].concat(...res.series.map(s=>[s.t.buffer, s.v.buffer])) : [];
+      self.postMessage({id, res}, transfer);
+    }catch(err){ self.postMessage({id, error:String(err)}); }
+  };
+}
+</script>
+__DATA_SCRIPT__
 <script>
 (function(){
   // ===== Tabs =====
-  const btnDash=document.getElementById('btnDash'), btnTrends=document.getElementById('btnTrends'),
-        secDash=document.getElementById('secDash'), secTrends=document.getElementById('secTrends');
-  let trendsReady=false;
-  function showDash(){secDash.style.display='block';secTrends.style.display='none';btnDash.classList.add('active');btnTrends.classList.remove('active');}
-  async function showTrends(){secDash.style.display='none';secTrends.style.display='block';btnTrends.classList.add('active');btnDash.classList.remove('active'); if(!trendsReady){await loadHistory();trendsReady=true;} else {requestAnimationFrame(()=>{if(typeof renderTrend==='function') renderTrend();});}}
-  btnDash.addEventListener('click',showDash); btnTrends.addEventListener('click',showTrends); showDash();
+  const btnDash=document.getElementById('btnDash'), btnTrends=document.getElementById('btnTrends'), btnOpp=document.getElementById('btnOpp'),
+        secDash=document.getElementById('secDash'), secTrends=document.getElementById('secTrends'), secOpp=document.getElementById('secOpp');
+  let trendsReady=false, oppReady=false;
+  function showTab(sec, btn){
+    [secDash, secTrends, secOpp].forEach(s=>s.style.display = s===sec ? 'block' : 'none');
+    [btnDash, btnTrends, btnOpp].forEach(b=>b.classList.toggle('active', b===btn));
+  }
+  function showDash(){showTab(secDash, btnDash);}
+  async function showTrends(){showTab(secTrends, btnTrends); if(!trendsReady){await loadHistory();trendsReady=true;} else {requestAnimationFrame(()=>{if(typeof renderTrend==='function') renderTrend();});}}
+  function showOpp(){showTab(secOpp, btnOpp); if(!oppReady){renderOpp();oppReady=true;}}
+  btnDash.addEventListener('click',showDash); btnTrends.addEventListener('click',showTrends); btnOpp.addEventListener('click',showOpp); showDash();
 
   // ===== Search (Dashboard) =====
-  const listEl=document.getElementById('list'); const items=Array.from(listEl.querySelectorAll('.card'));
+  // index lowercase dibangun sekali; mode data me-render kartu per halaman dari payload JSON
+  const listEl=document.getElementById('list'); const dataEl=document.getElementById('dashData');
   const searchInput=document.getElementById('search'); const countEl=document.getElementById('count');
-  function applyFilter(){const q=(searchInput.value||'').toLowerCase().trim(); let shown=0; items.forEach(el=>{const u=(el.getAttribute('data-url')||'').toLowerCase(); const s=(el.getAttribute('data-strategy')||'').toLowerCase(); const vis=(!q||u.includes(q)||s.includes(q)); el.style.display=vis?'':'none'; if(vis) shown++;}); countEl.textContent=shown;}
-  searchInput.addEventListener('input', applyFilter);
+  const sortSel=document.getElementById('sortBy'); const pagerEl=document.getElementById('pager');
+  const pgPrev=document.getElementById('pgPrev'), pgNext=document.getElementById('pgNext'), pgInfo=document.getElementById('pgInfo');
+  const PAGE_SIZE=50; let page=0; let view=[];
+  const items = dataEl
+    ? JSON.parse(dataEl.textContent).rows.map((r,i)=>({i, url:r[0], strategy:r[1], scores:[r[2],r[3],r[4],r[5]], code:r[6]||'', reg:r[7]||'', old:r[8]||'', perf:Number(r[2]||0), key:(r[0]+' '+r[1]).toLowerCase()}))
+    : Array.from(listEl.querySelectorAll('.card')).map((el,i)=>({i, el, perf:Number(el.getAttribute('data-perf')||0), url:el.getAttribute('data-url')||'', key:((el.getAttribute('data-url')||'')+' '+(el.getAttribute('data-strategy')||'')).toLowerCase()}));
+
+  const LABELS=['Performance','Accessibility','Best Practices','SEO'];
+  function mk(tag, cls, text){const e=document.createElement(tag); if(cls) e.className=cls; if(text!=null) e.textContent=text; return e;}
+  function chip(val, label){
+    const c = mk('div'); let n='–', cls='gray';
+    if (val!=null){ const v=parseInt(val,10)||0; n=String(v); cls = v>=90?'green':(v>=50?'orange':'red'); }
+    c.className='chip chip-'+cls; c.appendChild(mk('div','num',n)); c.appendChild(mk('div','lbl',label)); return c;
+  }
+  function cardEl(it){
+    const card=mk('div','card'), row=mk('div','row'), left=mk('div','left'), right=mk('div','right');
+    const a=mk('a','url urlText',shortenUrl(it.url,50)); a.href=it.url; a.target='_blank'; a.rel='noopener';
+    left.appendChild(a); left.appendChild(mk('div','strategy','['+it.strategy+']'));
+    if (it.code) left.appendChild(mk('div','err-chip','Error: '+it.code));
+    if (it.reg) left.appendChild(mk('div','reg-chip','▼ Regresi: '+it.reg));
+    if (it.old) left.appendChild(mk('div','old-chip','Terakhir dites: '+it.old));
+    it.scores.forEach((v,k)=>right.appendChild(chip(v, LABELS[k])));
+    row.appendChild(left); row.appendChild(right); card.appendChild(row); return card;
+  }
+  function renderPage(){
+    const pages=Math.max(1, Math.ceil(view.length/PAGE_SIZE)); page=Math.min(page, pages-1);
+    const frag=document.createDocumentFragment();
+    view.slice(page*PAGE_SIZE, (page+1)*PAGE_SIZE).forEach(it=>frag.appendChild(cardEl(it)));
+    listEl.replaceChildren(frag);
+    pagerEl.style.display = pages>1 ? 'flex' : 'none';
+    pgInfo.textContent=(page+1)+' / '+pages; pgPrev.disabled=page===0; pgNext.disabled=page>=pages-1;
+  }
+  function applyFilter(){
+    const q=(searchInput.value||'').toLowerCase().trim();
+    view = q ? items.filter(it=>it.key.includes(q)) : items.slice();
+    const s=sortSel.value;
+    if (s==='perf-asc') view.sort((a,b)=>a.perf-b.perf||a.i-b.i);
+    else if (s==='perf-desc') view.sort((a,b)=>b.perf-a.perf||a.i-b.i);
+    else if (s==='url') view.sort((a,b)=>a.url<b.url?-1:(a.url>b.url?1:a.i-b.i));
+    countEl.textContent=view.length;
+    if (dataEl){ page=0; renderPage(); return; }
+    const vis=new Set(view); items.forEach(it=>{it.el.style.display=vis.has(it)?'':'none';});
+    view.forEach(it=>listEl.appendChild(it.el));
+  }
+  let filterTimer=null;
+  searchInput.addEventListener('input', ()=>{clearTimeout(filterTimer); filterTimer=setTimeout(applyFilter, 150);});
+  sortSel.addEventListener('change', applyFilter);
+  pgPrev.addEventListener('click', ()=>{page--; renderPage(); window.scrollTo(0, secDash.offsetTop);});
+  pgNext.addEventListener('click', ()=>{page++; renderPage(); window.scrollTo(0, secDash.offsetTop);});
+  if (dataEl) applyFilter();
 
   // ===== Trends =====
   // Helpers
@@ -276,131 +851,170 @@ def render_dashboard(rows, out_html, maintainer_name="MaazWay", maintainer_link=
     const w = new Date(d.getTime() + 7*3600*1000);
     return pad2(w.getUTCDate())+'/'+pad2(w.getUTCMonth()+1)+'/'+w.getUTCFullYear()+' '+pad2(w.getUTCHours())+':'+pad2(w.getUTCMinutes())+':'+pad2(w.getUTCSeconds())+' WIB';
   }
-  function parseRunAt(s){ // 'YYYY-MM-DDTHH:MM:SSZ' or 'dd/mm/yyyy HH:MM:SS WIB'
-    if(!s) return null;
-    if(s.includes('WIB')){
-      const [dmy, hms] = s.replace(' WIB','').split(' ');
-      const [dd,mm,yyyy] = dmy.split('/').map(Number);
-      const [HH,MM,SS] = hms.split(':').map(Number);
-      const utc = Date.UTC(yyyy, mm-1, dd, HH-7, MM, SS); // WIB -> UTC
-      return new Date(utc);
-    }
-    const d = new Date(s);
-    if(String(d)==='Invalid Date') return null;
-    return d;
-  }
-  async function fetchJson(path){try{const res=await fetch(path,{cache:'no-store'}); if(!res.ok) return []; return await res.json();}catch(e){return [];}}
 
   const urlSel=document.getElementById('trendUrl'),
         metricSel=document.getElementById('trendMetric'),
         stratSel=document.getElementById('trendStrategy'),
         dateSel=document.getElementById('trendDate'),
         monthSel=document.getElementById('trendMonth');
-  let historyData=[]; let chart;
+  const SCORE_METRICS = new Set(['performance','accessibility','best_practices','seo']);
+  const METRICS = Array.from(metricSel.options).map(o=>o.value);
+  const MAX_POINTS = 360; // per strategy; range lebih panjang di-downsample (LTTB) oleh engine
 
-  function rebuildSelectors(){
-    const urls = uniq(historyData.map(r=>r.url)).sort();
+  // engine (#trendEngine) di Web Worker; RPC call(type, payload) -> Promise
+  // sumber engine: inline, atau asset hashed `data-src` hasil build (di-cache browser)
+  const ENGINE_EL = document.getElementById('trendEngine');
+  const ENGINE_URL = ENGINE_EL.dataset.src ? new URL(ENGINE_EL.dataset.src, location.href).href : null;
+  function loadEngine(){
+    if (!ENGINE_URL) return Promise.resolve(new Function(ENGINE_EL.textContent+'\nreturn createTrendEngine;')());
+    return new Promise((resolve, reject)=>{ // <script src> juga jalan di file://
+      const s=document.createElement('script'); s.src=ENGINE_URL;
+      s.onload=()=>resolve(window.createTrendEngine); s.onerror=()=>reject(new Error('engine load failed'));
+      document.head.appendChild(s);
+    });
+  }
+  function localEngine(){
+    const ready = loadEngine();
+    let engine=null;
+    return async (type, payload)=>{ if (type==='init') engine=(await ready)(payload.base, payload.metrics); return engine[type](payload); };
+  }
+  function workerEngine(){
+    const w = new Worker(ENGINE_URL || URL.createObjectURL(new Blob([ENGINE_EL.textContent], {type:'text/javascript'})));
+    const pending = new Map(); let seq=0;
+    w.onmessage = e=>{ const p=pending.get(e.data.id); if (!p) return; pending.delete(e.data.id); if (e.data.error) p.reject(new Error(e.data.error)); else p.resolve(e.data.res); };
+    w.onerror = e=>{ e.preventDefault(); pending.forEach(p=>p.reject(new Error('worker error'))); pending.clear(); };
+    return (type, payload)=> new Promise((resolve, reject)=>{ const id=++seq; pending.set(id, {resolve, reject}); w.postMessage({id, type, payload}); });
+  }
+  let call = null;
+
+  function fillUrlSelector(urls){
     urlSel.innerHTML = urls.length ? "" : "<option value=''> (no data) </option>";
     urls.forEach(v=>{ const o=document.createElement('option'); o.value=v; o.textContent=shortenUrl(v, 72); urlSel.appendChild(o); });
+  }
 
-    // dates: value YYYY-MM-DD; label dd/mm/YYYY
-    const rawDates = uniq(historyData.map(r=> (r.run_at_wib||r.run_at_utc||'').slice(0,10))).sort();
+  function rebuildSelectors(rawDates, rawMonths){
+    // dates: value YYYY-MM-DD; label dd/mm/YYYY (UTC, seperti run_at_utc)
+    const prevDate = dateSel.value, prevMonth = monthSel.value;
     dateSel.innerHTML = "<option value=''> (all dates) </option>";
     rawDates.forEach(v=>{
-      let text=v;
-      if(/^\d{4}-\d{2}-\d{2}$/.test(v)){ const [Y,M,D]=v.split('-'); text = D+'/'+M+'/'+Y; }
-      const o=document.createElement('option'); o.value=v; o.textContent=text; dateSel.appendChild(o);
+      const [Y,M,D]=v.split('-');
+      const o=document.createElement('option'); o.value=v; o.textContent=D+'/'+M+'/'+Y; dateSel.appendChild(o);
     });
 
     // months: value YYYY-MM; label mm/YYYY
-    const rawMonths = uniq(historyData.map(r=> (r.run_at_wib||r.run_at_utc||'').slice(0,7))).sort();
     monthSel.innerHTML = "<option value=''> (all months) </option>";
     rawMonths.forEach(v=>{
-      let text=v;
-      if(/^\d{4}-\d{2}$/.test(v)){ const [Y,M]=v.split('-'); text = M+'/'+Y; }
-      const o=document.createElement('option'); o.value=v; o.textContent=text; monthSel.appendChild(o);
+      const [Y,M]=v.split('-');
+      const o=document.createElement('option'); o.value=v; o.textContent=M+'/'+Y; monthSel.appendChild(o);
     });
+    if (rawDates.includes(prevDate)) dateSel.value = prevDate;
+    if (rawMonths.includes(prevMonth)) monthSel.value = prevMonth;
 
     if (!stratSel.value) stratSel.value = 'mobile';
   }
 
-  function buildFiltered(){
-    return historyData.filter(r =>
-      (!urlSel.value || r.url===urlSel.value) &&
-      (!dateSel.value || (r.run_at_wib||r.run_at_utc||'').startsWith(dateSel.value)) &&
-      (!monthSel.value || (r.run_at_wib||r.run_at_utc||'').startsWith(monthSel.value)) &&
-      (Number(r[metricSel.value]||0) > 0)
-    );
+  async function selectUrl(){
+    const info = await call('select', {url: urlSel.value});
+    rebuildSelectors(info.dates, info.months);
+    await renderTrend();
   }
 
-  function sortedTimes(a,b){
-    const set = new Set([...(a||[]).map(x=>x.t), ...(b||[]).map(x=>x.t)]);
-    return Array.from(set).sort((x,y)=>x-y);
+  // gabung timestamp beberapa seri (masing-masing sudah urut) -> label bersama
+  function mergeTimes(series){
+    return uniq([].concat(...series.map(s=>Array.from(s.t)))).sort((x,y)=>x-y);
   }
-  function mapToTimes(times, arr){
-    const m = new Map(arr.map(x=>[x.t,x.v]));
-    return times.map(t => m.has(t)? m.get(t) : null);
+  function alignTo(times, s){
+    const out=new Array(times.length).fill(null);
+    for (let i=0, k=0; i<times.length && k<s.t.length; i++){ if (times[i]===s.t[k]){ out[i]=s.v[k]; k++; } }
+    return out;
   }
 
-  function renderTrend(){
-    const rows = buildFiltered();
-
-    if (stratSel.value === 'all'){
-      const byStrat = (key)=> rows
-        .filter(r => r.strategy===key)
-        .map(r => { const d=parseRunAt(r.run_at_wib || r.run_at_utc); return d && {t:d.getTime(), v:Number(r[metricSel.value]||0)}; })
-        .filter(Boolean).sort((a,b)=> a.t-b.t);
-
-      const mb = byStrat('mobile');
-      const ds = byStrat('desktop');
-      const allTimes = sortedTimes(mb, ds);
-      const labs = allTimes.map(t=> toWIBString(new Date(t)));
-      const dsArr = [];
-      if (mb.length) dsArr.push({label:'mobile', data: mapToTimes(allTimes, mb), spanGaps:true, tension:.25, pointRadius:2});
-      if (ds.length) dsArr.push({label:'desktop', data: mapToTimes(allTimes, ds), spanGaps:true, tension:.25, pointRadius:2});
-
-      drawChart(labs, dsArr);
-      return;
-    }
-
-    const points = rows
-      .filter(r=> r.strategy===stratSel.value)
-      .map(r => { const d = parseRunAt(r.run_at_wib || r.run_at_utc); return d && {t:d.getTime(), v:Number(r[metricSel.value]||0)}; })
-      .filter(Boolean).sort((a,b)=> a.t-b.t)
-
-    const labels = points.map(p => toWIBString(new Date(p.t)));
-    const data = points.map(p => p.v);
-    drawChart(labels, [{label: metricSel.value+' ('+stratSel.value+')', data, spanGaps:true, tension:.25, pointRadius:2}]);
+  let renderSeq = 0;
+  async function renderTrend(){
+    const my = ++renderSeq, all = stratSel.value === 'all';
+    const res = await call('query', {metric: metricSel.value, strategies: all ? ['mobile','desktop'] : [stratSel.value],
+                                     date: dateSel.value, month: monthSel.value, maxPoints: MAX_POINTS});
+    if (my !== renderSeq) return; // sudah ada query yang lebih baru
+    const times = mergeTimes(res.series);
+    const labels = times.map(t=> toWIBString(new Date(t)));
+    const datasets = res.series.map(s=>({label: all ? s.strategy : metricSel.value+' ('+s.strategy+')', data: alignTo(times, s), spanGaps:true, tension:.25, pointRadius:2}));
+    drawChart(labels, datasets);
   }
 
+  // chart dibuat sekali; update berikutnya mengganti data in-place tanpa animasi
   function drawChart(labels, datasets){
     const inner = document.getElementById('trendChartInner');
-    inner.style.width = Math.max(900, Math.max(1, labels.length) * 60) + 'px';
-    const ctx = document.getElementById('trendChart').getContext('2d');
-    if (window._chart) window._chart.destroy();
-    window._chart = new Chart(ctx, {
-      type:'line',
-      data:{labels, datasets},
-      options:{responsive:true, maintainAspectRatio:false, scales:{y:{min:0,max:100,ticks:{stepSize:10}}}}
-    });
+    inner.style.width = Math.max(900, Math.min(labels.length * 60, MAX_POINTS * 10)) + 'px';
+    const y = SCORE_METRICS.has(metricSel.value) ? {min:0,max:100,ticks:{stepSize:10}} : {beginAtZero:true};
+    const chart = window._chart;
+    if (chart){
+      chart.data.labels = labels;
+      datasets.forEach((d,k)=>{ if (chart.data.datasets[k]) Object.assign(chart.data.datasets[k], d); else chart.data.datasets.push(d); });
+      chart.data.datasets.length = datasets.length;
+      chart.options.scales.y = y;
+      chart.update('none');
+    } else {
+      window._chart = new Chart(document.getElementById('trendChart').getContext('2d'), {
+        type:'line',
+        data:{labels, datasets},
+        options:{responsive:true, maintainAspectRatio:false, animation:false, scales:{y}}
+      });
+    }
     requestAnimationFrame(()=>{ if (window._chart && typeof window._chart.resize==='function') window._chart.resize(); });
   }
 
   async function loadHistory(){
-    let head = await fetchJson('history.json');
-    historyData = Array.isArray(head) ? head : [];
-    const now = new Date();
-    for (let i=1;i<=6;i++){
-      const d = new Date(Date.UTC(now.getUTCFullYear(), now.getUTCMonth()-i, 1));
-      const mk = d.toISOString().slice(0,7);
-      const more = await fetchJson('history/'+mk+'.json');
-      if (Array.isArray(more) && more.length) historyData = historyData.concat(more);
+    const init = {base: location.href, metrics: METRICS};
+    let info;
+    try{
+      call = typeof Worker==='function' ? workerEngine() : localEngine();
+      info = await call('init', init);
+    }catch(e){
+      // Worker diblok (CSP / file://): engine yang sama di main thread
+      call = localEngine();
+      info = await call('init', init);
     }
-    rebuildSelectors();
-    renderTrend();
+    fillUrlSelector(info.urls);
+    await selectUrl();
   }
 
-  [urlSel, metricSel, stratSel, dateSel, monthSel].forEach(el => el.addEventListener('change', renderTrend));
+  urlSel.addEventListener('change', selectUrl);
+  [metricSel, stratSel, dateSel, monthSel].forEach(el => el.addEventListener('change', renderTrend));
+
+  // ===== Opportunities =====
+  // index resource -> halaman (opportunities.build_index), di-embed sebagai JSON
+  const oppData=JSON.parse(document.getElementById('oppData').textContent);
+  const oppRes=oppData.resources.map(e=>Object.assign(e, {key:(e.resource+' '+e.audits.join(' ')).toLowerCase()}));
+  const oppBody=document.getElementById('oppBody'), oppSearch=document.getElementById('oppSearch'),
+        oppSort=document.getElementById('oppSort'), oppCount=document.getElementById('oppCount');
+  const fmtInt=v=>Math.round(v).toLocaleString('id-ID');
+  const td=(cls, text)=>mk('td', cls, text);
+  function renderOpp(){
+    const q=oppSearch.value.trim().toLowerCase(), by=oppSort.value;
+    const rows=oppRes.filter(e=>!q || e.key.includes(q));
+    if (by==='bytes') rows.sort((a,b)=>b.total_bytes-a.total_bytes);
+    else if (by==='pages') rows.sort((a,b)=>b.page_count-a.page_count || b.total_ms-a.total_ms);
+    else rows.sort((a,b)=>b.total_ms-a.total_ms || b.total_bytes-a.total_bytes);
+    oppCount.textContent = rows.length + (oppData.total>oppRes.length ? ' / '+oppData.total : '');
+    const frag=document.createDocumentFragment();
+    rows.forEach(e=>{
+      const tr=mk('tr','res'); tr.appendChild(td('rurl', e.resource));
+      tr.appendChild(td('aud', e.audits.join(', '))); tr.appendChild(td('num', String(e.page_count)));
+      tr.appendChild(td('num', fmtInt(e.total_ms))); tr.appendChild(td('num', fmtInt(e.total_bytes/1024)));
+      tr.addEventListener('click', ()=>{
+        const nx=tr.nextSibling;
+        if (nx && nx.classList && nx.classList.contains('pages')) { nx.remove(); return; }
+        const pr=mk('tr','pages'), cell=mk('td'); cell.colSpan=5;
+        cell.textContent=e.pages.map(p=>p[0]+' ['+p[1]+'] '+fmtInt(p[2])+' ms, '+fmtInt(p[3]/1024)+' KB').join('\n');
+        cell.style.whiteSpace='pre-line'; pr.appendChild(cell); tr.after(pr);
+      });
+      frag.appendChild(tr);
+    });
+    oppBody.replaceChildren(frag);
+  }
+  let oppTimer=null;
+  oppSearch.addEventListener('input', ()=>{ clearTimeout(oppTimer); oppTimer=setTimeout(renderOpp, 150); });
+  oppSort.addEventListener('change', renderOpp);
 })();
 </script>
 </html>"""
@@ -411,6 +1025,9 @@ def render_dashboard(rows, out_html, maintainer_name="MaazWay", maintainer_link=
         .replace("__GEN_TS__", gen_ts)
         .replace("__MAINTAINER_LINK__", maintainer_link)
         .replace("__MAINTAINER_NAME__", maintainer_name)
+        .replace("__METRIC_OPTIONS__", metric_options)
+        .replace("__DATA_SCRIPT__", data_script)
+        .replace("__CHART_JS_URL__", CHART_JS_URL)
     )
 
     out_path = Path(out_html)
@@ -421,27 +1038,241 @@ def render_dashboard(rows, out_html, maintainer_name="MaazWay", maintainer_link=
 
 # ---------------- main ----------------
 def main():
-    parser = argparse.ArgumentParser()
+    parser = argparse.ArgumentParser(
+        description="collect: PSI -> psi_results.csv/json; history / render / notify: dari psi_results.json; all: semua")
+    parser.add_argument("command", nargs="?", choices=COMMANDS, default="all",
+                        help="Stage yang dijalankan (default: all)")
     parser.add_argument("--csv", default="urls.csv")
     parser.add_argument("--out-csv", default="psi_results.csv")
-    parser.add_argument("--out-json", default="psi_results.json")
+    parser.add_argument("--out-json", default="psi_results.json",
+                        help="Hasil collect; dibaca stage render / history / notify")
     parser.add_argument("--out-html", default="dashboard/dashboard.html")
-    parser.add_argument("--sleep", type=float, default=2.0, help="Delay (s) between PSI calls")
+    parser.add_argument("--sleep", type=float, default=2.0,
+                        help="Rate limit fallback: rata-rata 1 PSI call per N detik (dipakai jika --rps/--rpm kosong)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Jumlah PSI call paralel")
+    parser.add_argument("--rps", type=float, default=None, help="Maksimal PSI call per detik")
+    parser.add_argument("--rpm", type=float, default=None, help="Maksimal PSI call per menit")
+    parser.add_argument("--max-retries", type=int, default=4, help="Retry per URL untuk 429/5xx/timeout")
+    parser.add_argument("--breaker-threshold", type=int, default=5,
+                        help="Stop memanggil PSI setelah N quota error (429) berturut-turut")
+    parser.add_argument("--journal", default=str(JOURNAL_FILE), help="Checkpoint journal (JSONL) hasil per URL")
+    parser.add_argument("--resume", action="store_true",
+                        help="Lanjutkan dari journal: lewati URL yang sudah sukses dan masih fresh")
+    parser.add_argument("--resume-max-age", type=float, default=12.0,
+                        help="Umur maksimal (jam) hasil journal yang dianggap fresh saat --resume")
+    parser.add_argument("--budget-calls", type=int, default=None,
+                        help="Maksimal PSI call per run; URL lain ditunda berdasarkan prioritas")
+    parser.add_argument("--budget-minutes", type=float, default=None,
+                        help="Budget waktu collect per run (menit)")
+    parser.add_argument("--schedule", action="store_true",
+                        help="Pakai kolom priority / every_days di urls.csv walau tanpa budget")
+    parser.add_argument("--key-daily-quota", type=int, default=None,
+                        help="Kuota harian per API key (default psi_keys.DAILY_QUOTA)")
+    parser.add_argument("--samples-max", type=int, default=1,
+                        help="Maksimal sample per URL; sample tambahan hanya jika skor menyimpang dari baseline")
+    parser.add_argument("--sample-threshold", type=float, default=5.0,
+                        help="Selisih skor performance (poin) vs baseline history yang memicu sample tambahan")
+    parser.add_argument("--archive-lhr", action="store_true",
+                        help="Simpan Lighthouse result lengkap ke dashboard/history/lhr (dedup + kompresi)")
+    parser.add_argument("--shard", default=None, metavar="i/N",
+                        help="Collect partisi ke-i dari N saja, tulis partial ke --partial-dir (tanpa history/render)")
+    parser.add_argument("--merge", action="store_true",
+                        help="Gabungkan partial shard di --partial-dir lalu tulis CSV/JSON, history, dashboard")
+    parser.add_argument("--partial-dir", default=str(PARTIAL_DIR), help="Direktori partial shard")
+    parser.add_argument("--render-mode", choices=["auto", "html", "data"], default="auto",
+                        help="html: kartu inline; data: payload JSON + render per halaman di browser")
+    parser.add_argument("--no-build", action="store_true",
+                        help="Lewati build step (assets hash + minify, shard immutable, .gz/.br); HTML tetap self-contained")
     parser.add_argument("--maintainer-name", default="MaazWay")
     parser.add_argument("--maintainer-link", default="https://github.com/maazway")
+    parser.add_argument("--profile", default=None, metavar="PATH",
+                        help="Jalankan pipeline di bawah cProfile, simpan stats ke PATH")
     args = parser.parse_args()
+    if args.shard and args.merge:
+        parser.error("--shard dan --merge tidak bisa dipakai bersamaan")
+    if (args.shard or args.merge) and args.command not in ("collect", "all"):
+        parser.error("--shard / --merge hanya untuk collect atau all")
+    if args.command in ("collect", "notify", "all"):
+        load_env()
+
+    metrics = RunMetrics()
+    if args.profile:
+        import cProfile
+        import pstats
+        prof = cProfile.Profile()
+        prof.runcall(run_pipeline, args, metrics)
+        prof.dump_stats(args.profile)
+        pstats.Stats(prof).sort_stats("cumulative").print_stats(20)
+    else:
+        run_pipeline(args, metrics)
+
+
+def run_pipeline(args, metrics: RunMetrics):
+    """
+    Stage dipisah supaya bisa dijalankan sendiri dari psi_results.json:
+      collect  PSI (atau --merge partial shard) -> psi_results.csv/json
+      history  append history + export shard + regression check
+      render   opportunities.json + dashboard + build assets (tanpa network; Chart.js hanya kalau sudah di-vendor)
+      notify   ringkasan run + regresi ke Telegram
+      all      collect -> notify -> history -> render (default, perilaku lama)
+    Run metrics hanya ditulis oleh collect / all.
+    """
+    cmd = args.command
+    if cmd in ("collect", "all"):
+        collected = stage_collect(args, metrics)
+        if collected is None or cmd == "collect":
+            if collected is not None:
+                metrics.write()
+            return
+        results, run_at = collected
+    else:
+        results, run_at = read_results_json(args.out_json)
+
+    if cmd == "history":
+        if run_at and history_has_run(run_at):
+            print(f"History: run {run_at} sudah tercatat, append dilewati")
+            stage_regression(metrics, run_at=run_at)
+        else:
+            stage_history(results, args, metrics, run_at=run_at)
+        return
+    if cmd == "render":
+        stage_render(results, carried_rows(results, args.csv), read_regression_report(), args, metrics)
+        return
+    if cmd == "notify":
+        # delta terhadap run sebelum psi_results.json, walau history run ini sudah ditulis
+        notifier = start_notify(results, previous=_previous_rows(run_at))
+        report = read_regression_report()
+        if report and run_at and report.get("generated_at", "") < run_at:
+            report = None  # laporan dari run sebelumnya
+        finish_notify(notifier, report, metrics)
+        return
+
+    # Optional Telegram notify: ringkasan dikirim di background (delta dihitung
+    # terhadap history sebelum run ini ditulis), overlap dengan history + render
+    notifier = start_notify(results)
+    carried, report = stage_history(results, args, metrics, run_at=run_at)
+    if notifier is not None and report and report.get("flags"):
+        from notify_telegram import notify_regressions
+        notify_regressions(report, notifier=notifier)
+    stage_render(results, carried, report, args, metrics)
+    finish_notify(notifier, None, metrics)
+    metrics.write()
+
+
+def stage_collect(args, metrics: RunMetrics) -> tuple[list[dict], str] | None:
+    """Collect / merge lalu tulis psi_results.csv/json. Mode --shard: tulis partial, return None."""
+    from psi_keys import merge_usage, usage_partial_path
+    shard = parse_shard(args.shard) if args.shard else None
+    # runner shard: pemakaian API key run ini ditulis di sebelah partial, digabung oleh --merge
+    key_usage_delta = usage_partial_path(partial_path(*shard, Path(args.partial_dir))) if shard else None
+    if args.merge:
+        with metrics.stage("merge"):
+            results = read_partials(Path(args.partial_dir), read_url_items(args.csv))
+            merge_usage(Path(args.partial_dir))
+    else:
+        with metrics.stage("collect"):
+            results = collect_psi_results(args.csv, sleep_sec=args.sleep, concurrency=args.concurrency,
+                                          rps=args.rps, rpm=args.rpm, max_retries=args.max_retries,
+                                          breaker_threshold=args.breaker_threshold, journal_path=args.journal,
+                                          resume=args.resume, resume_max_age_hours=args.resume_max_age,
+                                          budget_calls=args.budget_calls, budget_minutes=args.budget_minutes,
+                                          schedule=args.schedule, shard=shard, samples_max=args.samples_max,
+                                          sample_threshold=args.sample_threshold,
+                                          key_daily_quota=args.key_daily_quota, archive_lhr=args.archive_lhr,
+                                          key_usage_delta=key_usage_delta)
+    metrics.add_results(results)
+    if shard:
+        # job matrix: history, notify dan render dilakukan sekali di langkah --merge
+        out = write_partial(results, *shard, out_dir=Path(args.partial_dir))
+        metrics.write(json_path=out.with_name(f"metrics-{out.name}"),
+                      prom_path=out.with_name(f"metrics-{out.stem}.prom"), history_path=None)
+        return None
+
+    with metrics.stage("write"):
+        generated_at = write_csv_and_json(results, args.out_csv, args.out_json)
+    return results, generated_at
+
 
-    results = collect_psi_results(args.csv, sleep_sec=args.sleep)
-    write_csv_and_json(results, args.out_csv, args.out_json)
-    render_dashboard(results, args.out_html, maintainer_name=args.maintainer_name, maintainer_link=args.maintainer_link)
-    append_history_with_rotation(results)
+def stage_history(results, args, metrics: RunMetrics, run_at: str | None = None) -> tuple[list[dict], dict | None]:
+    """
+    Append hasil ke history (row tanpa run_at_utc diberi `run_at`, default waktu
+    sekarang) lalu regression check. Return (row carried untuk URL yang tidak
+    dites, laporan regresi).
+    """
+    # URL yang ditunda scheduler / dilewati breaker (tidak ada row di results):
+    # kartu dashboard pakai hasil terakhir di history, history sendiri tidak ditambah
+    with metrics.stage("history"):
+        carried = carried_rows(results, args.csv)
+        if run_at:
+            results = [{**r, "run_at_utc": r.get("run_at_utc") or run_at} for r in results]
+        append_history_with_rotation(results)
+    return carried, stage_regression(metrics, run_at=run_at)
 
-    # Optional Telegram notify
+
+def stage_regression(metrics: RunMetrics, run_at: str | None = None) -> dict | None:
+    # Regression detection (butuh numpy; opsional); hanya seri yang dites di run `run_at`
+    with metrics.stage("regression"):
+        try:
+            from history_rollup import TieredHistory
+            from regression import run_regression_stage
+            return run_regression_stage(TieredHistory(HISTORY_DIR / "store"), run_at=run_at)
+        except Exception as e:
+            print("Regression check skipped:", e)
+            return None
+
+
+def stage_render(results, carried, report, args, metrics: RunMetrics):
+    with metrics.stage("opportunities"):
+        opp_index = build_index(results)
+        write_index(opp_index)
+
+    with metrics.stage("render"):
+        render_dashboard(results + carried, args.out_html, maintainer_name=args.maintainer_name,
+                         maintainer_link=args.maintainer_link, render_mode=args.render_mode,
+                         regressions=(report or {}).get("flags"), opportunities=opp_index)
+
+    if not args.no_build:
+        with metrics.stage("build"):
+            # stage render sendiri tanpa network: Chart.js hanya di-download oleh `all`
+            build_dashboard(Path(args.out_html), download=args.command == "all")
+
+
+def start_notify(results, previous: dict | None = None):
     try:
         from notify_telegram import notify_run
-        notify_run(results, title="PageSpeed Report")
+        return notify_run(results, title="PageSpeed Report", previous=previous)
     except Exception as e:
         print("Telegram notify skipped:", e)
+        return None
+
+
+def finish_notify(notifier, report, metrics: RunMetrics):
+    if notifier is None:
+        return
+    if report and report.get("flags"):
+        from notify_telegram import notify_regressions
+        notify_regressions(report, notifier=notifier)
+    with metrics.stage("notify"):  # sisa antrean Telegram yang belum terkirim
+        notifier.close()
+
+
+def history_has_run(run_at: str) -> bool:
+    """True kalau history raw sudah punya row dengan run_at_utc ini (stage history dijalankan ulang)."""
+    from history_rollup import TieredHistory
+    store = TieredHistory(HISTORY_DIR / "store").raw
+    end = datetime.fromisoformat(run_at.replace("Z", "+00:00")) + timedelta(seconds=1)
+    return bool(store.query(since=run_at, until=end))
+
+
+def _previous_rows(run_at: str | None) -> dict | None:
+    return latest_rows(until=run_at) if run_at else None
+
+
+def read_regression_report(path: Path = REGRESSION_REPORT) -> dict | None:
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
 
 
 if __name__ == "__main__":
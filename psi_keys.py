@@ -0,0 +1,209 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from history_store import atomic_write_text
+from psi_client import CircuitOpenError
+from utils_ratelimit import TokenBucket
+
+# state runner (cache CI), di luar dashboard/ supaya fingerprint key dan pemakaian tidak ikut ter-deploy
+KEY_USAGE_FILE = Path("psi_state/key_usage.json")
+LEGACY_KEY_USAGE_FILE = Path("dashboard/history/key_usage.json")
+DAILY_QUOTA = 25000        # default kuota harian PSI per key (project Google Cloud)
+KEY_QUOTA_ERRORS = 5       # 429 berturut-turut sebelum key dikeluarkan dari rotasi (run ini)
+
+
+def load_api_keys() -> list[str]:
+    """
+    Key PSI dari env, urutan prioritas:
+      PSI_API_KEYS      dipisah koma
+      PSI_API_KEY_FILE  satu key per baris (# = komentar)
+      PSI_API_KEY       satu key (mode lama)
+    """
+    raw = os.getenv("PSI_API_KEYS", "")
+    keys = [k.strip() for k in raw.split(",")]
+    path = os.getenv("PSI_API_KEY_FILE", "")
+    if path and Path(path).exists():
+        keys += [ln.split("#", 1)[0].strip() for ln in Path(path).read_text(encoding="utf-8").splitlines()]
+    keys.append(os.getenv("PSI_API_KEY", "").strip())
+    return list(dict.fromkeys(k for k in keys if k))
+
+
+def key_id(key: str) -> str:
+    """Fingerprint pendek untuk log / file usage (key asli tidak pernah ditulis)."""
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:8]
+
+
+def usage_partial_path(partial: Path) -> Path:
+    """File pemakaian key satu shard, di sebelah partial shard-i-of-N.json."""
+    partial = Path(partial)
+    return partial.with_name(f"key_usage-{partial.name}")
+
+
+def _write_usage(path: Path, data: dict):
+    atomic_write_text(path, json.dumps(data, indent=2) + "\n")
+    LEGACY_KEY_USAGE_FILE.unlink(missing_ok=True)  # lokasi lama ikut ter-publish ke gh-pages
+
+
+def _read_json(path: Path) -> dict:
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def merge_usage(partial_dir: Path, usage_path: Path = KEY_USAGE_FILE) -> int:
+    """
+    --merge: tambahkan pemakaian run ini dari tiap shard (key_usage-shard-*.json)
+    ke `usage_path`. Setiap runner mulai dari file yang sama, jadi yang dijumlah
+    hanya call run itu sendiri; `exhausted` di-OR. Partial yang sudah pernah
+    digabung (run_id) dilewati. Return jumlah partial yang digabung.
+    """
+    parts = [_read_json(p) for p in sorted(Path(partial_dir).glob("key_usage-shard-*-of-*.json"))]
+    parts = [p for p in parts if p.get("day") and isinstance(p.get("keys"), dict)]
+    if not parts:
+        return 0
+    day = max(p["day"] for p in parts)  # shard yang melewati reset kuota: hanya hari terbaru
+    base = _read_json(usage_path)
+    if base.get("day") != day:
+        base = {"day": day, "keys": {}}
+    merged = set(base.get("merged", []))
+    n = 0
+    for p in parts:
+        if p["day"] != day or p.get("run_id") in merged:
+            continue
+        for kid, u in p["keys"].items():
+            cur = base["keys"].setdefault(kid, {"used": 0, "exhausted": False})
+            cur["used"] += int(u.get("used", 0))
+            cur["exhausted"] = bool(cur.get("exhausted") or u.get("exhausted"))
+        merged.add(p.get("run_id"))
+        base["daily_quota"] = p.get("daily_quota", base.get("daily_quota"))
+        n += 1
+    base["merged"] = sorted(m for m in merged if m)
+    _write_usage(usage_path, base)
+    print(f"PSI keys: pemakaian {n} shard digabung -> {usage_path}")
+    return n
+
+
+def quota_day(now: datetime | None = None) -> str:
+    """Kuota PSI reset tengah malam waktu Pasifik."""
+    now = now or datetime.now(timezone.utc)
+    try:
+        from zoneinfo import ZoneInfo
+        return now.astimezone(ZoneInfo("America/Los_Angeles")).date().isoformat()
+    except Exception:  # tzdata tidak ada
+        return (now - timedelta(hours=8)).date().isoformat()
+
+
+class KeyPool:
+    """
+    Rotasi beberapa API key PSI. Setiap key punya token bucket sendiri (`rate`
+    call/detik) dan counter harian yang disimpan di `usage_path` antar run.
+    Key dikeluarkan dari rotasi untuk run ini setelah `quota_errors` kali 429
+    berturut-turut, dan untuk sisa hari (disimpan) kalau 429-nya kuota harian
+    atau counter mencapai `daily_quota`. CircuitOpenError kalau semua key habis.
+
+    `delta_path` (runner --shard): `usage_path` hanya dibaca; save() menulis
+    pemakaian run ini saja ke `delta_path`, digabung nanti oleh merge_usage.
+    """
+
+    def __init__(self, keys, rate: float, daily_quota: int = DAILY_QUOTA,
+                 quota_errors: int = KEY_QUOTA_ERRORS, usage_path: Path = KEY_USAGE_FILE,
+                 delta_path: Path | None = None):
+        self.keys = list(keys)
+        self.daily_quota = int(daily_quota)
+        self.quota_errors = max(1, int(quota_errors))
+        self.usage_path = Path(usage_path)
+        self.delta_path = Path(delta_path) if delta_path else None
+        self.day = quota_day()
+        self._buckets = {k: TokenBucket(rate) for k in self.keys}
+        self._lock = threading.Lock()
+        self._next = 0
+        self._streak = {k: 0 for k in self.keys}
+        self._benched = set()
+        self._run = {k: {"calls": 0, "quota_errors": 0} for k in self.keys}
+        self._usage = self._load()
+
+    def _load(self) -> dict:
+        data = _read_json(self.usage_path)
+        saved = data.get("keys", {}) if data.get("day") == self.day else {}
+        self._merged = data.get("merged", []) if data.get("day") == self.day else []
+        return {k: {"used": 0, "exhausted": False, **saved.get(key_id(k), {})} for k in self.keys}
+
+    def _available(self, k: str) -> bool:
+        u = self._usage[k]
+        return k not in self._benched and not u["exhausted"] and u["used"] < self.daily_quota
+
+    @property
+    def active(self) -> int:
+        return sum(1 for k in self.keys if self._available(k))
+
+    def remaining(self) -> int:
+        """Sisa kuota hari ini, semua key aktif."""
+        return sum(self.daily_quota - self._usage[k]["used"] for k in self.keys if self._available(k))
+
+    def acquire(self) -> str:
+        """Ambil key berikutnya (round-robin) yang masih punya kuota dan token; block kalau semua sedang dibatasi rate."""
+        while True:
+            with self._lock:
+                wait = None
+                n = len(self.keys)
+                for i in range(n):
+                    k = self.keys[(self._next + i) % n]
+                    if not self._available(k):
+                        continue
+                    w = self._buckets[k].try_acquire()
+                    if w == 0.0:
+                        self._next = (self._next + i + 1) % n
+                        self._usage[k]["used"] += 1
+                        self._run[k]["calls"] += 1
+                        return k
+                    wait = w if wait is None else min(wait, w)
+                if wait is None:
+                    raise CircuitOpenError("Semua PSI API key kehabisan kuota")
+            time.sleep(wait)
+
+    def report(self, key: str, status: int | None, daily: bool = False):
+        """
+        Catat hasil call: 429 menambah streak quota error key, selain itu reset.
+        `daily`: response 429 menyebut kuota harian -> key habis sampai reset.
+        """
+        with self._lock:
+            if status != 429:
+                self._streak[key] = 0
+                return
+            self._streak[key] += 1
+            self._run[key]["quota_errors"] += 1
+            if daily and not self._usage[key]["exhausted"]:
+                self._usage[key]["exhausted"] = True
+                print(f"PSI key {key_id(key)}: kuota harian habis, dikeluarkan dari rotasi")
+            elif self._streak[key] >= self.quota_errors and key not in self._benched:
+                self._benched.add(key)
+                print(f"PSI key {key_id(key)}: {self._streak[key]}x quota error, dikeluarkan dari rotasi run ini")
+
+    def save(self):
+        if self.delta_path:
+            data = {"day": self.day, "daily_quota": self.daily_quota, "run_id": uuid.uuid4().hex,
+                    "keys": {key_id(k): {"used": self._run[k]["calls"], "exhausted": self._usage[k]["exhausted"]}
+                             for k in self.keys}}
+            atomic_write_text(self.delta_path, json.dumps(data, indent=2) + "\n")
+            return
+        data = {"day": self.day, "daily_quota": self.daily_quota,
+                "keys": {key_id(k): self._usage[k] for k in self.keys}, "merged": self._merged}
+        _write_usage(self.usage_path, data)
+
+    def summary_lines(self) -> list[str]:
+        out = []
+        for k in self.keys:
+            u, r = self._usage[k], self._run[k]
+            state = "exhausted" if u["exhausted"] else ("benched" if k in self._benched else "ok")
+            out.append(f"  key {key_id(k)}: {r['calls']} call run ini ({r['quota_errors']} x 429), "
+                       f"{u['used']}/{self.daily_quota} hari ini [{state}]")
+        return out
@@ -0,0 +1,170 @@
+from __future__ import annotations
+import html
+import json
+import warnings
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+
+from history_rollup import TieredHistory
+from history_store import atomic_write_text
+from utils_lhr import SCORE_FIELDS
+
+REPORT_FILE = Path("dashboard/regressions.json")
+
+DEFAULT_METRICS = SCORE_FIELDS + ("lcp_ms", "fcp_ms", "tbt_ms", "cls", "si_ms", "ttfb_ms", "total_bytes")
+HIGHER_IS_BETTER = set(SCORE_FIELDS)
+
+WINDOW = 14          # jumlah titik baseline per seri
+RECENT = 3           # titik terakhir untuk deteksi pergeseran (change point)
+MIN_HISTORY = 5      # minimal titik baseline sebelum seri bisa di-flag
+Z_THRESHOLD = 3.5    # robust z-score (median / MAD)
+LOOKBACK_DAYS = 90
+
+# Perubahan minimal supaya dianggap bermakna: absolut untuk skor / CLS,
+# relatif terhadap baseline untuk metric waktu dan bytes.
+MIN_ABS_DELTA = {"performance": 5, "accessibility": 3, "best_practices": 5, "seo": 3, "cls": 0.02}
+MIN_REL_DELTA = 0.10
+MIN_MS_DELTA = 50.0
+MIN_BYTES_DELTA = 10 * 1024.0
+
+
+def build_arrays(rows, metrics=DEFAULT_METRICS):
+    """
+    Rows (urut waktu) -> (keys, sid, values). `sid[i]` = index seri url x strategy,
+    `values[m, i]` = nilai metric ke-m (NaN jika kosong / row error).
+    """
+    keys: dict[tuple, int] = {}
+    n = len(rows)
+    sid = np.empty(n, dtype=np.int64)
+    values = np.full((len(metrics), n), np.nan)
+    for i, r in enumerate(rows):
+        sid[i] = keys.setdefault((r.get("url"), r.get("strategy")), len(keys))
+        if r.get("error"):
+            continue
+        for j, m in enumerate(metrics):
+            v = r.get(m)
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                values[j, i] = v
+    return list(keys), sid, values
+
+
+def _last_points(sid, v, n_series: int, width: int):
+    """Matrix [seri x width] berisi `width` nilai terakhir per seri (rata kanan, NaN padding)."""
+    ok = ~np.isnan(v)
+    sid, v = sid[ok], v[ok]
+    order = np.argsort(sid, kind="stable")  # stable: urutan waktu dalam seri tetap
+    sid, v = sid[order], v[order]
+    ends = np.cumsum(np.bincount(sid, minlength=n_series))
+    rank = ends[sid] - 1 - np.arange(len(sid))  # 0 = titik terbaru
+    keep = rank < width
+    mat = np.full((n_series, width), np.nan)
+    mat[sid[keep], width - 1 - rank[keep]] = v[keep]
+    return mat
+
+
+def _robust(base_block):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # seri tanpa data -> NaN
+        med = np.nanmedian(base_block, axis=1)
+        mad = np.nanmedian(np.abs(base_block - med[:, None]), axis=1)
+    return med, mad, np.sum(~np.isnan(base_block), axis=1)
+
+
+def detect_regressions(rows, metrics=DEFAULT_METRICS, window: int = WINDOW, recent: int = RECENT,
+                       z_threshold: float = Z_THRESHOLD, min_history: int = MIN_HISTORY,
+                       run_at: str | None = None) -> list[dict]:
+    """
+    Bandingkan titik terbaru tiap seri url x strategy x metric dengan baseline
+    median/MAD dari `window` titik sebelumnya (semua seri sekaligus, NumPy).
+      drop  : titik terbaru memburuk signifikan (robust z >= z_threshold)
+      shift : median `recent` titik terakhir juga memburuk vs baseline sebelumnya
+    Hanya seri yang titik terbarunya dari run `run_at` (default: run terbaru di
+    rows) yang di-flag; seri yang sudah tidak dites (URL dihapus / ditunda) tidak
+    di-flag ulang setiap run.
+    """
+    keys, sid, values = build_arrays(rows, metrics)
+    if not keys:
+        return []
+    ts = [r.get("run_at_utc") or "" for r in rows]
+    run_at = run_at or max(ts)
+    current = np.array([t >= run_at for t in ts])
+    row_idx = np.arange(len(rows), dtype=float)
+    flags = []
+    for j, metric in enumerate(metrics):
+        last = _last_points(sid, np.where(np.isnan(values[j]), np.nan, row_idx), len(keys), 1)[:, 0]
+        fresh = ~np.isnan(last) & current[np.nan_to_num(last).astype(np.int64)]
+        mat = _last_points(sid, values[j], len(keys), window + 1)
+        latest = mat[:, -1]
+        base, mad, n_hist = _robust(mat[:, :-1])
+        rec = _last_points(sid, values[j], len(keys), window + recent)
+        rbase, rmad, rn = _robust(rec[:, :-recent])
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            rmed = np.nanmedian(rec[:, -recent:], axis=1)
+
+        sign = -1.0 if metric in HIGHER_IS_BETTER else 1.0
+        if metric in MIN_ABS_DELTA:
+            min_delta = np.full(len(keys), float(MIN_ABS_DELTA[metric]))
+        else:
+            abs_floor = MIN_MS_DELTA if metric.endswith("_ms") else (MIN_BYTES_DELTA if metric.endswith("bytes") else 0.0)
+            min_delta = np.maximum(np.abs(base) * MIN_REL_DELTA, abs_floor)
+        floor = min_delta / 2  # hindari z tak hingga saat MAD = 0 (seri sangat stabil)
+
+        worse = sign * (latest - base)
+        z = worse / np.maximum(1.4826 * mad, floor)
+        drop = fresh & (n_hist >= min_history) & (worse >= min_delta) & (z >= z_threshold)
+
+        rworse = sign * (rmed - rbase)
+        rz = rworse / np.maximum(1.4826 * rmad, floor)
+        shift = fresh & (rn >= min_history) & (rworse >= min_delta) & (rz >= z_threshold)
+
+        for s in np.flatnonzero(drop | shift):
+            url, strategy = keys[s]
+            flags.append({
+                "url": url, "strategy": strategy, "metric": metric,
+                "kind": "shift" if shift[s] else "drop",
+                "baseline": round(float(base[s]), 3),
+                "latest": round(float(latest[s]), 3),
+                "delta": round(float(latest[s] - base[s]), 3),
+                "z": round(float(max(z[s], rz[s] if shift[s] else 0)), 2),
+                "n": int(n_hist[s]),
+            })
+    flags.sort(key=lambda f: -f["z"])
+    return flags
+
+
+def run_regression_stage(tiers: TieredHistory, out_path: Path = REPORT_FILE,
+                         lookback_days: int = LOOKBACK_DAYS, run_at: str | None = None) -> dict:
+    """
+    Muat history `lookback_days` terakhir, deteksi regresi untuk seri yang dites
+    di run `run_at` (default run terbaru), tulis dashboard/regressions.json.
+    """
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    rows = tiers.query(since=now - timedelta(days=lookback_days))
+    report = {
+        "generated_at": now.isoformat().replace("+00:00", "Z"),
+        "window": WINDOW,
+        "flags": detect_regressions(rows, run_at=run_at),
+    }
+    atomic_write_text(out_path, json.dumps(report, ensure_ascii=False, indent=2) + "\n")
+    print(f"Regression check: {len(report['flags'])} flagged series ({len(rows)} history rows)")
+    return report
+
+
+def format_regression_report(report: dict, limit: int = 10) -> str:
+    """Ringkasan HTML (Telegram) untuk seri yang di-flag."""
+    flags = report.get("flags") or []
+    if not flags:
+        return ""
+    lines = [f"<b>Regresi terdeteksi: {len(flags)} seri</b>"]
+    for f in flags[:limit]:
+        arrow = "▼" if f["metric"] in HIGHER_IS_BETTER else "▲"
+        lines.append(
+            f"{arrow} {f['metric']} [{f['strategy']}] {f['baseline']:g} → {f['latest']:g}"
+            f" ({f['kind']}, z={f['z']:g})\n{html.escape(f['url'])}"
+        )
+    if len(flags) > limit:
+        lines.append(f"… +{len(flags) - limit} lainnya")
+    return "\n".join(lines)
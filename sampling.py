@@ -0,0 +1,61 @@
+from __future__ import annotations
+from datetime import datetime, timedelta, timezone
+from statistics import median, quantiles
+
+from history_rollup import TieredHistory
+from utils_history import HISTORY_DIR, normalize_url
+
+BASELINE_DAYS = 14       # history raw untuk baseline per seri
+BASELINE_MIN_POINTS = 3  # kurang dari ini: tidak ada baseline, cukup 1 sample
+SPREAD_FIELDS = ("samples", "perf_min", "perf_max", "perf_iqr")
+SUM_FIELDS = ("retries", "response_bytes", "parse_ms")  # biaya semua sample dijumlah
+
+
+def baseline_scores(tiers: TieredHistory | None = None, days: int = BASELINE_DAYS) -> dict:
+    """Map (url, strategy) -> median skor performance `days` hari terakhir (row sukses saja)."""
+    tiers = tiers or TieredHistory(HISTORY_DIR / "store")
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    perf: dict[tuple, list] = {}
+    for r in tiers.raw.query(since=since):
+        if not r.get("error") and isinstance(r.get("performance"), (int, float)):
+            perf.setdefault((r.get("url"), r.get("strategy")), []).append(r["performance"])
+    return {k: median(v) for k, v in perf.items() if len(v) >= BASELINE_MIN_POINTS}
+
+
+def measure(sample, url: str, strategy: str, baselines: dict, max_samples: int = 3,
+            threshold: float = 5.0) -> dict:
+    """
+    Ambil 1 sample lewat `sample()`; tambah sample (sampai `max_samples`) selama
+    median performance masih beda > `threshold` poin dari baseline history.
+    Hasil = row dari run median (semua metric dari satu run Lighthouse yang
+    sama, termasuk `fetch_time` / `lhr_root` report archive-nya) + spread
+    n/min/max/IQR skor performance. Sample yang error diabaikan selama ada yang sukses.
+    `sample()` None (tidak diukur, breaker terbuka): sample pertama -> return None,
+    sample tambahan -> berhenti menambah sample.
+    """
+    base = baselines.get((normalize_url(url), strategy))
+    first = sample()
+    if first is None or first.get("error"):
+        return first  # None: tidak diukur (breaker terbuka)
+    runs = [first]
+    while len(runs) < max_samples and base is not None:
+        ok = [r for r in runs if not r.get("error")]
+        if abs(median(r["performance"] for r in ok) - base) <= threshold:
+            break
+        extra = sample()
+        if extra is None:
+            break
+        runs.append(extra)
+
+    ok = sorted((r for r in runs if not r.get("error")), key=lambda r: r["performance"])
+    row = dict(ok[(len(ok) - 1) // 2])  # run median (genap: bawah)
+    perf = [r["performance"] for r in ok]
+    row["samples"] = len(ok)
+    row["perf_min"], row["perf_max"] = perf[0], perf[-1]
+    q = quantiles(perf, n=4, method="inclusive") if len(perf) >= 2 else (perf[0], perf[0], perf[0])
+    row["perf_iqr"] = round(q[2] - q[0], 1)
+    for k in SUM_FIELDS:
+        vals = [r.get(k) for r in runs if isinstance(r.get(k), (int, float))]
+        if vals:
+            row[k] = round(sum(vals), 1) if k == "parse_ms" else sum(vals)
+    return row
@@ -0,0 +1,149 @@
+from __future__ import annotations
+import csv
+import json
+import math
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from statistics import pstdev
+
+from history_rollup import TieredHistory
+from utils_history import HISTORY_DIR, normalize_url
+from utils_metrics import METRICS_HISTORY
+
+SCORE_BUCKETS = (50, 90)      # batas warna PSI (merah / oranye / hijau)
+LOOKBACK_DAYS = 35            # history raw yang dipakai untuk ranking
+VARIANCE_POINTS = 7           # titik terakhir untuk menghitung volatilitas
+DEFAULT_CALL_SECONDS = 30.0   # estimasi durasi 1 PSI call kalau belum ada run_metrics
+
+# Bobot komponen skor prioritas
+W_STALE = 1.0
+W_VARIANCE = 1.0
+W_THRESHOLD = 1.0
+NEVER_TESTED = 100.0          # seri baru selalu didahulukan
+DUE_SLACK_DAYS = 0.25         # toleransi jadwal cron yang bergeser beberapa jam
+
+
+def _parse_ts(s):
+    try:
+        return datetime.fromisoformat((s or "").replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def _float(v, default):
+    try:
+        return float(v) if str(v).strip() != "" else default
+    except (TypeError, ValueError):
+        return default
+
+
+def read_schedule_hints(csv_path: str) -> dict:
+    """
+    Kolom opsional di urls.csv:
+      priority   : pengali skor (default 1; 0 = dites paling akhir)
+      every_days : interval minimal antar tes (default 0 = setiap run)
+    """
+    hints = {}
+    with open(csv_path, "r", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            url = (row.get("url") or "").strip()
+            strat = (row.get("strategy") or "mobile").strip().lower()
+            hints[(url, strat)] = {
+                "priority": max(0.0, _float(row.get("priority"), 1.0)),
+                "every_days": max(0.0, _float(row.get("every_days"), 0.0)),
+            }
+    return hints
+
+
+def series_stats(tiers: TieredHistory, now: datetime, lookback_days: int = LOOKBACK_DAYS) -> dict:
+    """Map (url, strategy) -> {"last": datetime, "perf": [skor performance terakhir...]}."""
+    stats: dict[tuple, dict] = {}
+    for r in tiers.raw.query(since=now - timedelta(days=lookback_days)):
+        if r.get("error"):
+            continue
+        s = stats.setdefault((r.get("url"), r.get("strategy")), {"last": None, "perf": []})
+        ts = _parse_ts(r.get("run_at_utc"))
+        if ts and (s["last"] is None or ts > s["last"]):
+            s["last"] = ts
+        if isinstance(r.get("performance"), (int, float)):
+            s["perf"].append(r["performance"])
+    return stats
+
+
+def score_item(stat: dict | None, hint: dict, now: datetime) -> tuple[float, bool]:
+    """
+    (skor, due). Skor = staleness (hari / interval) + volatilitas (stdev skor
+    performance / 10) + kedekatan ke batas bucket 50/90, dikali priority.
+    `due` False kalau tes terakhir masih di dalam interval every_days.
+    """
+    if not stat or stat["last"] is None:
+        return NEVER_TESTED * max(hint["priority"], 0.01), True
+    age_days = (now - stat["last"]).total_seconds() / 86400
+    due = age_days >= hint["every_days"] - DUE_SLACK_DAYS
+    stale = age_days / max(hint["every_days"], 1.0)
+    perf = stat["perf"][-VARIANCE_POINTS:]
+    variance = pstdev(perf) / 10 if len(perf) >= 2 else 1.0
+    near = 0.0
+    if perf:
+        gap = min(abs(perf[-1] - b) for b in SCORE_BUCKETS)
+        near = max(0.0, 1.0 - gap / 10)  # 1.0 tepat di batas, 0 kalau >= 10 poin
+    score = W_STALE * stale + W_VARIANCE * variance + W_THRESHOLD * near
+    return score * hint["priority"], due
+
+
+def estimate_call_seconds(history_path: Path = METRICS_HISTORY) -> float:
+    """Median request_ms dari run terakhir (run_metrics.jsonl), fallback DEFAULT_CALL_SECONDS."""
+    try:
+        lines = history_path.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return DEFAULT_CALL_SECONDS
+    for line in reversed(lines):
+        try:
+            p50 = json.loads(line).get("request_ms_p50")
+        except ValueError:
+            continue
+        if isinstance(p50, (int, float)) and p50 > 0:
+            return p50 / 1000
+    return DEFAULT_CALL_SECONDS
+
+
+def budget_calls(budget_calls: int | None, budget_minutes: float | None, concurrency: int,
+                 rate_per_sec: float) -> int | None:
+    """Budget per run dalam jumlah call; budget menit dikonversi lewat rate limit dan latency run sebelumnya."""
+    limits = []
+    if budget_calls:
+        limits.append(int(budget_calls))
+    if budget_minutes:
+        secs = budget_minutes * 60
+        by_latency = secs * max(1, concurrency) / estimate_call_seconds()
+        by_rate = secs * rate_per_sec if rate_per_sec > 0 else math.inf
+        limits.append(int(min(by_latency, by_rate)))
+    return max(1, min(limits)) if limits else None
+
+
+def plan_run(items, csv_path: str, max_calls: int | None, tiers: TieredHistory | None = None,
+             now: datetime | None = None) -> tuple[list, list]:
+    """
+    Pilih item yang dites run ini -> (todo, deferred). Item yang belum due
+    (every_days) selalu ditunda. Item due diurutkan berdasarkan skor
+    (priority 0 paling akhir) dan diambil sampai `max_calls`.
+    """
+    now = now or datetime.now(timezone.utc)
+    tiers = tiers or TieredHistory(HISTORY_DIR / "store")
+    hints = read_schedule_hints(csv_path)
+    stats = series_stats(tiers, now)
+
+    ranked, deferred = [], []
+    for pos, key in enumerate(dict.fromkeys(items)):  # url duplikat cukup dites sekali
+        hint = hints.get(key, {"priority": 1.0, "every_days": 0.0})
+        score, due = score_item(stats.get((normalize_url(key[0]), key[1])), hint, now)
+        if not due:
+            deferred.append(key)
+            continue
+        ranked.append((hint["priority"] == 0, -score, pos, key))
+    ranked.sort()
+    todo = [r[3] for r in ranked]
+    if max_calls is not None:
+        deferred += todo[max_calls:]
+        todo = todo[:max_calls]
+    return todo, deferred
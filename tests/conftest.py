@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# modul project ada di root repo (tanpa package)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
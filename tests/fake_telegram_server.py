@@ -0,0 +1,146 @@
+"""
+Fake Telegram Bot API lokal untuk testing notify_telegram (tanpa bot / jaringan).
+
+    python tests/fake_telegram_server.py --port 8081 --script 429,500
+    TELEGRAM_API_BASE=http://127.0.0.1:8081 TELEGRAM_BOT_TOKEN=x TELEGRAM_CHAT_ID=1 python notify_telegram.py
+
+Hanya `sendMessage`: pesan dicatat berurutan, dan seperti Bot API asli teks
+> 4096 karakter atau HTML yang tidak valid (parse_mode=HTML) ditolak dengan 400.
+`script` = status untuk request berikutnya (mis. 429 dengan retry_after, 500)
+sebelum kembali normal.
+"""
+from __future__ import annotations
+import argparse
+import json
+import re
+import threading
+from html.parser import HTMLParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MAX_MESSAGE_LEN = 4096
+ALLOWED_TAGS = {"b", "strong", "i", "em", "u", "ins", "s", "strike", "del", "a", "code", "pre",
+                "span", "tg-spoiler", "tg-emoji", "blockquote"}
+_ENTITY = re.compile(r"&(#\d+|#x[0-9a-fA-F]+|lt|gt|amp|quot);")
+
+
+class _TagChecker(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.stack: list[str] = []
+        self.error: str | None = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in ALLOWED_TAGS:
+            self.error = self.error or f"Unsupported start tag \"{tag}\""
+        self.stack.append(tag)
+
+    def handle_endtag(self, tag):
+        if not self.stack or self.stack[-1] != tag:
+            self.error = self.error or f"Unexpected end tag \"{tag}\""
+            return
+        self.stack.pop()
+
+
+def html_error(text: str) -> str | None:
+    """Alasan Telegram menolak `text` (parse_mode=HTML), atau None kalau valid."""
+    if len(text) > MAX_MESSAGE_LEN:
+        return "Bad Request: message is too long"
+    for m in re.finditer(r"&", text):
+        if not _ENTITY.match(text, m.start()):
+            return "Bad Request: can't parse entities: unsupported entity"
+    if re.search(r"<[^>]*$", text):
+        return "Bad Request: can't parse entities: unclosed start tag"
+    checker = _TagChecker()
+    checker.feed(text)
+    checker.close()
+    if checker.error or checker.stack:
+        return f"Bad Request: can't parse entities: {checker.error or 'unclosed tag ' + checker.stack[-1]}"
+    return None
+
+
+class FakeBotAPI:
+    """
+    Server sendMessage di thread background. `messages` = teks yang diterima
+    (200), `requests` = jumlah semua request. Pakai sebagai context manager;
+    `base` untuk TELEGRAM_API_BASE.
+    """
+
+    def __init__(self, script=(), retry_after: float = 0.01, port: int = 0):
+        self.script = list(script)
+        self.retry_after = retry_after
+        self.messages: list[str] = []
+        self.rejected: list[str] = []
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def _reply(self, text: str) -> tuple[int, dict]:
+        with self._lock:
+            self.requests += 1
+            status = self.script.pop(0) if self.script else 200
+            if status == 200:
+                err = html_error(text)
+                if err:
+                    self.rejected.append(text)
+                    return 400, {"ok": False, "error_code": 400, "description": err}
+                self.messages.append(text)
+                return 200, {"ok": True, "result": {"message_id": len(self.messages), "text": text}}
+        body = {"ok": False, "error_code": status, "description": "fake error"}
+        if status == 429:
+            body["parameters"] = {"retry_after": self.retry_after}
+        return status, body
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    payload = {}
+                if not self.path.endswith("/sendMessage"):
+                    status, body = 404, {"ok": False, "error_code": 404, "description": "Not Found"}
+                else:
+                    status, body = fake._reply(str(payload.get("text", "")))
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API (sendMessage)")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--script", default="", help="Status untuk request awal, mis. 429,500")
+    args = parser.parse_args()
+    script = [int(s) for s in args.script.split(",") if s]
+    with FakeBotAPI(script, port=args.port) as fake:
+        print(f"Fake Bot API di {fake.base} (Ctrl+C untuk berhenti)")
+        try:
+            fake._thread.join()
+        except KeyboardInterrupt:
+            pass
+        print(f"{len(fake.messages)} pesan diterima, {len(fake.rejected)} ditolak")
+
+
+if __name__ == "__main__":
+    main()
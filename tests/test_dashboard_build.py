@@ -0,0 +1,69 @@
+import json
+import re
+
+import pytest
+
+import dashboard_build
+from dashboard_build import CHART_JS_URL, build_dashboard
+from psi_csv_dashboard import render_dashboard
+
+ROWS = [{"url": "https://a.example", "strategy": st, "performance": 90, "lcp_ms": 2100, "cls": 0.01}
+        for st in ("mobile", "desktop")]
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    """urlopen gagal seperti tanpa jaringan; return daftar URL yang dicoba."""
+    calls = []
+
+    def urlopen(url, timeout=None):
+        calls.append(url)
+        raise OSError("network unreachable")
+
+    monkeypatch.setattr(dashboard_build.urllib.request, "urlopen", urlopen)
+    return calls
+
+
+def _render(tmp_path):
+    html = tmp_path / "dashboard" / "index.html"
+    html.parent.mkdir()
+    render_dashboard(ROWS, str(html), render_mode="html")
+    return html
+
+
+def _render_again(html):
+    render_dashboard(ROWS, str(html), render_mode="html")
+    return html
+
+
+def test_trend_engine_is_hashed_asset(tmp_path, offline):
+    html = _render(tmp_path)
+    build_dashboard(html)
+    out = html.read_text(encoding="utf-8")
+    m = re.search(r"<script id='trendEngine' type='text/plain' data-src='(assets/engine\.[0-9a-f]{10}\.js)'></script>", out)
+    assert m and "function createTrendEngine" not in out
+    engine = (html.parent / m.group(1)).read_text(encoding="utf-8")
+    assert engine.startswith("function createTrendEngine(")
+    assert m.group(1) in json.loads((html.parent / "assets" / "build.json").read_text())["files"]
+
+    # render ulang, engine sama -> nama asset sama (cache browser tetap valid)
+    html = _render_again(html)
+    build_dashboard(html)
+    assert m.group(1) in html.read_text(encoding="utf-8")
+
+
+def test_failed_chart_js_download_is_cached(tmp_path, offline):
+    html = _render(tmp_path)
+    build_dashboard(html)
+    build_dashboard(_render_again(html))
+    assert offline == [CHART_JS_URL]  # tidak di-retry tiap run
+    state = json.loads((html.parent / "assets" / "build.json").read_text())
+    assert state["chart_js_failed"]["url"] == CHART_JS_URL
+    assert f"<script src='{CHART_JS_URL}'></script>" in html.read_text(encoding="utf-8")  # fallback CDN
+
+
+def test_build_without_download_uses_no_network(tmp_path, offline):
+    html = _render(tmp_path)
+    build_dashboard(html, download=False)
+    assert offline == []
+    assert "chart_js_failed" not in json.loads((html.parent / "assets" / "build.json").read_text())
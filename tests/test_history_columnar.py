@@ -0,0 +1,119 @@
+import json
+import re
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from history_columnar import FORMAT, decode_columns, encode_columns
+from history_rollup import ROLLUP_METRICS
+
+ROWS = [
+    {"url": "https://a.example/", "strategy": "mobile", "run_at_utc": "2026-03-02T01:00:00Z",
+     "performance": 71, "lcp_ms": 2510, "cls": 0.125, "tbt_ms": 0},
+    {"url": "https://a.example/", "strategy": "desktop", "run_at_utc": "2026-03-01T01:00:00Z",
+     "performance": 98, "lcp_ms": 900, "cls": 0.0, "seo": 100},
+    {"url": "https://b.example/", "strategy": "mobile", "run_at_utc": "2026-03-01T01:00:00Z",
+     "performance": None, "lcp_ms": 4100, "cls": 0.301},
+    {"url": "https://a.example/", "strategy": "mobile", "run_at_utc": "2026-02-20T00:00:00Z",
+     "rollup": "day", "performance": 65, "lcp_ms": 3000, "cls": 0.05},
+    {"url": "https://a.example/", "strategy": "mobile", "run_at_utc": "2026-01-05T00:00:00Z",
+     "rollup": "week", "performance": 60, "fcp_ms": 1800},
+    # dilewati encoder
+    {"url": "https://a.example/", "strategy": "mobile", "run_at_utc": "2026-03-02T02:00:00Z",
+     "error": "HTTP 500", "performance": 0},
+    {"url": "https://a.example/", "strategy": "mobile", "performance": 50},
+]
+
+
+def _expected(rows):
+    out = []
+    for r in rows:
+        if r.get("error") or not r.get("run_at_utc"):
+            continue
+        row = {"url": r["url"], "strategy": r["strategy"], "run_at_utc": r["run_at_utc"]}
+        if r.get("rollup"):
+            row["rollup"] = r["rollup"]
+        row.update({m: r[m] for m in ROLLUP_METRICS if r.get(m) is not None})
+        out.append(row)
+    return sorted(out, key=lambda r: r["run_at_utc"])
+
+
+def test_round_trip():
+    doc = encode_columns(ROWS)
+    assert doc["format"] == FORMAT and doc["n"] == 5
+    assert decode_columns(json.loads(json.dumps(doc))) == _expected(ROWS)
+
+
+def test_encoding_is_compact():
+    doc = encode_columns(ROWS)
+    assert all(isinstance(v, int) for v in doc["dt"]) and min(doc["dt"]) >= 0
+    assert doc["cols"]["cls"] == [None, 50, 0, 301, 125]  # x1000
+    assert doc["scale"] == {"cls": 1000}
+    assert "accessibility" not in doc["cols"]  # kosong semua -> tidak ditulis
+    assert doc["urls"] == ["https://a.example/", "https://b.example/"]
+
+
+def test_empty():
+    doc = encode_columns([])
+    assert doc["n"] == 0 and doc["cols"] == {}
+    assert decode_columns(doc) == []
+
+
+def _engine_source() -> str:
+    src = (Path(__file__).resolve().parents[1] / "psi_csv_dashboard.py").read_text(encoding="utf-8")
+    return re.search(r"<script id='trendEngine' type='text/plain'>\n(.*?)</script>", src, re.S).group(1)
+
+
+NODE_HARNESS = r"""
+const fs = require('fs'), {fileURLToPath} = require('url');
+const [engineFile, base, queries] = process.argv.slice(2);
+globalThis.fetch = async (href) => {
+  const p = fileURLToPath(href);
+  if (!fs.existsSync(p)) return {ok: false};
+  return {ok: true, json: async () => JSON.parse(fs.readFileSync(p, 'utf8'))};
+};
+const create = new Function(fs.readFileSync(engineFile, 'utf8') + '\nreturn createTrendEngine;')();
+(async () => {
+  const engine = create(base, []);
+  const out = {};
+  await engine.init();
+  for (const [url, metric] of JSON.parse(queries)) {
+    await engine.select({url});
+    const res = engine.query({metric, strategies: ['mobile', 'desktop'], maxPoints: 1000});
+    for (const s of res.series)
+      out[[url, s.strategy, metric].join('|')] = Array.from(s.t).map((t, i) => [new Date(t).toISOString().replace('.000Z', 'Z'), s.v[i]]);
+  }
+  console.log(JSON.stringify(out));
+})();
+"""
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node tidak terpasang")
+def test_dashboard_engine_decodes_same_values(tmp_path):
+    """decodeColumns di trend engine (JS) membaca shard sama seperti decode_columns."""
+    site = tmp_path / "site"
+    (site / "history").mkdir(parents=True)
+    (site / "history" / "a.col.json").write_text(json.dumps(encode_columns(ROWS)), encoding="utf-8")
+    urls = sorted({r["url"] for r in ROWS})
+    (site / "history" / "manifest.json").write_text(json.dumps({"format": FORMAT, "series": [
+        {"url": u, "strategy": "mobile", "shard": "history/a.col.json"} for u in urls]}))
+    (tmp_path / "engine.js").write_text(_engine_source(), encoding="utf-8")
+    (tmp_path / "harness.js").write_text(NODE_HARNESS, encoding="utf-8")
+
+    metrics = ["performance", "seo", "lcp_ms", "fcp_ms", "tbt_ms", "cls"]
+    queries = [[u, m] for u in urls for m in metrics]
+    proc = subprocess.run(["node", str(tmp_path / "harness.js"), str(tmp_path / "engine.js"),
+                           site.as_uri() + "/", json.dumps(queries)],
+                          capture_output=True, text=True, timeout=60, check=True)
+    got = json.loads(proc.stdout)
+
+    want = {}
+    for r in decode_columns(encode_columns(ROWS)):
+        for m in metrics:
+            v = r.get(m)
+            if v is None or (v == 0 and m in ("performance", "seo")):  # skor 0 = kosong di dashboard
+                continue
+            want.setdefault("|".join((r["url"], r["strategy"], m)), []).append([r["run_at_utc"], v])
+    assert got == want
@@ -0,0 +1,79 @@
+from history_store import COMPACT_SEGMENTS, HistoryStore
+
+
+def _row(ts, url="https://a.example/", strategy="mobile", **metrics):
+    return {"url": url, "strategy": strategy, "run_at_utc": ts, "performance": 90, **metrics}
+
+
+def _files(store):
+    return sorted(p.relative_to(store.root).as_posix() for p in store.root.rglob("*.jsonl"))
+
+
+def test_append_writes_one_segment_per_month(tmp_path):
+    store = HistoryStore(tmp_path)
+    store.append([_row("2026-01-31T23:00:00Z"), _row("2026-02-01T01:00:00Z", strategy="desktop")])
+    files = _files(store)
+    assert len(files) == 2
+    assert files[0].startswith("seg/2026-01/") and files[1].startswith("seg/2026-02/")
+    assert store.months() == ["2026-01", "2026-02"]
+
+
+def test_query_filters_and_sorts(tmp_path):
+    store = HistoryStore(tmp_path)
+    store.append([_row("2026-03-02T00:00:00Z", lcp_ms=2000)])
+    store.append([_row("2026-03-01T00:00:00Z", lcp_ms=1000),
+                  _row("2026-03-01T00:00:00Z", url="https://b.example/", lcp_ms=3000)])
+    rows = store.query(url="https://a.example/", strategy="mobile", metrics=["lcp_ms"])
+    assert [(r["run_at_utc"], r["lcp_ms"]) for r in rows] == [
+        ("2026-03-01T00:00:00Z", 1000), ("2026-03-02T00:00:00Z", 2000)]
+    assert set(rows[0]) == {"url", "strategy", "run_at_utc", "lcp_ms"}
+    assert len(store.query(since="2026-03-02T00:00:00Z")) == 1
+    assert len(store.query(until="2026-03-02T00:00:00Z")) == 2
+
+
+def test_compaction_preserves_rows(tmp_path):
+    store = HistoryStore(tmp_path)
+    rows = [_row(f"2026-04-{d:02d}T06:00:00Z", url=f"https://{u}.example/", lcp_ms=d * 100 + i)
+            for d in range(1, 6) for i, u in enumerate("abc")]
+    for d in range(5):
+        store.append(rows[d * 3:d * 3 + 3])
+    before = store.query()
+
+    assert store.maybe_compact("2026-05") == ["2026-04"]
+    assert _files(store) == ["2026-04.jsonl"]
+    assert store.query() == before
+    assert sorted(store.iter_month("2026-04"), key=lambda r: (r["run_at_utc"], r["url"])) == rows
+
+    # segment berikutnya digabung ke file bulanan yang sudah ada
+    store.append([_row("2026-04-30T06:00:00Z")])
+    store.compact("2026-04")
+    assert len(store.query()) == len(rows) + 1
+
+
+def test_current_month_compacts_after_threshold(tmp_path):
+    store = HistoryStore(tmp_path)
+    for i in range(COMPACT_SEGMENTS - 1):
+        store.append([_row(f"2026-05-01T{i:02d}:00:00Z")])
+    assert store.maybe_compact("2026-05") == []
+    store.append([_row("2026-05-02T00:00:00Z")])
+    assert store.maybe_compact("2026-05") == ["2026-05"]
+    assert len(store.query()) == COMPACT_SEGMENTS
+
+
+def test_compaction_dedupes_reappended_run(tmp_path):
+    store = HistoryStore(tmp_path)
+    run = [_row("2026-06-01T00:00:00Z"), _row("2026-06-01T00:00:00Z", strategy="desktop")]
+    store.append(run)
+    store.append(run)  # run yang sama di-append ulang (mis. retry job)
+    store.compact("2026-06")
+    assert store.query() == sorted(run, key=lambda r: r["run_at_utc"])
+
+
+def test_drop_before(tmp_path):
+    store = HistoryStore(tmp_path)
+    store.append([_row("2026-01-15T00:00:00Z")])
+    store.append([_row("2026-02-10T00:00:00Z"), _row("2026-02-20T00:00:00Z")])
+    assert store.drop_before("2026-02-15T00:00:00Z") == ["2026-01", "2026-02"]
+    assert [r["run_at_utc"] for r in store.query()] == ["2026-02-20T00:00:00Z"]
+    assert store.months() == ["2026-02"]
+    assert store.drop_before("2026-02-15T00:00:00Z") == []
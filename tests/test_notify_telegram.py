@@ -0,0 +1,78 @@
+import re
+
+import pytest
+
+import notify_telegram
+from fake_telegram_server import FakeBotAPI, html_error
+
+
+@pytest.fixture
+def bot(monkeypatch):
+    """Factory FakeBotAPI; notify_telegram diarahkan ke server itu."""
+    started = []
+
+    def start(script=()):
+        fake = FakeBotAPI(script).__enter__()
+        started.append(fake)
+        monkeypatch.setattr(notify_telegram, "API_BASE", fake.base)
+        monkeypatch.setattr(notify_telegram, "BOT_TOKEN", "123:test")
+        monkeypatch.setattr(notify_telegram, "CHAT_ID", "42")
+        return fake
+
+    yield start
+    for fake in started:
+        fake.__exit__(None, None, None)
+
+
+def _text(html):
+    return re.sub(r"<[^>]*>", "", html)
+
+
+def test_split_message_keeps_lines_and_limit():
+    text = "\n".join(f"<b>{i}</b> baris" for i in range(2000))
+    parts = notify_telegram.split_message(text)
+    assert len(parts) > 1
+    assert all(len(p) <= notify_telegram.MAX_MESSAGE_LEN for p in parts)
+    assert "\n".join(parts) == text
+
+
+@pytest.mark.parametrize("limit", [30, 64, 4096])
+def test_split_long_line_keeps_html_valid(limit):
+    line = "x" * 50 + "<b>" + "y &amp; z " * 900 + '<a href="https://example.com/">' + "w" * 5000 + "</a></b>" + "end"
+    parts = notify_telegram.split_message(line, limit)
+    assert all(len(p) <= limit for p in parts)
+    assert all(html_error(p) is None for p in parts)
+    assert "".join(_text(p) for p in parts) == _text(line)
+
+
+def test_notifier_retries_429_and_5xx_in_order(bot):
+    fake = bot(script=[429, 500, 429])
+    notifier = notify_telegram.TelegramNotifier()
+    long_line = "<b>" + "regresi " * 1200 + "</b>"
+    for msg in ("satu", long_line, "tiga"):
+        notifier.send(msg)
+    assert notifier.close(timeout=30)
+    expected = ["satu", *notify_telegram.split_message(long_line), "tiga"]
+    assert fake.messages == expected
+    assert fake.rejected == []
+    assert fake.requests == len(expected) + 3
+    assert notifier.sent == len(expected) and notifier.failed == 0
+
+
+def test_notifier_does_not_retry_400(bot):
+    fake = bot()
+    notifier = notify_telegram.TelegramNotifier()
+    notifier.send("<b>tidak ditutup")
+    notifier.send("ok")
+    assert not notifier.close(timeout=30)
+    assert fake.requests == 2
+    assert fake.messages == ["ok"]
+    assert notifier.failed == 1
+
+
+def test_post_splits_and_sends(bot):
+    fake = bot()
+    text = "\n".join(f"<i>{i}</i> " + "a" * 100 for i in range(100))
+    assert notify_telegram._post(text)
+    assert "\n".join(fake.messages) == text
+    assert len(fake.messages) > 1
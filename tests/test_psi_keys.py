@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+import psi_keys
+from psi_keys import KeyPool, key_id, merge_usage, usage_partial_path
+
+KEYS = ["key-a", "key-b"]
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def _usage(path):
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _run_shard(i, n, calls, partial_dir):
+    pool = KeyPool(KEYS, rate=1000, delta_path=usage_partial_path(partial_dir / f"shard-{i}-of-{n}.json"))
+    for _ in range(calls):
+        pool.acquire()
+    pool.save()
+
+
+def test_usage_state_is_outside_published_dashboard():
+    assert "dashboard" not in psi_keys.KEY_USAGE_FILE.parts
+
+
+def test_merge_sums_shard_usage(workdir):
+    base = KeyPool(KEYS, rate=1000)
+    for _ in range(4):
+        base.acquire()
+    base.save()  # run sebelumnya hari ini: 2 call per key
+    partials = workdir / "psi_partials"
+    _run_shard(1, 2, 6, partials)
+    _run_shard(2, 2, 2, partials)
+    assert _usage(psi_keys.KEY_USAGE_FILE)["keys"][key_id("key-a")]["used"] == 2  # runner shard tidak menimpa
+
+    assert merge_usage(partials) == 2
+    keys = _usage(psi_keys.KEY_USAGE_FILE)["keys"]
+    assert sum(u["used"] for u in keys.values()) == 4 + 6 + 2
+    assert KeyPool(KEYS, rate=1000).remaining() == 2 * psi_keys.DAILY_QUOTA - 12
+
+    assert merge_usage(partials) == 0  # --merge diulang: tidak dihitung dua kali
+    assert sum(u["used"] for u in _usage(psi_keys.KEY_USAGE_FILE)["keys"].values()) == 12
+
+
+def test_merge_keeps_exhausted_and_drops_legacy_file(workdir):
+    legacy = psi_keys.LEGACY_KEY_USAGE_FILE
+    legacy.parent.mkdir(parents=True)
+    legacy.write_text("{}")
+    partials = workdir / "psi_partials"
+    pool = KeyPool(KEYS, rate=1000, delta_path=usage_partial_path(partials / "shard-1-of-1.json"))
+    pool.acquire()
+    pool.report("key-a", 429, daily=True)
+    pool.save()
+
+    merge_usage(partials)
+    assert _usage(psi_keys.KEY_USAGE_FILE)["keys"][key_id("key-a")] == {"used": 1, "exhausted": True}
+    assert not legacy.exists()
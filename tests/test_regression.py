@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+from regression import detect_regressions
+
+T0 = datetime(2026, 9, 1, 1)
+
+
+def _ts(day):
+    return (T0 + timedelta(days=day)).isoformat() + "Z"
+
+
+def _series(url, perfs, start=0):
+    return [{"url": url, "strategy": "mobile", "run_at_utc": _ts(start + i), "performance": p}
+            for i, p in enumerate(perfs)]
+
+
+def _rows(*series):
+    return sorted((r for s in series for r in s), key=lambda r: r["run_at_utc"])
+
+
+STABLE = [90, 91, 89, 90, 92, 90, 91, 89, 90, 91]
+
+
+def test_flags_drop_in_current_run():
+    rows = _rows(_series("https://a.example", STABLE + [60]))
+    flags = detect_regressions(rows, metrics=("performance",))
+    assert [(f["url"], f["kind"], f["latest"]) for f in flags] == [("https://a.example", "drop", 60.0)]
+
+
+def test_stale_series_is_not_reflagged():
+    # a: turun di hari ke-10 lalu tidak dites lagi (dihapus / ditunda); b: masih dites tiap hari
+    rows = _rows(_series("https://a.example", STABLE + [60]),
+                 _series("https://b.example", STABLE + [90, 91, 90]))
+    assert detect_regressions(rows, metrics=("performance",)) == []
+    assert detect_regressions(rows, metrics=("performance",), run_at=_ts(10))[0]["url"] == "https://a.example"
+
+
+def test_error_in_current_run_does_not_reflag_old_point():
+    rows = _rows(_series("https://a.example", STABLE + [60]))
+    rows.append({"url": "https://a.example", "strategy": "mobile", "run_at_utc": _ts(11), "error": "HTTP 500"})
+    assert detect_regressions(rows, metrics=("performance",)) == []
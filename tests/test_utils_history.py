@@ -0,0 +1,108 @@
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+import psi_csv_dashboard
+import utils_history
+from history_columnar import decode_columns
+from history_rollup import TieredHistory
+
+URLS = ["https://a.example", "https://b.example/page"]
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Semua path history relatif ke cwd (dashboard/history/...)."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def _iso(dt):
+    return dt.replace(microsecond=0).isoformat().replace("+00:00", "Z")
+
+
+def _run(ts, perf=90):
+    return [{"url": u, "strategy": st, "run_at_utc": ts, "performance": perf - i, "lcp_ms": 2000 + 10 * i}
+            for i, u in enumerate(URLS) for st in ("mobile", "desktop")]
+
+
+def _manifest():
+    return json.loads(utils_history.MANIFEST_FILE.read_text(encoding="utf-8"))
+
+
+def _shard_rows(manifest):
+    """Semua row dari shard di manifest, per (url, strategy)."""
+    out = {}
+    for e in manifest["series"]:
+        for month, (path, count, first, last, *_) in e["months"].items():
+            rows = decode_columns(json.loads((Path("dashboard") / path).read_text(encoding="utf-8")))
+            assert len(rows) == count and rows[0]["run_at_utc"] == first and rows[-1]["run_at_utc"] == last
+            assert all(r["run_at_utc"][:7] == month for r in rows)
+            assert {(r["url"], r["strategy"]) for r in rows} == {(e["url"], e["strategy"])}
+            out.setdefault((e["url"], e["strategy"]), []).extend(rows)
+    return out
+
+
+def _tier_rows(tiers):
+    out = {}
+    for r in tiers.query():
+        row = {"url": r["url"], "strategy": r["strategy"], "run_at_utc": r["run_at_utc"]}
+        if r.get("rollup"):
+            row["rollup"] = r["rollup"]
+        row.update({m: r[m] for m in ("performance", "lcp_ms") if r.get(m) is not None})
+        out.setdefault((r["url"], r["strategy"]), []).append(row)
+    return out
+
+
+def test_month_shards_and_manifest(workdir):
+    now = datetime.now(timezone.utc)
+    for days in (50, 40, 3, 1):  # dua run lama (rollup harian) + dua run raw
+        utils_history.append_history_with_rotation(_run(_iso(now - timedelta(days=days))))
+
+    manifest = _manifest()
+    assert manifest["layout"] == utils_history.SERIES_LAYOUT
+    assert {(e["url"], e["strategy"]) for e in manifest["series"]} == {
+        (u, st) for u in URLS for st in ("mobile", "desktop")}
+    months = {_iso(now - timedelta(days=d))[:7] for d in (50, 40, 3, 1)}
+    assert {m for e in manifest["series"] for m in e["months"]} == months
+    for e in manifest["series"]:
+        assert e["count"] == 4 and e["first"] < e["last"]
+
+    tiers = TieredHistory(utils_history.HISTORY_DIR / "store")
+    assert _shard_rows(manifest) == _tier_rows(tiers)
+
+
+def test_incremental_export_matches_full_export(workdir):
+    now = datetime.now(timezone.utc)
+    for days in (45, 30, 10, 2, 0):
+        utils_history.append_history_with_rotation(_run(_iso(now - timedelta(days=days)), perf=80 + days))
+    incremental = _manifest()
+    inc_rows = _shard_rows(incremental)
+
+    tiers = TieredHistory(utils_history.HISTORY_DIR / "store")
+    utils_history.export_series_shards(tiers)  # export ulang penuh
+    full = _manifest()
+    assert incremental["series"] == full["series"]
+    assert inc_rows == _shard_rows(full) == _tier_rows(tiers)
+
+
+def test_rerun_history_stage_is_idempotent(workdir, monkeypatch):
+    (workdir / "urls.csv").write_text("url,strategy\n" + "".join(f"{u},mobile\n{u},desktop\n" for u in URLS))
+    run_at = _iso(datetime.now(timezone.utc) - timedelta(hours=1))
+    (workdir / "psi_results.json").write_text(json.dumps({
+        "generated_at": run_at, "data": [{k: v for k, v in r.items() if k != "run_at_utc"} for r in _run(run_at)]}))
+
+    def history():
+        monkeypatch.setattr(sys, "argv", ["psi_csv_dashboard.py", "history"])
+        psi_csv_dashboard.main()
+        store = TieredHistory(utils_history.HISTORY_DIR / "store").raw
+        return store.query(), {e["url"] + e["strategy"]: e["count"] for e in _manifest()["series"]}
+
+    first = history()
+    assert len(first[0]) == 4 and all(r["run_at_utc"] == run_at for r in first[0])
+    assert psi_csv_dashboard.history_has_run(run_at)
+    assert history() == first
+    assert history() == first
@@ -1,19 +1,30 @@
 from __future__ import annotations
+import hashlib
 import json
+import shutil
 from pathlib import Path
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
+
+from history_rollup import TieredHistory
+from history_columnar import FORMAT as COLUMNS_FORMAT, compressed_variants, encode_columns, write_columns
+from history_store import HistoryStore, atomic_write_text
+from utils_metrics import URL_METRIC_FIELDS
 
 HISTORY_DIR = Path("dashboard/history")
 HISTORY_FILE = Path("dashboard/history.json")
-HISTORY_MAX_ENTRIES = 500  # ring buffer di file utama, simpan 500 run terakhir
+SERIES_DIR = HISTORY_DIR / "series"
+MANIFEST_FILE = HISTORY_DIR / "manifest.json"
+SERIES_LAYOUT = "month"  # series/YYYY-MM/<seri>.col.json
+# kolom per run yang tidak disimpan di history skor
+HISTORY_SKIP_FIELDS = frozenset(URL_METRIC_FIELDS) | {"opportunities"}
+HISTORY_HEAD_DAYS = 31  # history.json berisi raw row N hari terakhir (harus <= RAW_RETENTION_DAYS)
 
 def _ensure_dirs():
     HISTORY_DIR.mkdir(parents=True, exist_ok=True)
+    SERIES_DIR.mkdir(parents=True, exist_ok=True)
     HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
-    if not HISTORY_FILE.exists():
-        HISTORY_FILE.write_text("[]", encoding="utf-8")
 
-def _normalize_url(u: str) -> str:
+def normalize_url(u: str) -> str:
     if not isinstance(u, str): 
         return ""
     # Normalisasi trailing slash → tanpa slash di akhir (kecuali root '/')
@@ -21,54 +32,170 @@ def _normalize_url(u: str) -> str:
         return u.rstrip("/")
     return u
 
-def append_history_with_rotation(results):
+def _dump_json(path: Path, data):
+    # tulis dengan indent agar rapih; atomik lewat tmp + rename
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False, indent=2) + "\n")
+
+def _migrate_legacy_archives(store: HistoryStore):
+    """Import arsip lama dashboard/history/YYYY-MM.json ke store (sekali, saat store masih kosong)."""
+    if not store.is_empty():
+        return
+    for p in sorted(HISTORY_DIR.glob("????-??.json")):
+        try:
+            rows = json.loads(p.read_text(encoding="utf-8"))
+        except Exception:
+            continue
+        if isinstance(rows, list) and rows:
+            store.import_month(p.stem, [r for r in rows if isinstance(r, dict)])
+
+def export_month(tiers: TieredHistory, month: str) -> Path:
+    """Export satu bulan (raw + rollup untuk hari yang sudah di-expire) ke dashboard/history/YYYY-MM.json."""
+    path = HISTORY_DIR / f"{month}.json"
+    _dump_json(path, tiers.query_month(month))
+    return path
+
+def series_shard_name(url: str, strategy: str) -> str:
+    return f"{hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]}-{strategy}.col.json"
+
+def _load_manifest() -> dict | None:
+    try:
+        manifest = json.loads(MANIFEST_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format") != COLUMNS_FORMAT or manifest.get("layout") != SERIES_LAYOUT:
+        return None  # manifest format lama: export ulang semua
+    return manifest
+
+def export_series_shards(tiers: TieredHistory, months=None, touched: dict | None = None) -> int:
+    """
+    Shard kolom (history_columnar, + .gz/.br) per bulan x url x strategy di
+    dashboard/history/series/YYYY-MM/ dan manifest.json berisi daftar URL,
+    rentang tanggal dan shard per bulan. Dashboard hanya mengambil seri yang dipilih.
+
+    Incremental: `months` (bulan yang berubah karena rollup/retention) di-export
+    ulang untuk semua seri, `touched` ({bulan: {(url, strategy)}}) hanya seri yang
+    dapat row baru run ini. Bulan lain tidak dibaca. Export penuh kalau manifest
+    belum ada / format lama, atau `months` None.
+    """
+    manifest = None if months is None else _load_manifest()
+    live = set(tiers.months())
+    if manifest is None:
+        series: dict[tuple, dict] = {}
+        redo = {m: None for m in live}
+        for p in SERIES_DIR.iterdir():  # layout lama / export ulang penuh
+            shutil.rmtree(p) if p.is_dir() else p.unlink()
+    else:
+        series = {(e["url"], e["strategy"]): e for e in manifest["series"]}
+        redo = {m: set(keys) for m, keys in (touched or {}).items()}
+        redo.update({m: None for m in months})
+
+    for month in sorted(m for m in redo if m in live):
+        only = redo[month]
+        if only is None:  # seluruh bulan: buang shard lama, seri yang hilang ikut terhapus
+            shutil.rmtree(SERIES_DIR / month, ignore_errors=True)
+            for e in series.values():
+                e["months"].pop(month, None)
+        by_series: dict[tuple, list] = {}
+        for r in tiers.query_month(month):
+            key = (r.get("url") or "", r.get("strategy") or "")
+            if only is None or key in only:
+                by_series.setdefault(key, []).append(r)
+        for (url, strategy), rows in by_series.items():
+            name = series_shard_name(url, strategy)
+            (SERIES_DIR / month).mkdir(parents=True, exist_ok=True)
+            write_columns(SERIES_DIR / month / name, encode_columns(rows))
+            e = series.setdefault((url, strategy), {"url": url, "strategy": strategy, "months": {}})
+            # [path, jumlah row, run_at pertama, run_at terakhir]
+            e["months"][month] = [f"history/series/{month}/{name}", len(rows),
+                                  rows[0].get("run_at_utc"), rows[-1].get("run_at_utc")]
+
+    # bulan di luar semua tier retention
+    for p in SERIES_DIR.iterdir():
+        if p.name not in live:
+            shutil.rmtree(p) if p.is_dir() else p.unlink()
+    entries = []
+    for key in sorted(series):
+        e = series[key]
+        e["months"] = {m: v for m, v in sorted(e["months"].items()) if m in live}
+        if not e["months"]:
+            continue
+        parts = list(e["months"].values())
+        e.update(first=parts[0][2], last=parts[-1][3], count=sum(v[1] for v in parts))
+        entries.append(e)
+
+    generated = datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+    atomic_write_text(MANIFEST_FILE, json.dumps({
+        "generated_at": generated, "format": COLUMNS_FORMAT, "layout": SERIES_LAYOUT,
+        "compressed": compressed_variants(), "series": entries}, ensure_ascii=False, separators=(",", ":")) + "\n")
+    return len(entries)
+
+def latest_rows(tiers: TieredHistory | None = None, days: int = HISTORY_HEAD_DAYS, until=None) -> dict:
+    """
+    Map (url, strategy) -> row sukses terakhir di raw history `days` hari terakhir.
+    `until` (ISO / datetime): hanya row sebelum waktu itu (mis. run sebelum psi_results.json).
+    """
+    tiers = tiers or TieredHistory(HISTORY_DIR / "store")
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    out = {}
+    for r in tiers.raw.query(since=since, until=until):
+        if not r.get("error"):
+            out[(r.get("url"), r.get("strategy"))] = r
+    return out
+
+def append_history_with_rotation(results, tiers: TieredHistory | None = None):
     """
-    Append run results to dashboard/history.json and also write monthly archive
-    to dashboard/history/YYYY-MM.json. Adds run_at_utc per item if missing.
+    Append run results ke history store (segment append-only per run), roll up
+    hari/minggu yang sudah selesai, terapkan retention berbasis waktu, lalu
+    export view untuk dashboard: dashboard/history.json (raw HISTORY_HEAD_DAYS
+    hari terakhir) dan dashboard/history/YYYY-MM.json untuk bulan yang sudah
+    selesai atau berubah karena retention. Adds run_at_utc per item if missing.
     """
     _ensure_dirs()
+    tiers = tiers or TieredHistory(HISTORY_DIR / "store")
+    store = tiers.raw
+    _migrate_legacy_archives(store)
     # timestamp now (UTC)
-    now = datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+    now_dt = datetime.now(timezone.utc).replace(microsecond=0)
+    now = now_dt.isoformat().replace("+00:00", "Z")
 
     # normalize rows
     out_rows = []
     for r in results:
-        row = dict(r)
-        row["url"] = _normalize_url(row.get("url", ""))
+        # instrumentasi per run ada di run_metrics.json, opportunity di opportunities.json
+        row = {k: v for k, v in r.items() if k not in HISTORY_SKIP_FIELDS}
+        row["url"] = normalize_url(row.get("url", ""))
         row["run_at_utc"] = row.get("run_at_utc") or now
         out_rows.append(row)
 
-    # append to head file (ring buffer)
-    try:
-        data = json.loads(HISTORY_FILE.read_text(encoding="utf-8") or "[]")
-        if not isinstance(data, list):
-            data = []
-    except Exception:
-        data = []
-    data.extend(out_rows)
-    # keep last HISTORY_MAX_ENTRIES
-    if len(data) > HISTORY_MAX_ENTRIES:
-        data = data[-HISTORY_MAX_ENTRIES:]
-    # tulis dengan indent agar rapih
-    with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-        f.write("\n")
-
-    # monthly archive file
+    store.append(out_rows)
     month_key = now[:7]  # YYYY-MM
-    month_path = HISTORY_DIR / f"{month_key}.json"
-    try:
-        mdata = json.loads(month_path.read_text(encoding="utf-8")) if month_path.exists() else []
-        if not isinstance(mdata, list):
-            mdata = []
-    except Exception:
-        mdata = []
-    mdata.extend(out_rows)
-    with open(month_path, "w", encoding="utf-8") as f:
-        json.dump(mdata, f, ensure_ascii=False, indent=2)
-        f.write("\n")
+    compacted = store.maybe_compact(month_key)
+    changed = tiers.update(now_dt)
+
+    # head file: raw beberapa hari terakhir (dibatasi waktu, bukan jumlah row)
+    data = store.query(since=now_dt - timedelta(days=HISTORY_HEAD_DAYS))
+    _dump_json(HISTORY_FILE, data)
+
+    # arsip bulanan hanya ditulis ulang saat bulan selesai atau terkena rollup/retention
+    exported = []
+    months = tiers.months()
+    for month in months:
+        if month < month_key and (month in compacted or month in changed
+                                  or not (HISTORY_DIR / f"{month}.json").exists()):
+            exported.append(export_month(tiers, month).name)
+    for p in HISTORY_DIR.glob("????-??.json"):
+        if p.stem not in months:
+            p.unlink()  # di luar semua tier retention
+
+    # shard seri: hanya seri yang dapat row run ini + bulan yang berubah di tier
+    touched: dict[str, set] = {}
+    for r in out_rows:
+        touched.setdefault(r["run_at_utc"][:7], set()).add((r["url"], r.get("strategy") or ""))
+    n_series = export_series_shards(tiers, months=changed, touched=touched)
 
     print(
-        f"history.json updated: {len(data)} records (last {HISTORY_MAX_ENTRIES}); "
-        f"{month_path.name} archive: {len(mdata)} records"
+        f"history store: +{len(out_rows)} records; history.json: {len(data)} records (last {HISTORY_HEAD_DAYS} days)"
+        + (f"; compacted {', '.join(compacted)}" if compacted else "")
+        + (f"; exported {', '.join(exported)}" if exported else "")
+        + f"; {n_series} series shards"
     )
@@ -0,0 +1,114 @@
+from __future__ import annotations
+import json
+import os
+import threading
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+JOURNAL_FILE = Path("psi_journal.jsonl")
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def _parse_ts(s: str):
+    try:
+        return datetime.fromisoformat((s or "").replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+class RunJournal:
+    """
+    Checkpoint journal JSONL: satu baris per hasil PSI yang selesai,
+    `{"ts": <UTC>, "row": {...}}`. Setiap append di-flush + fsync sehingga
+    crash / timeout CI hanya kehilangan call yang sedang berjalan.
+    Baris terakhir untuk pasangan (url, strategy) yang menang.
+    """
+
+    def __init__(self, path: str | Path = JOURNAL_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._tail_checked = False
+
+    def reset(self):
+        """Mulai journal baru (run tanpa --resume)."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self.path.write_text("", encoding="utf-8")
+            self._tail_checked = True
+
+    def append(self, row: dict):
+        line = json.dumps({"ts": _utc_now().isoformat().replace("+00:00", "Z"), "row": row}, ensure_ascii=False)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            if not self._tail_checked:
+                self._truncate_partial_tail()
+                self._tail_checked = True
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _truncate_partial_tail(self):
+        """Buang baris terakhir yang terpotong (crash di tengah write) supaya append berikutnya tidak menempel."""
+        try:
+            f = open(self.path, "rb+")
+        except FileNotFoundError:
+            return
+        with f:
+            end = f.seek(0, os.SEEK_END)
+            pos = end
+            while pos > 0:
+                step = min(4096, pos)
+                f.seek(pos - step)
+                chunk = f.read(step)
+                if pos == end and chunk.endswith(b"\n"):
+                    return
+                i = chunk.rfind(b"\n")
+                if i >= 0:
+                    pos = pos - step + i + 1
+                    break
+                pos -= step
+            f.truncate(pos)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def entries(self) -> list[dict]:
+        if not self.path.exists():
+            return []
+        out = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    e = json.loads(line)
+                except ValueError:
+                    continue  # baris terpotong karena crash
+                if isinstance(e, dict) and isinstance(e.get("row"), dict):
+                    out.append(e)
+        return out
+
+    def latest(self) -> dict:
+        """Map (url, strategy) -> entry terakhir."""
+        last = {}
+        for e in self.entries():
+            r = e["row"]
+            last[(r.get("url"), r.get("strategy"))] = e
+        return last
+
+    def fresh_successes(self, max_age_hours: float) -> dict:
+        """Entry sukses (tanpa error) yang lebih baru dari `max_age_hours`."""
+        cutoff = _utc_now() - timedelta(hours=max_age_hours)
+        out = {}
+        for key, e in self.latest().items():
+            ts = _parse_ts(e.get("ts"))
+            if e["row"].get("error") or ts is None or ts < cutoff:
+                continue
+            out[key] = e
+        return out
+
+    def rows_for(self, items) -> list[dict]:
+        """Hasil untuk `items` [(url, strategy), ...] sesuai urutan input."""
+        last = self.latest()
+        return [last[key]["row"] for key in items if key in last]
@@ -0,0 +1,236 @@
+from __future__ import annotations
+import json
+import time
+
+try:  # optional: streaming parser (C backend jika tersedia)
+    import ijson
+except ImportError:  # pragma: no cover - fallback ke json.loads
+    ijson = None
+
+# Path (dot-separated) yang diambil dari payload PSI; sisanya dibuang saat dibaca.
+BASE_PATHS = (
+    "lighthouseResult.categories",
+    "loadingExperience",
+    "originLoadingExperience",
+)
+
+SCORE_FIELDS = ("performance", "accessibility", "best_practices", "seo")
+
+# Lab metrics dari lighthouseResult.audits: (kolom, audit id, label). Nilai
+# numericValue disimpan apa adanya; unit tercermin di nama kolom (_ms, _bytes).
+LAB_METRICS = (
+    ("lcp_ms", "largest-contentful-paint", "LCP (ms)"),
+    ("fcp_ms", "first-contentful-paint", "FCP (ms)"),
+    ("tbt_ms", "total-blocking-time", "TBT (ms)"),
+    ("cls", "cumulative-layout-shift", "CLS"),
+    ("si_ms", "speed-index", "Speed Index (ms)"),
+    ("tti_ms", "interactive", "TTI (ms)"),
+    ("ttfb_ms", "server-response-time", "Server response (ms)"),
+    ("total_bytes", "total-byte-weight", "Total byte weight (bytes)"),
+)
+
+# Field data (CrUX) dari loadingExperience / originLoadingExperience:
+# (kolom, metric key, faktor skala percentile, label). CLS dilaporkan x100.
+FIELD_METRICS = (
+    ("lcp_ms", "LARGEST_CONTENTFUL_PAINT_MS", 1, "LCP p75 (ms)"),
+    ("inp_ms", "INTERACTION_TO_NEXT_PAINT", 1, "INP p75 (ms)"),
+    ("cls", "CUMULATIVE_LAYOUT_SHIFT_SCORE", 0.01, "CLS p75"),
+    ("fcp_ms", "FIRST_CONTENTFUL_PAINT_MS", 1, "FCP p75 (ms)"),
+    ("ttfb_ms", "EXPERIMENTAL_TIME_TO_FIRST_BYTE", 1, "TTFB p75 (ms)"),
+)
+FIELD_SOURCES = (("field", "loadingExperience"), ("origin", "originLoadingExperience"))
+
+# Audit opportunity / diagnostic dengan item per resource: (audit id, field ms di
+# item). Penghematan bytes selalu dari `wastedBytes`.
+OPPORTUNITY_AUDITS = (
+    ("render-blocking-resources", "wastedMs"),
+    ("unused-javascript", "wastedMs"),
+    ("unused-css-rules", "wastedMs"),
+    ("unminified-javascript", "wastedMs"),
+    ("unminified-css", "wastedMs"),
+    ("legacy-javascript", "wastedMs"),
+    ("modern-image-formats", "wastedMs"),
+    ("uses-optimized-images", "wastedMs"),
+    ("uses-responsive-images", "wastedMs"),
+    ("offscreen-images", "wastedMs"),
+    ("efficient-animated-content", "wastedMs"),
+    ("uses-text-compression", "wastedMs"),
+    ("uses-long-cache-ttl", "wastedMs"),
+    ("bootup-time", "scripting"),
+)
+
+# Kolom numerik (selain skor) yang ikut CSV, history dan rollup.
+METRIC_FIELDS = tuple(k for k, _, _ in LAB_METRICS) + tuple(
+    f"{src}_{k}" for src, _ in FIELD_SOURCES for k, _, _, _ in FIELD_METRICS
+)
+CATEGORY_FIELDS = tuple(
+    f"{src}_{k.removesuffix('_ms')}_cat" for src, _ in FIELD_SOURCES for k, _, _, _ in FIELD_METRICS
+) + tuple(f"{src}_overall" for src, _ in FIELD_SOURCES)
+
+
+def metric_labels() -> list[tuple[str, str]]:
+    """[(kolom, label)] untuk selector metric di dashboard."""
+    out = [("performance", "Performance"), ("accessibility", "Accessibility"),
+           ("best_practices", "Best Practices"), ("seo", "SEO")]
+    out += [(k, f"Lab {label}") for k, _, label in LAB_METRICS]
+    for src, _ in FIELD_SOURCES:
+        out += [(f"{src}_{k}", f"{src.title()} {label}") for k, _, _, label in FIELD_METRICS]
+    return out
+
+
+def lab_paths() -> tuple:
+    """Hanya numericValue per audit, bukan seluruh detail audit."""
+    return tuple(f"lighthouseResult.audits.{a}.numericValue" for _, a, _ in LAB_METRICS)
+
+
+def opportunity_paths() -> tuple:
+    """Hanya details.items audit opportunity (bukan title / description / heading)."""
+    return tuple(f"lighthouseResult.audits.{a}.details.items" for a, _ in OPPORTUNITY_AUDITS)
+
+
+def wanted_paths(audits=(), paths=()) -> tuple:
+    return BASE_PATHS + tuple(f"lighthouseResult.audits.{a}" for a in audits) + tuple(paths)
+
+
+def _assign(out: dict, path: str, value):
+    keys = path.split(".")
+    cur = out
+    for k in keys[:-1]:
+        cur = cur.setdefault(k, {})
+    cur[keys[-1]] = value
+
+
+def _lookup(data, path: str):
+    cur = data
+    for k in path.split("."):
+        if not isinstance(cur, dict) or k not in cur:
+            return None
+        cur = cur[k]
+    return cur
+
+
+class _CountingReader:
+    """File-like di atas iterator chunk bytes; hitung total byte yang dibaca."""
+
+    def __init__(self, chunks):
+        self._it = iter(chunks)
+        self._buf = b""
+        self.nbytes = 0
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0:
+            parts = [self._buf]
+            for chunk in self._it:
+                self.nbytes += len(chunk)
+                parts.append(chunk)
+            self._buf = b""
+            return b"".join(parts)
+        while len(self._buf) < size:
+            try:
+                chunk = next(self._it)
+            except StopIteration:
+                break
+            if chunk:
+                self.nbytes += len(chunk)
+                self._buf += chunk
+        out, self._buf = self._buf[:size], self._buf[size:]
+        return out
+
+
+def _select_stream(reader, paths) -> dict:
+    wanted = set(paths)
+    out: dict = {}
+    builder = None
+    current = None
+    for prefix, event, value in ijson.parse(reader, use_float=True):
+        if builder is None:
+            if prefix not in wanted or event in ("map_key", "end_map", "end_array"):
+                continue
+            if event in ("start_map", "start_array"):
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+                current = prefix
+            else:
+                _assign(out, prefix, value)
+            continue
+        builder.event(event, value)
+        if prefix == current and event in ("end_map", "end_array"):
+            _assign(out, current, builder.value)
+            builder = None
+    return out
+
+
+def select_fields(data: dict, paths) -> dict:
+    """Versi non-streaming: ambil `paths` dari payload yang sudah di-parse penuh."""
+    out: dict = {}
+    for p in paths:
+        v = _lookup(data, p)
+        if v is not None:
+            _assign(out, p, v)
+    return out
+
+
+def _num(v, ndigits: int = 0):
+    if not isinstance(v, (int, float)) or isinstance(v, bool):
+        return None
+    return round(float(v), ndigits) if ndigits else int(round(v))
+
+
+def extract_metrics(data: dict) -> dict:
+    """
+    Lab metrics (lighthouseResult.audits.*.numericValue) dan field data p75 +
+    kategori (loadingExperience / originLoadingExperience) dalam unit aslinya.
+    Metric yang tidak ada di response bernilai None.
+    """
+    out = {}
+    audits = ((data.get("lighthouseResult") or {}).get("audits") or {})
+    for key, audit_id, _ in LAB_METRICS:
+        v = (audits.get(audit_id) or {}).get("numericValue")
+        out[key] = _num(v, 3) if key == "cls" else _num(v)
+    for src, section in FIELD_SOURCES:
+        le = data.get(section) or {}
+        metrics = le.get("metrics") or {}
+        for key, crux_key, scale, _ in FIELD_METRICS:
+            m = metrics.get(crux_key) or {}
+            p = m.get("percentile")
+            out[f"{src}_{key}"] = _num(p * scale, 3) if isinstance(p, (int, float)) and scale != 1 else _num(p)
+            out[f"{src}_{key.removesuffix('_ms')}_cat"] = m.get("category")
+        out[f"{src}_overall"] = le.get("overall_category")
+    return out
+
+
+def extract_opportunities(data: dict) -> list[list]:
+    """
+    [[audit, resource url, wasted_ms, wasted_bytes], ...] dari OPPORTUNITY_AUDITS.
+    Item tanpa url atau tanpa penghematan dilewati.
+    """
+    audits = ((data.get("lighthouseResult") or {}).get("audits") or {})
+    out = []
+    for audit_id, ms_key in OPPORTUNITY_AUDITS:
+        items = ((audits.get(audit_id) or {}).get("details") or {}).get("items") or []
+        for it in items:
+            if not isinstance(it, dict):
+                continue
+            url = it.get("url")
+            ms, nbytes = _num(it.get(ms_key)) or 0, _num(it.get("wastedBytes")) or 0
+            if isinstance(url, str) and url.startswith("http") and (ms or nbytes):
+                out.append([audit_id, url, ms, nbytes])
+    return out
+
+
+def parse_psi_stream(chunks, audits=(), paths=()) -> tuple[dict, int, float]:
+    """
+    Parse response PSI secara streaming dan hanya simpan field yang dibutuhkan
+    (kategori, audit terpilih, `paths` tambahan, loadingExperience). Tanpa ijson, fallback ke
+    json.loads penuh lalu seleksi field (hasil sama, tanpa penghematan memori).
+
+    Return (data_terpilih, jumlah_byte, durasi_ms baca+parse).
+    """
+    paths = wanted_paths(audits, paths)
+    t0 = time.perf_counter()
+    reader = _CountingReader(chunks)
+    if ijson is not None:
+        data = _select_stream(reader, paths)
+    else:
+        data = select_fields(json.loads(reader.read() or b"{}"), paths)
+    return data, reader.nbytes, (time.perf_counter() - t0) * 1000.0
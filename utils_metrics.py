@@ -0,0 +1,106 @@
+from __future__ import annotations
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from history_store import atomic_write_text
+
+METRICS_JSON = Path("dashboard/run_metrics.json")
+METRICS_PROM = Path("dashboard/run_metrics.prom")
+METRICS_HISTORY = Path("dashboard/history/run_metrics.jsonl")  # ikut di-restore dari gh-pages
+
+# Kolom instrumentasi per URL (hanya untuk run ini, tidak masuk history skor)
+URL_METRIC_FIELDS = ("request_ms", "retries", "response_bytes", "parse_ms", "lh_total_ms", "fetch_time")
+
+
+def _prom_escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RunMetrics:
+    """Wall time per stage pipeline + metric per URL untuk satu run."""
+
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc).replace(microsecond=0)
+        self._t0 = time.perf_counter()
+        self.stages: dict[str, float] = {}
+        self.urls: list[dict] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - t0)
+
+    def add_results(self, rows):
+        for r in rows:
+            entry = {"url": r.get("url"), "strategy": r.get("strategy"), "error": bool(r.get("error"))}
+            entry.update({k: r.get(k) for k in URL_METRIC_FIELDS})
+            self.urls.append(entry)
+
+    def summary(self) -> dict:
+        lat = sorted(u["request_ms"] for u in self.urls if isinstance(u.get("request_ms"), (int, float)))
+
+        def pct(q):
+            return round(lat[min(len(lat) - 1, int(round(q * (len(lat) - 1))))], 1) if lat else None
+
+        return {
+            "started_at_utc": self.started_at.isoformat().replace("+00:00", "Z"),
+            "total_s": round(time.perf_counter() - self._t0, 3),
+            "stages_s": {k: round(v, 3) for k, v in self.stages.items()},
+            "urls": len(self.urls),
+            "errors": sum(1 for u in self.urls if u["error"]),
+            "retries": sum(u.get("retries") or 0 for u in self.urls),
+            "response_bytes": sum(u.get("response_bytes") or 0 for u in self.urls),
+            "request_ms_p50": pct(0.5),
+            "request_ms_p95": pct(0.95),
+        }
+
+    def to_prometheus(self, summary: dict) -> str:
+        out = []
+
+        def metric(name, help_, samples):
+            out.append(f"# HELP {name} {help_}")
+            out.append(f"# TYPE {name} gauge")
+            for labels, v in samples:
+                if v is None:
+                    continue
+                lab = ",".join(f'{k}="{_prom_escape(x)}"' for k, x in labels.items())
+                out.append(f"{name}{{{lab}}} {v}" if lab else f"{name} {v}")
+
+        metric("psi_run_timestamp_seconds", "Waktu mulai run (unix)", [({}, int(self.started_at.timestamp()))])
+        metric("psi_run_duration_seconds", "Total wall time run", [({}, summary["total_s"])])
+        metric("psi_stage_duration_seconds", "Wall time per stage pipeline",
+               [({"stage": k}, round(v, 3)) for k, v in self.stages.items()])
+        metric("psi_run_urls", "Jumlah url x strategy dicek", [({}, summary["urls"])])
+        metric("psi_run_errors", "Jumlah url x strategy gagal", [({}, summary["errors"])])
+
+        def per_url(field, scale=1.0):
+            samples = {}  # satu sample per label set (baris duplikat di urls.csv)
+            for u in self.urls:
+                v = u.get(field)
+                samples[(u["url"], u["strategy"])] = round(v * scale, 4) if isinstance(v, (int, float)) else None
+            return [({"url": k[0], "strategy": k[1]}, v) for k, v in samples.items()]
+
+        metric("psi_url_request_seconds", "Latency request PSI (termasuk retry)", per_url("request_ms", 0.001))
+        metric("psi_url_retries", "Jumlah retry request PSI", per_url("retries"))
+        metric("psi_url_response_bytes", "Ukuran response PSI", per_url("response_bytes"))
+        metric("psi_url_lighthouse_total_seconds", "Lighthouse timing.total", per_url("lh_total_ms", 0.001))
+        return "\n".join(out) + "\n"
+
+    def write(self, json_path: Path = METRICS_JSON, prom_path: Path = METRICS_PROM,
+              history_path: Path | None = METRICS_HISTORY) -> dict:
+        summary = self.summary()
+        atomic_write_text(json_path, json.dumps({**summary, "per_url": self.urls}, ensure_ascii=False, indent=2) + "\n")
+        atomic_write_text(prom_path, self.to_prometheus(summary))
+        if history_path is not None:
+            history_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(history_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(summary, ensure_ascii=False) + "\n")
+        stages = ", ".join(f"{k} {v:.1f}s" for k, v in summary["stages_s"].items())
+        print(f"Run metrics: total {summary['total_s']:.1f}s ({stages}) -> {json_path}, {prom_path}")
+        return summary
@@ -0,0 +1,64 @@
+from __future__ import annotations
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. `rate` token per detik, maksimal `burst` token
+    tersimpan. rate <= 0 berarti tanpa limit (acquire langsung return).
+    """
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = float(rate or 0)
+        self.capacity = max(1.0, float(burst or 1))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._last
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._last = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """Non-blocking: 0.0 jika token diambil, selain itu detik sampai token tersedia."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block sampai token tersedia. Return total waktu tunggu (detik)."""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+def rate_from_args(rps: float | None = None, rpm: float | None = None, sleep_sec: float | None = None) -> float:
+    """
+    Tentukan rate (request/detik) dari opsi CLI. Prioritas: rps > rpm > sleep.
+    `--sleep N` lama (jeda antar call) diterjemahkan jadi 1/N request per detik.
+    """
+    if rps:
+        return float(rps)
+    if rpm:
+        return float(rpm) / 60.0
+    if sleep_sec and sleep_sec > 0:
+        return 1.0 / float(sleep_sec)
+    return 0.0
@@ -0,0 +1,64 @@
+from __future__ import annotations
+import hashlib
+import json
+from pathlib import Path
+
+from history_store import atomic_write_text
+
+PARTIAL_DIR = Path("psi_partials")
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """'2/4' -> (2, 4). Index shard mulai dari 1 (cocok dengan matrix GitHub Actions)."""
+    try:
+        i, n = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise SystemExit(f"--shard harus berbentuk i/N, bukan {spec!r}")
+    if n < 1 or not 1 <= i <= n:
+        raise SystemExit(f"--shard {spec}: butuh 1 <= i <= N")
+    return i, n
+
+
+def shard_of(url: str, strategy: str, n: int) -> int:
+    """Shard (1..n) untuk pasangan url/strategy; stabil antar proses dan runner (bukan hash() Python)."""
+    h = hashlib.sha1(f"{url}\n{strategy}".encode("utf-8")).digest()
+    return int.from_bytes(h[:8], "big") % n + 1
+
+
+def shard_items(items, i: int, n: int) -> list:
+    return [it for it in items if shard_of(it[0], it[1], n) == i]
+
+
+def partial_path(i: int, n: int, out_dir: Path = PARTIAL_DIR) -> Path:
+    return Path(out_dir) / f"shard-{i}-of-{n}.json"
+
+
+def write_partial(rows, i: int, n: int, out_dir: Path = PARTIAL_DIR) -> Path:
+    path = partial_path(i, n, out_dir)
+    atomic_write_text(path, json.dumps({"shard": i, "of": n, "rows": rows}, ensure_ascii=False) + "\n")
+    print(f"Shard {i}/{n}: {len(rows)} results -> {path}")
+    return path
+
+
+def read_partials(in_dir: Path, items) -> list[dict]:
+    """
+    Gabungkan shard-*-of-N.json dari `in_dir` -> rows urut sesuai `items`
+    (urutan urls.csv), sama seperti hasil satu proses. Shard yang hilang = error.
+    """
+    files = sorted(Path(in_dir).glob("shard-*-of-*.json"))
+    if not files:
+        raise SystemExit(f"Tidak ada partial shard di {in_dir}")
+    by_key, seen, total = {}, set(), None
+    for p in files:
+        part = json.loads(p.read_text(encoding="utf-8"))
+        if total is not None and part["of"] != total:
+            raise SystemExit(f"{p}: jumlah shard {part['of']} beda dengan {total}")
+        total = part["of"]
+        seen.add(part["shard"])
+        for r in part["rows"]:
+            by_key[(r.get("url"), r.get("strategy"))] = r
+    missing = sorted(set(range(1, total + 1)) - seen)
+    if missing:
+        raise SystemExit(f"Partial shard belum lengkap, hilang: {missing} dari {total}")
+    print(f"Merge: {len(files)} shard, {len(by_key)} url x strategy")
+    return [by_key[key] for key in items if key in by_key]